@@ -3,6 +3,8 @@ import numpy as np
 import requests
 import time
 
+from frame_trace import FrameTrace
+
 # ==========================
 # CONFIG
 # ==========================
@@ -38,6 +40,7 @@ while True:
     if not ret:
         print("⚠️ Frame not captured, skipping...")
         continue
+    trace = FrameTrace()
 
     # Convert to HSV color space
     hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
@@ -49,6 +52,7 @@ while True:
     # Combine masks
     mask_combined = cv2.bitwise_or(mask_yellow, mask_black)
     detection_ratio = np.sum(mask_combined > 0) / mask_combined.size
+    trace.mark('inferred')
 
     # If enough of the frame is black+yellow
     if detection_ratio > 0.02:  # 2% of frame pixels
@@ -59,6 +63,7 @@ while True:
                 "camera_id": 1,
                 "description": "mba3ar detected by AI.",
                 "confidence_score": float(detection_ratio * 100),  # Add confidence for AI detection
+                "trace": trace.payload(),
             }
             try:
                 response = requests.post(BACKEND_URL, json=data, timeout=5)
@@ -12,6 +12,7 @@ from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
+from django.urls import re_path
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
@@ -20,13 +21,15 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django_asgi_app = get_asgi_application()
 
 from core import routing
+from core.outbox import publisher as outbox_publisher
 
 # For development, allow all origins. In production, use AllowedHostsOriginValidator
-application = ProtocolTypeRouter({
-    "http": django_asgi_app,
+# The outbox publisher (core/outbox.py) runs on this server's event loop
+application = outbox_publisher.asgi(ProtocolTypeRouter({
+    "http": URLRouter(routing.http_urlpatterns + [re_path(r'', django_asgi_app)]),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             routing.websocket_urlpatterns
         )
     ),
-})
+}))
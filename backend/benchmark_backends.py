@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Compare the CPU inference backends on a fixed set of frames.
+
+For every backend this reports latency (mean / p50 / p95), throughput, and
+how closely its detections agree with the torch baseline: detections are
+matched greedily by IoU >= 0.5 and same class, giving precision / recall / F1
+against torch plus the mean confidence difference of matched pairs.
+
+Usage:
+    python backend/benchmark_backends.py
+    python backend/benchmark_backends.py --model yolov8m.pt --backends torch onnx-int8 openvino-int8
+    python backend/benchmark_backends.py --frames path/to/images_or_video --runs 50
+
+Without --frames, ultralytics' bundled sample images (bus.jpg, zidane.jpg)
+are used together with a few deterministic variants (flipped, darkened,
+resized), so runs are comparable between machines.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from inference_backends import BACKENDS, load_backend
+from tracker import iou_matrix
+
+MATCH_IOU = 0.5
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def sample_frames(source=None, limit=16):
+    """Fixed benchmark frames from a directory, a video, or the bundled samples"""
+    if source is None:
+        from ultralytics.utils import ASSETS
+
+        base = [cv2.imread(str(ASSETS / name)) for name in ('bus.jpg', 'zidane.jpg')]
+        frames = []
+        for img in base:
+            frames += [
+                img,
+                cv2.flip(img, 1),
+                cv2.convertScaleAbs(img, alpha=0.6, beta=0),  # low light
+                cv2.resize(img, (640, 480)),
+            ]
+        return frames[:limit]
+
+    path = Path(source)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[:limit]
+        return [cv2.imread(str(p)) for p in files]
+
+    cap = cv2.VideoCapture(str(path))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or limit
+    frames = []
+    # Evenly spaced frames across the video
+    for index in np.linspace(0, total - 1, num=min(limit, total), dtype=int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        ok, frame = cap.read()
+        if ok:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def match(reference, candidate):
+    """Greedy same-class IoU matching; returns (matched pairs, confidence deltas)"""
+    if not len(reference) or not len(candidate):
+        return 0, []
+    ious = iou_matrix(reference[:, :4], candidate[:, :4])
+    ious[reference[:, 5, None] != candidate[None, :, 5]] = 0
+    deltas = []
+    while True:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        if ious[i, j] < MATCH_IOU:
+            break
+        deltas.append(float(candidate[j, 4] - reference[i, 4]))
+        ious[i, :] = 0
+        ious[:, j] = 0
+    return len(deltas), deltas
+
+
+def benchmark(runtime, frames, confidence, runs, warmup):
+    """Time ``runs`` passes over ``frames``; returns (latencies in ms, detections of the last pass)"""
+    for frame in frames[:warmup]:
+        runtime.detect(frame, confidence)
+    latencies = []
+    detections = []
+    for _ in range(runs):
+        detections = []
+        for frame in frames:
+            started = time.perf_counter()
+            detections.append(runtime.detect(frame, confidence))
+            latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies), detections
+
+
+def agreement(reference, candidate):
+    """Precision / recall / F1 of ``candidate`` against ``reference`` and mean |Δconfidence|"""
+    matched = 0
+    all_deltas = []
+    ref_total = cand_total = 0
+    for ref, cand in zip(reference, candidate):
+        n, deltas = match(ref, cand)
+        matched += n
+        all_deltas += deltas
+        ref_total += len(ref)
+        cand_total += len(cand)
+    precision = matched / cand_total if cand_total else 1.0
+    recall = matched / ref_total if ref_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    conf_delta = float(np.mean(np.abs(all_deltas))) if all_deltas else 0.0
+    return precision, recall, f1, conf_delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO inference backends on CPU")
+    parser.add_argument("--model", default="yolov8n.pt", help="Model to export and benchmark")
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS), help="Backends to compare")
+    parser.add_argument("--frames", help="Directory of images or a video file (default: bundled samples)")
+    parser.add_argument("--limit", type=int, default=16, help="Maximum number of frames")
+    parser.add_argument("--runs", type=int, default=5, help="Timed passes over the frames")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed frames before measuring")
+    parser.add_argument("--confidence", type=float, default=0.25, help="Detection confidence threshold")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    args = parser.parse_args()
+
+    frames = sample_frames(args.frames, args.limit)
+    if not frames:
+        parser.error("No frames to benchmark")
+    backends = ['torch'] + [b for b in args.backends if b != 'torch']
+    print(f"🧪 {len(frames)} frames x {args.runs} runs, model {args.model}, imgsz {args.imgsz}\n")
+
+    results = {}
+    for name in backends:
+        runtime = load_backend(name, args.model, fallback=None, imgsz=args.imgsz)  # measure what was asked
+        latencies, detections = benchmark(runtime, frames, args.confidence, args.runs, args.warmup)
+        results[name] = (latencies, detections)
+
+    reference = results['torch'][1]
+    header = f"{'backend':<15}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'fps':>8}{'P':>7}{'R':>7}{'F1':>7}{'|Δconf|':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, (latencies, detections) in results.items():
+        precision, recall, f1, conf_delta = agreement(reference, detections)
+        print(f"{name:<15}{latencies.mean():>9.1f}{np.percentile(latencies, 50):>9.1f}"
+              f"{np.percentile(latencies, 95):>9.1f}{1000 / latencies.mean():>8.1f}"
+              f"{precision:>7.2f}{recall:>7.2f}{f1:>7.2f}{conf_delta:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
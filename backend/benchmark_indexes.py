@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Seeded benchmark for the incident/alert indexes (core migration 0008).
+
+Builds a throwaway SQLite database, migrates it to the schema before the
+indexes, seeds a large incident/alert history, then runs each endpoint's
+query before and after applying the index migration. For every query it
+prints the median latency and SQLite's EXPLAIN QUERY PLAN.
+
+Usage:
+    python backend/benchmark_indexes.py
+    python backend/benchmark_indexes.py --incidents 1000000 --runs 50
+
+The project database is never touched.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+from django.conf import settings
+
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Camera, Incident, Alert
+
+BEFORE = '0007_detectionprofile_inference_backend'
+AFTER = '0008_query_indexes'
+PAGE = 50
+
+# The benchmark runs at BEFORE and AFTER, so it reads the columns that exist
+# there rather than whole current models, which later migrations add to
+CAMERA_COLUMNS = ('name', 'location', 'ip_address', 'is_active', 'last_checked')
+INCIDENT_COLUMNS = ('id', 'camera_id', 'timestamp', 'description', 'confidence_score', 'type',
+                    'severity_level', 'is_verified', 'detected_by', 'ai_summary',
+                    *(f'camera__{column}' for column in CAMERA_COLUMNS))
+ALERT_COLUMNS = ('id', 'incident_id', 'created_by_id', 'created_at', 'title', 'message', 'acknowledged',
+                 'created_by__username', *(f'incident__{column}' for column in INCIDENT_COLUMNS))
+
+
+def seed(n_incidents, n_cameras, alert_ratio, rng):
+    """Insert the history with raw executemany (auto_now_add would overwrite timestamps)"""
+    now = timezone.now()
+    adapt = connection.ops.adapt_datetimefield_value
+    cameras = Camera.objects.bulk_create([
+        Camera(name=f'Camera {i}', location=f'Zone {i % 5}', ip_address=f'10.0.{i // 250}.{i % 250}')
+        for i in range(n_cameras)
+    ])
+    camera_ids = [c.id for c in cameras]
+    types = ['WORTH_CHECKING'] * 8 + ['DANGEROUS'] * 3 + ['CRITICAL']
+    sources = ['YOLO'] * 6 + ['AI'] * 3 + ['MANUAL']
+
+    incidents = []
+    # ~six months of history, newest last so ids follow time like in production
+    span = 180 * 24 * 3600
+    for i in range(n_incidents):
+        ts = now - timedelta(seconds=span * (1 - i / n_incidents) + rng.random())
+        kind = rng.choice(types)
+        incidents.append((
+            rng.choice(camera_ids), adapt(ts), f'Security objects detected #{i}', rng.uniform(50, 99),
+            kind, types.index(kind) // 4 + 1, rng.random() < 0.9, rng.choice(sources),
+        ))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {Incident._meta.db_table} '
+            '(camera_id, timestamp, description, confidence_score, type, severity_level, is_verified, detected_by) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
+            incidents,
+        )
+        first_id = Incident.objects.order_by('id').values_list('id', flat=True).first()
+        alerts = [
+            (first_id + i, incidents[i][1], 'Security Alert', f'Alert for incident #{i}', rng.random() < 0.95)
+            for i in range(n_incidents) if rng.random() < alert_ratio
+        ]
+        cursor.executemany(
+            f'INSERT INTO {Alert._meta.db_table} (incident_id, created_at, title, message, acknowledged) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            alerts,
+        )
+    return camera_ids
+
+
+def endpoint_queries(camera_id):
+    """
+    The ORM queries behind each endpoint, as the views and admin run them, with
+    the same joins as their select_related() but the columns of INCIDENT_COLUMNS
+    and ALERT_COLUMNS
+    """
+    middle = Incident.objects.order_by('-timestamp', '-id').values_list('timestamp', 'id')[
+        Incident.objects.count() // 2]
+    incidents = Incident.objects.values(*INCIDENT_COLUMNS)
+    alerts = Alert.objects.values(*ALERT_COLUMNS)
+    return {
+        'incidents: first page': lambda: list(incidents.order_by('-timestamp', '-id')[:PAGE + 1]),
+        'incidents: deep page (keyset)': lambda: list(
+            incidents.filter(timestamp__lte=middle[0]).exclude(timestamp=middle[0], id__gte=middle[1])
+            .order_by('-timestamp', '-id')[:PAGE + 1]),
+        'incidents: per camera': lambda: list(
+            incidents.filter(camera_id=camera_id).order_by('-timestamp')[:PAGE]),
+        'incidents: unverified count (stats)': lambda: Incident.objects.filter(is_verified=False).count(),
+        'incidents: unverified list (admin)': lambda: list(
+            incidents.filter(is_verified=False).order_by('-timestamp')[:100]),
+        'incidents: by detected_by (admin)': lambda: list(
+            incidents.filter(detected_by='MANUAL').order_by('-timestamp')[:100]),
+        'alerts: first page': lambda: list(alerts.order_by('-created_at', '-id')[:PAGE + 1]),
+        'alerts: recent (stats)': lambda: list(
+            Alert.objects.order_by('-created_at')[:5].values('title', 'message', 'created_at')),
+        'alerts: unacknowledged (admin)': lambda: list(
+            alerts.filter(acknowledged=False).order_by('-created_at')[:100]),
+    }
+
+
+def measure(queries, runs):
+    results = {}
+    for name, run in queries.items():
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        sql = captured.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (statistics.median(timings), plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the incident/alert indexes on seeded data")
+    parser.add_argument('--incidents', type=int, default=200_000, help="Incidents to seed")
+    parser.add_argument('--cameras', type=int, default=20, help="Cameras to spread them over")
+    parser.add_argument('--alert-ratio', type=float, default=0.3, help="Share of incidents with an alert")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per query")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    settings.DATABASES['default']['NAME'] = os.path.join(tmpdir.name, 'benchmark.sqlite3')
+    connection.settings_dict['NAME'] = settings.DATABASES['default']['NAME']
+
+    print(f"🗄️  Seeding {args.incidents:,} incidents in {settings.DATABASES['default']['NAME']}")
+    call_command('migrate', 'core', BEFORE, verbosity=0)
+    started = time.perf_counter()
+    camera_ids = seed(args.incidents, args.cameras, args.alert_ratio, random.Random(args.seed))
+    print(f"   seeded in {time.perf_counter() - started:.1f}s "
+          f"({Alert.objects.count():,} alerts)\n")
+
+    queries = endpoint_queries(camera_ids[0])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    before = measure(queries, args.runs)
+
+    call_command('migrate', 'core', AFTER, verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    after = measure(queries, args.runs)
+
+    header = f"{'query':<40}{'before ms':>11}{'after ms':>10}{'speedup':>9}"
+    print(header)
+    print('-' * len(header))
+    for name in queries:
+        b, a = before[name][0], after[name][0]
+        print(f"{name:<40}{b:>11.2f}{a:>10.2f}{b / a if a else float('inf'):>8.1f}x")
+
+    print("\nQuery plans (before -> after):")
+    for name in queries:
+        print(f"\n{name}")
+        for line in before[name][1]:
+            print(f"  - {line}")
+        for line in after[name][1]:
+            print(f"  + {line}")
+
+    # Leave the throwaway database at the latest schema, then drop it
+    call_command('migrate', verbosity=0)
+    connection.close()
+    tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
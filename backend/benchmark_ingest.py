@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for incident ingest on SQLite.
+
+Runs the incident create view from many threads at once, like daphne's
+thread pool under a burst of detector POSTs, against a throwaway database
+in these configurations:
+
+    default      Django's SQLite defaults (rollback journal, deferred transactions)
+    tuned        the settings.DATABASES profile (WAL, synchronous=NORMAL, busy timeout, IMMEDIATE)
+    tuned+queue  the profile plus the single-writer ingest queue (core/ingest.py)
+    async        the async ingest endpoint (core.consumers.IngestConsumer) on one
+                 event loop, with as many concurrent requests as --threads
+
+and prints sustained incidents/s, latency percentiles and failed requests.
+
+Usage:
+    python backend/benchmark_ingest.py
+    python backend/benchmark_ingest.py --threads 32 --duration 20
+
+The project database is never touched.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+from django.conf import settings
+
+django.setup()
+
+from channels.routing import URLRouter
+from django.core.management import call_command
+from django.db import connection, connections
+from rest_framework.test import APIRequestFactory
+
+from core import ingest, routing
+from core.models import Camera, Incident
+from core.views import IncidentViewSet
+
+TUNED_OPTIONS = copy.deepcopy(settings.DATABASES['default'].get('OPTIONS', {}))
+MODES = {
+    'default': ({}, False),
+    'tuned': (TUNED_OPTIONS, False),
+    'tuned+queue': (TUNED_OPTIONS, True),
+    'async': (TUNED_OPTIONS, True),
+}
+
+
+def worker(view, factory, camera_ids, deadline, latencies, errors, index):
+    n = 0
+    while time.perf_counter() < deadline:
+        request = factory.post('/api/incidents/', {
+            'camera_id': camera_ids[(index + n) % len(camera_ids)],
+            'description': f'Benchmark detection {index}/{n}',
+            'confidence_score': 80.0,
+        }, format='json')
+        started = time.perf_counter()
+        try:
+            response = view(request)
+            if response.status_code == 201:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors.append(f'HTTP {response.status_code}')
+        except Exception as e:
+            errors.append(str(e).splitlines()[0][:60])
+        n += 1
+    connection.close()
+
+
+def run_async(concurrency, camera_ids, deadline, latencies, errors):
+    app = URLRouter(routing.http_urlpatterns)
+
+    async def post(body):
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/incidents/ingest/', 'query_string': b'',
+                 'headers': [(b'content-type', b'application/json')]}
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Future()  # the client never disconnects
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await app(scope, receive, send)
+        return status[0]
+
+    async def client(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            body = json.dumps({
+                'camera_id': camera_ids[(index + n) % len(camera_ids)],
+                'description': f'Benchmark detection {index}/{n}',
+                'confidence_score': 80.0,
+            }).encode()
+            started = time.perf_counter()
+            try:
+                code = await post(body)
+                if code == 201:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors.append(f'HTTP {code}')
+            except Exception as e:
+                errors.append(str(e).splitlines()[0][:60])
+            n += 1
+
+    async def main():
+        await asyncio.gather(*(client(i) for i in range(concurrency)))
+
+    asyncio.run(main())
+
+
+def run(mode, threads, duration, cameras):
+    options, single_writer = MODES[mode]
+    tmpdir = tempfile.TemporaryDirectory()
+    db = connections.settings['default']
+    db['NAME'] = os.path.join(tmpdir.name, 'benchmark.sqlite3')
+    db['OPTIONS'] = copy.deepcopy(options)
+    settings.INGEST_SINGLE_WRITER = single_writer
+    ingest.writer = ingest.IngestQueue()  # a writer thread connected to this run's database
+    connection.close()
+    connection.settings_dict['NAME'] = db['NAME']
+    connection.settings_dict['OPTIONS'] = db['OPTIONS']
+
+    call_command('migrate', verbosity=0)
+    camera_ids = [
+        c.id for c in Camera.objects.bulk_create([
+            Camera(name=f'Camera {i}', location='Bench', ip_address=f'10.9.0.{i}') for i in range(cameras)
+        ])
+    ]
+    connection.close()
+
+    view = IncidentViewSet.as_view({'post': 'create'})
+    factory = APIRequestFactory()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    pool = [
+        threading.Thread(target=worker, args=(view, factory, camera_ids, deadline, latencies, errors, i))
+        for i in range(threads)
+    ]
+    if mode == 'async':
+        pool = [threading.Thread(target=run_async, args=(threads, camera_ids, deadline, latencies, errors))]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stored = Incident.objects.count()
+    connection.close()
+    tmpdir.cleanup()
+    latencies.sort()
+    return {
+        'rate': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan'),
+        'ok': len(latencies),
+        'stored': stored,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent incident ingest on SQLite")
+    parser.add_argument('--threads', type=int, default=16, help="Concurrent request threads (async: requests)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per configuration")
+    parser.add_argument('--cameras', type=int, default=8, help="Cameras to spread incidents over")
+    parser.add_argument('--modes', default=','.join(MODES), help="Configurations to run")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(','):
+        print(f"⏱️  {mode}: {args.threads} threads for {args.duration:.0f}s...")
+        results[mode] = run(mode, args.threads, args.duration, args.cameras)
+
+    header = f"{'mode':<14}{'incidents/s':>12}{'p50 ms':>9}{'p95 ms':>9}{'ok':>8}{'failed':>8}"
+    print()
+    print(header)
+    print('-' * len(header))
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['rate']:>12.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['ok']:>8}{len(r['errors']):>8}")
+    for mode, r in results.items():
+        if r['errors']:
+            reasons = {}
+            for error in r['errors']:
+                reasons[error] = reasons.get(error, 0) + 1
+            print(f"\n{mode} failures:")
+            for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+                print(f"  {count:>6} × {reason}")
+        if r['stored'] != r['ok']:
+            print(f"\n{mode}: {r['stored']} incidents stored for {r['ok']} successful requests")
+
+
+if __name__ == '__main__':
+    main()
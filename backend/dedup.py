@@ -0,0 +1,91 @@
+"""
+Per-camera, per-class incident deduplication for the YOLO detectors.
+
+Events are keyed by (camera, class, coarse grid cell). The first event for a
+key is reported; repeats inside that key's cooldown (which depends on the
+risk level) are only counted, and the count is attached to the next incident
+that gets through, e.g. "knife ×7 in last 60s". A flood of detections costs
+one incident row per key and cooldown instead of one per frame.
+
+The store is an LRU bounded by ``max_keys`` so a busy scene cannot grow it
+without limit.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Seconds between two reported incidents for the same key, by risk level.
+# Riskier objects are allowed through more often.
+DEFAULT_COOLDOWNS = {
+    'low': 300,
+    'medium': 60,
+    'high': 15,
+    'critical': 5,
+}
+
+
+@dataclass
+class DedupDecision:
+    """Outcome of IncidentDeduplicator.check()"""
+    emit: bool
+    count: int = 1          # events for this key since the last report, including this one
+    window: float = 0.0     # seconds covered by ``count``
+
+    def summary(self, class_name):
+        """Human-readable repeat count, empty when nothing was suppressed"""
+        if not self.emit or self.count <= 1:
+            return ""
+        return f"{class_name} ×{self.count} in last {int(round(self.window))}s"
+
+
+class IncidentDeduplicator:
+    """Suppress repeats of the same (camera, class, location) within a cooldown"""
+
+    def __init__(self, cooldowns=None, grid=4, max_keys=1024, clock=time.monotonic):
+        self.cooldowns = dict(DEFAULT_COOLDOWNS)
+        if cooldowns:
+            self.cooldowns.update(cooldowns)
+        self.grid = grid
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> [last_reported_at, suppressed_count]
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cell(self, bbox, frame_shape):
+        """Coarse grid cell of a box centre; (0, 0) when location is unknown"""
+        if bbox is None or frame_shape is None:
+            return (0, 0)
+        height, width = frame_shape[:2]
+        cx = (bbox[0] + bbox[2]) / 2
+        cy = (bbox[1] + bbox[3]) / 2
+        col = min(self.grid - 1, max(0, int(cx * self.grid / max(width, 1))))
+        row = min(self.grid - 1, max(0, int(cy * self.grid / max(height, 1))))
+        return (row, col)
+
+    def check(self, camera_id, class_name, risk='low', bbox=None, frame_shape=None):
+        """Record one event and decide whether it should become an incident"""
+        now = self._clock()
+        key = (camera_id, class_name, self.cell(bbox, frame_shape))
+        cooldown = self.cooldowns.get(risk, self.cooldowns['low'])
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            last_reported, suppressed = entry
+            if now - last_reported < cooldown:
+                entry[1] = suppressed + 1
+                return DedupDecision(emit=False, count=suppressed + 1)
+            entry[0], entry[1] = now, 0
+            return DedupDecision(emit=True, count=suppressed + 1, window=now - last_reported)
+
+        self._entries[key] = [now, 0]
+        if len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        return DedupDecision(emit=True)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,145 @@
+"""
+Per-camera detection profiles for the YOLO detectors.
+
+A detector fetches its camera's profile from the backend at startup
+(``GET /api/cameras/<id>/profile/``) and keeps a ProfileWatcher subscribed to
+``ws/camera/<id>/``. When the profile is changed in the API or admin, the
+backend pushes it over the channel layer; the watcher stages it and the
+detector swaps it in between two frames with ``watcher.poll()``. The YOLO
+model is only reloaded when the profile switches to another inference backend.
+"""
+
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import requests
+
+
+@dataclass(frozen=True)
+class DetectionProfile:
+    """Immutable snapshot of a camera's detection settings"""
+    security_objects: dict
+    confidence_threshold: float = 0.5
+    cooldowns: dict = field(default_factory=dict)
+    inference_backend: str = 'torch'
+    version: int = 0
+
+    @classmethod
+    def from_dict(cls, data, default):
+        """Build a profile from API data, filling gaps from ``default``"""
+        objects = data.get('security_objects') or default.security_objects
+        cooldowns = dict(default.cooldowns)
+        cooldowns.update(data.get('cooldowns') or {})
+        threshold = data.get('confidence_threshold')
+        return cls(
+            security_objects=normalize_objects(objects),
+            confidence_threshold=default.confidence_threshold if threshold is None else float(threshold),
+            cooldowns=cooldowns,
+            inference_backend=data.get('inference_backend') or default.inference_backend,
+            version=int(data.get('version', 0)),
+        )
+
+
+def normalize_objects(objects):
+    """Lower-case class names; expose the label under both 'label' and 'alert'"""
+    normalized = {}
+    for name, info in objects.items():
+        label = info.get('label') or info.get('alert') or name
+        normalized[name.lower()] = {'risk': info.get('risk', 'low'), 'label': label, 'alert': label}
+    return normalized
+
+
+def api_root(url):
+    """'http://host:8000/api/incidents/' -> 'http://host:8000'"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def fetch_profile(backend_url, camera_id, default):
+    """Fetch the camera's profile, falling back to ``default`` if the backend is unreachable"""
+    try:
+        resp = requests.get(f"{api_root(backend_url)}/api/cameras/{camera_id}/profile/", timeout=5)
+        if resp.status_code == 200:
+            profile = DetectionProfile.from_dict(resp.json(), default)
+            print(f"✅ Detection profile v{profile.version} loaded for camera {camera_id}")
+            return profile
+        print(f"⚠️ Could not load detection profile ({resp.status_code}), using built-in defaults")
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Could not load detection profile ({e}), using built-in defaults")
+    return DetectionProfile.from_dict({}, default)
+
+
+class ProfileWatcher:
+    """
+    Background listener for profile pushes on ``ws/camera/<id>/``.
+
+    The socket runs on its own thread; new profiles are only staged there.
+    The detection loop picks them up with poll(), so a profile is never
+    swapped in the middle of processing a frame.
+    """
+
+    RECONNECT_DELAY = 5  # seconds
+
+    def __init__(self, backend_url, camera_id, profile, default):
+        root = api_root(backend_url)
+        self.url = root.replace('http', 'ws', 1) + f"/ws/camera/{camera_id}/"
+        self.profile_url = f"{root}/api/cameras/{camera_id}/profile/"
+        self.camera_id = camera_id
+        self._current = profile
+        self._default = default
+        self._pending = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"profile-watcher-{camera_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def poll(self):
+        """Return a newly pushed profile once, or None when nothing changed"""
+        if self._pending is None:
+            return None
+        with self._lock:
+            profile, self._pending = self._pending, None
+        self._current = profile
+        print(f"🔄 Detection profile v{profile.version} applied for camera {self.camera_id}")
+        return profile
+
+    def _stage(self, data):
+        with self._lock:
+            latest = self._pending or self._current
+            if int(data.get('version', 0)) <= latest.version:
+                return
+            self._pending = DetectionProfile.from_dict(data, self._default)
+
+    def _refresh(self):
+        """Catch up on changes made while the socket was down"""
+        try:
+            resp = requests.get(self.profile_url, timeout=5)
+            if resp.status_code == 200:
+                self._stage(resp.json())
+        except requests.exceptions.RequestException:
+            pass
+
+    def _run(self):
+        asyncio.run(self._listen())
+
+    async def _listen(self):
+        import aiohttp
+
+        while True:
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(self.url, heartbeat=30) as ws:
+                        await asyncio.to_thread(self._refresh)
+                        async for msg in ws:
+                            if msg.type != aiohttp.WSMsgType.TEXT:
+                                continue
+                            data = msg.json()
+                            if data.get('type') == 'detection_profile':
+                                self._stage(data.get('data', {}))
+            except Exception as e:
+                print(f"⚠️ Profile watcher for camera {self.camera_id} disconnected: {e}")
+            await asyncio.sleep(self.RECONNECT_DELAY)
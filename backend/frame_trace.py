@@ -0,0 +1,36 @@
+"""
+Latency trace for one captured frame, carried with the incidents it raises.
+
+A ``FrameTrace`` is started when a frame is read and stamped as it moves
+through the detector:
+
+    captured   frame read from the source
+    inferred   detection (YOLO, or the colour mask) finished
+    verified   AI confirmation returned (only where the detector asks for one)
+    sent       incident about to be POSTed
+
+``payload()`` is sent as the incident's ``trace`` field; the backend adds its
+own stages (received, stored, published) and records the durations between
+them per camera (core/tracing.py, ``/api/incidents/latency/``). Stamps are
+wall-clock epoch seconds, so detector and backend clocks should be in sync
+(NTP) for the detector-to-backend hop to mean anything.
+"""
+
+import time
+import uuid
+
+
+class FrameTrace:
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.stamps = {'captured': time.time()}
+
+    def mark(self, stage):
+        """Stamp ``stage`` now; returns the trace"""
+        self.stamps[stage] = time.time()
+        return self
+
+    def payload(self):
+        """The incident's ``trace`` field, stamped ``sent``"""
+        return {'id': self.id, **self.stamps, 'sent': time.time()}
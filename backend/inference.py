@@ -0,0 +1,230 @@
+"""
+Detector-side access to YOLO inference.
+
+``load_detector(model, backend)`` returns an object with ``names`` and
+``detect(frame) -> (N, 6) float32 array`` of [x1, y1, x2, y2, conf, cls].
+``backend`` selects the runtime (see inference_backends.py):
+
+- InferenceClient when the shared inference server (inference_server.py) is
+  running: the model is already loaded and warm in that process, frames go
+  through shared memory and only a small header crosses the Unix socket.
+  Starting a detector then costs milliseconds and no extra copy of the weights.
+- LocalDetector otherwise, which loads the model in-process as before.
+
+``DetectorSwitcher`` moves a running detector to another backend in the
+background, for profile changes.
+
+ultralytics and the backend runtimes are only imported on the local path.
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from inference_backends import DEFAULT_BACKEND, load_backend
+
+DEFAULT_SOCKET = os.environ.get('INFERENCE_SOCKET', '/tmp/ai_security_inference.sock')
+DEFAULT_CONFIDENCE = 0.25  # ultralytics' own default; detectors filter further
+
+_LEN = struct.Struct('!I')
+
+
+# ==========================
+# Wire protocol
+# ==========================
+# Every message is a length-prefixed JSON header, optionally followed by
+# ``header['nbytes']`` bytes of raw payload.
+
+def send_message(sock, header, payload=b''):
+    if payload:
+        header = dict(header, nbytes=len(payload))
+    data = json.dumps(header).encode()
+    sock.sendall(_LEN.pack(len(data)) + data + payload)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:], size - pos)
+        if not n:
+            raise ConnectionError("Inference socket closed")
+        pos += n
+    return buf
+
+
+def recv_message(sock):
+    """Return (header, payload)"""
+    (size,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+    header = json.loads(_recv_exact(sock, size))
+    nbytes = header.get('nbytes', 0)
+    return header, (_recv_exact(sock, nbytes) if nbytes else b'')
+
+
+# ==========================
+# Detectors
+# ==========================
+
+class LocalDetector:
+    """Loads the model in this process (the pre-server behaviour)"""
+
+    def __init__(self, model_path, confidence=DEFAULT_CONFIDENCE, backend=DEFAULT_BACKEND):
+        self.model_path = model_path
+        self.confidence = confidence
+        self.backend = backend
+        self.runtime = load_backend(backend, model_path)
+        self.names = self.runtime.names
+
+    def detect(self, frame):
+        return self.runtime.detect(frame, self.confidence)
+
+    def close(self):
+        pass
+
+
+class InferenceClient:
+    """Runs detection on the shared inference server"""
+
+    def __init__(self, model_path, socket_path=DEFAULT_SOCKET, confidence=DEFAULT_CONFIDENCE,
+                 backend=DEFAULT_BACKEND):
+        self.model_path = model_path
+        self.confidence = confidence
+        self.backend = backend
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._shm = None
+        send_message(self._sock, {'op': 'hello', 'model': model_path, 'backend': backend})
+        header, _ = recv_message(self._sock)
+        if 'error' in header:
+            self._sock.close()
+            raise RuntimeError(header['error'])
+        self.names = {int(k): v for k, v in header['names'].items()}
+
+    def _buffer(self, nbytes):
+        """Shared-memory segment for frames, grown when a bigger frame arrives"""
+        if self._shm is None or self._shm.size < nbytes:
+            self._release_buffer()
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self._shm
+
+    def detect(self, frame):
+        frame = np.ascontiguousarray(frame)
+        shm = self._buffer(frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+        send_message(self._sock, {
+            'op': 'detect',
+            'model': self.model_path,
+            'backend': self.backend,
+            'shm': shm.name,
+            'shape': frame.shape,
+            'dtype': frame.dtype.str,
+            'conf': self.confidence,
+        })
+        header, payload = recv_message(self._sock)
+        if 'error' in header:
+            raise RuntimeError(header['error'])
+        return np.frombuffer(payload, dtype=np.float32).reshape(-1, 6)
+
+    def _release_buffer(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        try:
+            self._sock.close()
+        finally:
+            self._release_buffer()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def load_detector(model_path, backend=DEFAULT_BACKEND, socket_path=DEFAULT_SOCKET,
+                  confidence=DEFAULT_CONFIDENCE):
+    """Use the shared inference server when it is up, else load the model locally"""
+    if os.path.exists(socket_path):
+        try:
+            detector = InferenceClient(model_path, socket_path, confidence, backend)
+            print(f"✅ Using shared inference server for {model_path} ({backend})")
+            return detector
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Inference server unavailable ({e}), loading model locally")
+    print(f"🔄 Loading {model_path} locally ({backend})...")
+    detector = LocalDetector(model_path, confidence, backend)
+    print("✅ Model loaded successfully!")
+    return detector
+
+
+class DetectorSwitcher:
+    """
+    Moves a running detector to another backend without pausing its frame loop.
+
+    ``switch(backend)`` builds the new detector on a background thread (a first
+    onnx-int8 or openvino-int8 use exports and quantizes the model, which takes
+    minutes); ``current()``, called once per frame, keeps returning the old
+    detector until the new one is ready. A failed load is logged and the old
+    detector kept. ``load(backend)`` builds a detector; replaced detectors are
+    closed unless ``close_replaced`` is False (e.g. when they are shared).
+    """
+
+    def __init__(self, detector, load, close_replaced=True):
+        self.detector = detector
+        self._load = load
+        self._close_replaced = close_replaced
+        self._pending = None  # (backend, Future) being loaded
+
+    def switch(self, backend):
+        """Start moving to ``backend``; the latest request wins"""
+        if self._pending and self._pending[0] == backend:
+            return
+        self._discard_pending()
+        if backend == self.detector.backend:
+            return
+        future = Future()
+        self._pending = (backend, future)
+
+        def load():
+            try:
+                future.set_result(self._load(backend))
+            except Exception as e:
+                future.set_exception(e)
+
+        print(f"🔄 Loading the {backend} backend in the background...")
+        threading.Thread(target=load, name=f'load-{backend}', daemon=True).start()
+
+    def current(self):
+        """The detector for this frame: the new one as soon as it is ready"""
+        if self._pending and self._pending[1].done():
+            backend, future = self._pending
+            self._pending = None
+            try:
+                detector = future.result()
+            except Exception as e:
+                print(f"⚠️ Could not switch to the {backend} backend ({e}), keeping {self.detector.backend}")
+            else:
+                if self._close_replaced:
+                    self.detector.close()
+                self.detector = detector
+                print(f"✅ Switched to the {backend} backend")
+        return self.detector
+
+    def _discard_pending(self):
+        if self._pending is None:
+            return
+        _, future = self._pending
+        self._pending = None
+        if self._close_replaced:
+            # Superseded before it was ready: close it once it is
+            future.add_done_callback(lambda f: f.exception() is None and f.result().close())
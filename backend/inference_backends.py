@@ -0,0 +1,145 @@
+"""
+Pluggable inference backends for the YOLO detectors.
+
+All backends run through ultralytics' predictor, so pre-processing (letterbox)
+and post-processing (NMS) are identical and only the runtime differs:
+
+- ``torch``          the ``.pt`` model on PyTorch (the original behaviour)
+- ``onnx``           ONNX Runtime on CPU
+- ``onnx-int8``      ONNX Runtime with dynamically quantized INT8 weights
+- ``openvino``       OpenVINO FP32
+- ``openvino-int8``  OpenVINO with INT8 post-training quantization
+
+Exported models are created next to the ``.pt`` file on first use and reused
+afterwards. A camera's detection profile selects the backend; when its
+runtime isn't installed, ``load_backend()`` falls back to ``torch``.
+"""
+
+import abc
+from importlib.util import find_spec
+from pathlib import Path
+
+import numpy as np
+
+from tracker import detections_from_result
+
+DEFAULT_BACKEND = 'torch'
+
+BACKENDS = {}
+
+
+def register(name):
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+class Backend(abc.ABC):
+    """Base class: subclasses provide ``export()`` returning the model file to load"""
+
+    name = None
+    requires = ()  # modules the runtime needs, checked before loading anything
+
+    def __init__(self, model_path, imgsz=640):
+        missing = [module for module in self.requires if find_spec(module) is None]
+        if missing:
+            raise ImportError(f"The {self.name} backend needs {', '.join(missing)}")
+        from ultralytics import YOLO
+
+        self.model_path = str(model_path)
+        self.imgsz = imgsz
+        self.model = YOLO(self.export(), task='detect')
+        self.names = self.model.names
+
+    @abc.abstractmethod
+    def export(self):
+        """The model file to load, exported from ``model_path`` if needed"""
+
+    def _export_with_ultralytics(self, target, **kwargs):
+        """Export ``model_path`` once and return the exported path"""
+        if not Path(target).exists():
+            from ultralytics import YOLO
+
+            print(f"📦 Exporting {self.model_path} for the {self.name} backend...")
+            exported = YOLO(self.model_path).export(imgsz=self.imgsz, **kwargs)
+            if Path(exported) != Path(target):
+                Path(exported).rename(target)
+        return str(target)
+
+    def detect(self, frame, confidence):
+        results = self.model(frame, conf=confidence, imgsz=self.imgsz, verbose=False)
+        if not results:
+            return np.zeros((0, 6), dtype=np.float32)
+        return np.concatenate([detections_from_result(r) for r in results])
+
+
+@register('torch')
+class TorchBackend(Backend):
+    requires = ('torch',)
+
+    def export(self):
+        return self.model_path
+
+
+@register('onnx')
+class OnnxBackend(Backend):
+    requires = ('onnxruntime',)
+
+    def export(self):
+        return self._export_with_ultralytics(Path(self.model_path).with_suffix('.onnx'), format='onnx')
+
+
+@register('onnx-int8')
+class OnnxInt8Backend(Backend):
+    requires = ('onnxruntime',)
+
+    def export(self):
+        fp32 = Path(self.model_path).with_suffix('.onnx')
+        int8 = fp32.with_name(f"{fp32.stem}_int8.onnx")
+        if not int8.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            self._export_with_ultralytics(fp32, format='onnx')
+            print(f"📦 Quantizing {fp32} to INT8...")
+            quantize_dynamic(str(fp32), str(int8), weight_type=QuantType.QUInt8)
+        return str(int8)
+
+
+@register('openvino')
+class OpenVINOBackend(Backend):
+    requires = ('openvino',)
+
+    def export(self):
+        stem = Path(self.model_path).with_suffix('')
+        return self._export_with_ultralytics(Path(f"{stem}_openvino_model"), format='openvino')
+
+
+@register('openvino-int8')
+class OpenVINOInt8Backend(Backend):
+    requires = ('openvino',)
+
+    def export(self):
+        stem = Path(self.model_path).with_suffix('')
+        # Calibration uses ultralytics' bundled coco8 sample set
+        return self._export_with_ultralytics(Path(f"{stem}_int8_openvino_model"),
+                                             format='openvino', int8=True, data='coco8.yaml')
+
+
+def load_backend(name, model_path, fallback=DEFAULT_BACKEND, **kwargs):
+    """
+    Instantiate a backend by name (see BACKENDS). If its runtime isn't
+    installed, the ``fallback`` backend is loaded instead (None: raise).
+    """
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend {name!r}; choose from {', '.join(BACKENDS)}")
+    try:
+        return backend_cls(model_path, **kwargs)
+    except ImportError as e:
+        if fallback is None or fallback == name:
+            raise
+        print(f"⚠️ {e}; falling back to the {fallback} backend")
+        return load_backend(fallback, model_path, fallback=None, **kwargs)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Shared local YOLO inference server.
+
+Loads each model variant (model file + inference backend) once, warms it
+up, and serves detection requests from detector processes over a Unix
+socket. Frames are passed through shared memory created by the client; only
+a small JSON header crosses the socket, and detections come back as a packed
+(N, 6) float32 array.
+
+Usage:
+    python backend/inference_server.py --models yolov8n.pt yolov8m.pt:openvino-int8
+
+Only the model files named in ``--models`` are served, on any backend, and
+the socket is accessible to its owner only. Detectors asking for another
+model are refused and load it themselves.
+
+Detectors pick it up automatically through inference.load_detector().
+"""
+
+import argparse
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from inference import DEFAULT_SOCKET, LocalDetector, recv_message, send_message
+from inference_backends import BACKENDS, DEFAULT_BACKEND
+
+WARMUP_SHAPE = (640, 640, 3)
+
+
+class ModelPool:
+    """One warm instance per model variant, each behind its own lock"""
+
+    def __init__(self):
+        self._models = {}  # (model path, backend) -> Future of (detector, lock)
+        self._pool_lock = threading.Lock()
+
+    def get(self, model_path, backend=DEFAULT_BACKEND):
+        """The variant's (detector, lock), loading it on first use; waits only on that variant's load"""
+        key = (model_path, backend)
+        with self._pool_lock:
+            future = self._models.get(key)
+            loading = future is None
+            if loading:
+                future = self._models[key] = Future()
+        if loading:
+            try:
+                future.set_result((self._load(model_path, backend), threading.Lock()))
+            except BaseException as e:
+                with self._pool_lock:
+                    del self._models[key]  # the next request tries again
+                future.set_exception(e)
+        return future.result()
+
+    def _load(self, model_path, backend):
+        started = time.perf_counter()
+        detector = LocalDetector(model_path, backend=backend)
+        # First inference pays for lazy init; do it before any client waits on it
+        detector.detect(np.zeros(WARMUP_SHAPE, dtype=np.uint8))
+        print(f"✅ {model_path} ({backend}) loaded and warmed up in {time.perf_counter() - started:.1f}s")
+        return detector
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    """Serves one detector connection until it disconnects"""
+
+    def setup(self):
+        self.segments = {}
+
+    def attach(self, name):
+        """Attach to the client's frame buffer (cached until the client replaces it)"""
+        shm = self.segments.get(name)
+        if shm is None:
+            self.release()
+            shm = shared_memory.SharedMemory(name=name)
+            # The client owns the segment; don't let this process unlink it on exit
+            resource_tracker.unregister(shm._name, 'shared_memory')
+            self.segments[name] = shm
+        return shm
+
+    def release(self):
+        for shm in self.segments.values():
+            shm.close()
+        self.segments.clear()
+
+    def handle(self):
+        pool = self.server.pool
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except (ConnectionError, OSError):
+                break
+            try:
+                model_path, backend = header['model'], header.get('backend', DEFAULT_BACKEND)
+                if not self.server.serves(model_path, backend):
+                    # Never load a path a client made up: .pt files are unpickled
+                    send_message(self.request, {'error': f"{model_path} ({backend}) isn't served here"})
+                    continue
+                detector, lock = pool.get(model_path, backend)
+                if header['op'] == 'hello':
+                    send_message(self.request, {'names': detector.names})
+                elif header['op'] == 'detect':
+                    shm = self.attach(header['shm'])
+                    frame = np.ndarray(header['shape'], dtype=np.dtype(header['dtype']), buffer=shm.buf)
+                    with lock:
+                        detector.confidence = header.get('conf', detector.confidence)
+                        detections = detector.detect(frame)
+                    send_message(self.request, {'n': len(detections)},
+                                 np.ascontiguousarray(detections, dtype=np.float32).tobytes())
+                else:
+                    send_message(self.request, {'error': f"Unknown op {header['op']!r}"})
+            except Exception as e:
+                send_message(self.request, {'error': str(e)})
+
+    def finish(self):
+        self.release()
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool, models=()):
+        if os.path.exists(socket_path):
+            if _listening(socket_path):
+                raise RuntimeError(f"An inference server is already listening on {socket_path}")
+            os.unlink(socket_path)  # left behind by a server that died
+        self.models = frozenset(models)
+        super().__init__(socket_path, InferenceHandler)
+        self.pool = pool
+
+    def server_bind(self):
+        # Owner only: whoever can connect can have models loaded and frames read
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def serves(self, model_path, backend):
+        """Only the model files given on the command line, on any known backend"""
+        return model_path in self.models and backend in BACKENDS
+
+
+def _listening(socket_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared YOLO inference server")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--models", nargs="*", default=["yolov8n.pt"],
+                        help="Variants to load and warm up at startup, as MODEL or MODEL:BACKEND; "
+                             "clients may only use these model files (other backends load on first use)")
+    args = parser.parse_args()
+
+    pool = ModelPool()
+    try:
+        # Listen before loading anything, so a second server started meanwhile sees this one
+        server = InferenceServer(args.socket, pool,
+                                 models=[variant.partition(':')[0] for variant in args.models])
+    except RuntimeError as e:
+        raise SystemExit(f"🛑 {e}")
+    print(f"🧠 Inference server listening on {args.socket}")
+
+    def preload():
+        for variant in args.models:
+            model_path, _, backend = variant.partition(':')
+            try:
+                pool.get(model_path, backend or DEFAULT_BACKEND)
+            except Exception as e:
+                print(f"⚠️ Could not load {variant}: {e}")
+
+    # Clients asking for a variant still loading wait for it; others are served meanwhile
+    threading.Thread(target=preload, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+        print("🛑 Inference server stopped")
+
+
+if __name__ == "__main__":
+    main()
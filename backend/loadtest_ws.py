@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+WebSocket fan-out load test.
+
+Opens thousands of concurrent ``ws/alerts/``, ``ws/dashboard/`` and
+``ws/camera/<id>/`` connections against a local server, posts incidents
+through the REST API at a fixed rate, and reports:
+
+- connections opened, refused and dropped by the server, per kind
+- incident POST latency and failures
+- end-to-end delivery latency percentiles (POST sent -> frame received) and
+  missed deliveries, for alert and dashboard sockets
+- ping/pong round trips on camera sockets (they get no incident traffic)
+- server CPU and resident memory, sampled from /proc every second
+
+Every incident description carries a marker with its send time, so the
+client processes measure latency from the frames themselves. Dashboard
+latency includes the coalescing delay (DASHBOARD_PUSH_INTERVAL). Alert
+sockets only get events for CRITICAL incidents, the default ``--type``.
+
+Usage:
+    python backend/loadtest_ws.py
+    python backend/loadtest_ws.py --alerts 2000 --dashboards 500 --cameras 200 --rate 20 --duration 30
+    python backend/loadtest_ws.py --url http://127.0.0.1:8000 --server-pid 12345
+
+Without ``--url`` a daphne server is started on a throwaway database and
+stopped afterwards; the project database is never touched. Everything runs
+on localhost.
+"""
+
+import argparse
+import array
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import aiohttp
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BACKEND_DIR)
+KINDS = ('alerts', 'dashboard', 'camera')
+MARKER = re.compile(r'LT(\d+)@(\d+\.\d+)')
+CONNECT_CONCURRENCY = 100  # WebSocket handshakes in flight per client process
+
+
+def raise_open_files_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': float('nan'), 'p95': float('nan'), 'p99': float('nan'), 'max': float('nan')}
+    values = sorted(values)
+    at = lambda q: values[min(len(values) - 1, int(len(values) * q))] * 1000
+    return {'p50': statistics.median(values) * 1000, 'p95': at(0.95), 'p99': at(0.99), 'max': values[-1] * 1000}
+
+
+# ==========================
+#  SERVER
+# ==========================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(tmpdir):
+    """A daphne server on a fresh database in ``tmpdir``; returns (process, base url)"""
+    env = dict(os.environ, DATABASE_PATH=os.path.join(tmpdir, 'loadtest.sqlite3'))
+    env.pop('CHANNEL_BROKER_SOCKET', None)
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=PROJECT_DIR, env=env, check=True)
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port), 'backend.asgi:application'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, f'http://127.0.0.1:{port}'
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("daphne did not start")
+
+
+def create_cameras(base_url, count):
+    ids = []
+    for i in range(count):
+        request = urllib.request.Request(
+            f'{base_url}/api/cameras/', method='POST', headers={'Content-Type': 'application/json'},
+            data=json.dumps({'name': f'Load test {i}', 'location': 'Load test',
+                             'ip_address': f'10.77.{i // 250}.{i % 250 + 1}'}).encode(),
+        )
+        with urllib.request.urlopen(request) as response:
+            ids.append(json.load(response)['id'])
+    return ids
+
+
+class ProcessSampler:
+    """CPU % and RSS of a local process, from /proc"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.cpu, self.rss = [], []
+        self._last = None
+
+    def _cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+
+    def _rss_mb(self):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+        return float('nan')
+
+    def sample(self):
+        now, cpu = time.monotonic(), self._cpu_seconds()
+        if self._last is not None:
+            self.cpu.append((cpu - self._last[1]) / (now - self._last[0]) * 100)
+        self._last = (now, cpu)
+        self.rss.append(self._rss_mb())
+
+    async def run(self, interval=1.0):
+        try:
+            while True:
+                self.sample()
+                await asyncio.sleep(interval)
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+
+
+# ==========================
+#  CLIENTS
+# ==========================
+
+def client_process(index, ws_url, paths, ping_interval, ready, stop, results):
+    raise_open_files_limit()
+    asyncio.run(run_clients(index, ws_url, paths, ping_interval, ready, stop, results))
+
+
+async def run_clients(index, ws_url, paths, ping_interval, ready, stop, results):
+    stats = {kind: {'open': 0, 'refused': 0, 'closed': 0, 'received': [], 'latency': array.array('d')}
+             for kind in KINDS}
+    rtts = array.array('d')
+    handshakes = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    sockets = []
+
+    async def ping(ws, state):
+        await asyncio.sleep(random.uniform(0, ping_interval))
+        try:
+            while not ws.closed:
+                state['ping_sent'] = time.perf_counter()
+                await ws.send_str('{"type":"ping"}')
+                await asyncio.sleep(ping_interval)
+        except (ConnectionError, RuntimeError):
+            pass
+
+    async def hold(session, kind, path):
+        async with handshakes:
+            try:
+                ws = await asyncio.wait_for(session.ws_connect(ws_url + path, max_msg_size=0), 30)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                stats[kind]['refused'] += 1
+                return
+        stats[kind]['open'] += 1
+        sockets.append(ws)
+        seen, state = set(), {'ping_sent': None}
+        pinger = asyncio.create_task(ping(ws, state)) if kind == 'camera' else None
+        try:
+            async for message in ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                received = time.time()
+                if pinger is not None:
+                    if state['ping_sent'] is not None and '"pong"' in message.data:
+                        rtts.append(time.perf_counter() - state['ping_sent'])
+                        state['ping_sent'] = None
+                    continue
+                for number, sent in MARKER.findall(message.data):
+                    if number not in seen:  # an incident shows up in several frames; count the first
+                        seen.add(number)
+                        stats[kind]['latency'].append(received - float(sent))
+        finally:
+            if pinger is not None:
+                pinger.cancel()
+            stats[kind]['received'].append(len(seen))
+            if not stop.is_set():
+                stats[kind]['closed'] += 1  # closed by the server mid-run
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        tasks = [asyncio.create_task(hold(session, kind, path)) for kind, path in paths]
+        while sum(s['open'] + s['refused'] for s in stats.values()) < len(paths):
+            await asyncio.sleep(0.1)
+        ready.put((index, {kind: (s['open'], s['refused']) for kind, s in stats.items()}))
+        while not stop.is_set():
+            await asyncio.sleep(0.2)
+        for ws in list(sockets):
+            await ws.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    results.put((index, {kind: {**s, 'latency': list(s['latency'])} for kind, s in stats.items()}, list(rtts)))
+
+
+# ==========================
+#  INCIDENT DRIVER
+# ==========================
+
+async def drive_incidents(base_url, camera_ids, incident_type, rate, duration, concurrency):
+    """POST incidents at ``rate``/s for ``duration`` seconds; returns (sent, POST latencies, failures)"""
+    latencies, failures = [], {}
+    slots = asyncio.Semaphore(concurrency)
+    count = int(rate * duration)
+
+    async def post(session, number):
+        async with slots:
+            sent = time.time()
+            started = time.perf_counter()
+            try:
+                async with session.post(f'{base_url}/api/incidents/', json={
+                    'camera_id': camera_ids[number % len(camera_ids)],
+                    'type': incident_type,
+                    'description': f'Load test LT{number}@{sent:.6f}',
+                    'confidence_score': 90.0,
+                }) as response:
+                    await response.read()
+                    if response.status == 201:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        failures[f'HTTP {response.status}'] = failures.get(f'HTTP {response.status}', 0) + 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = e.__class__.__name__
+                failures[reason] = failures.get(reason, 0) + 1
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        start = time.monotonic()
+        tasks = []
+        for number in range(count):
+            delay = start + number / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(post(session, number)))
+        await asyncio.gather(*tasks)
+    return len(latencies), latencies, failures
+
+
+async def run_load(args, base_url, camera_ids, sampler):
+    sampling = asyncio.create_task(sampler.run()) if sampler else None
+    print(f"🚨 Posting {args.type} incidents at {args.rate}/s for {args.duration:.0f}s...")
+    result = await drive_incidents(base_url, camera_ids, args.type, args.rate, args.duration, args.post_concurrency)
+    print(f"⏳ Draining for {args.drain:.0f}s...")
+    await asyncio.sleep(args.drain)
+    if sampling:
+        sampling.cancel()
+    return result
+
+
+# ==========================
+#  MAIN
+# ==========================
+
+def socket_paths(args, camera_ids):
+    paths = [('alerts', '/ws/alerts/')] * args.alerts + [('dashboard', '/ws/dashboard/')] * args.dashboards
+    paths += [('camera', f'/ws/camera/{camera_ids[i % len(camera_ids)]}/') for i in range(args.cameras)]
+    random.shuffle(paths)
+    return paths
+
+
+def report(args, opened, clients, rtts, incidents, sampler):
+    delivered, post_latencies, failures = incidents
+    print()
+    header = f"{'sockets':<11}{'open':>7}{'refused':>9}{'dropped':>9}"
+    print(header)
+    print('-' * len(header))
+    for kind in KINDS:
+        print(f"{kind:<11}{sum(o[kind][0] for o in opened):>7}{sum(o[kind][1] for o in opened):>9}"
+              f"{sum(c[kind]['closed'] for c in clients):>9}")
+
+    post = percentiles(post_latencies)
+    print(f"\nincidents: {delivered} created, {sum(failures.values())} failed; "
+          f"POST p50 {post['p50']:.1f} ms, p95 {post['p95']:.1f} ms")
+    for reason, count in sorted(failures.items(), key=lambda item: -item[1]):
+        print(f"  {count:>6} × {reason}")
+
+    print()
+    header = f"{'delivery':<11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'frames':>10}{'missed':>9}"
+    print(header)
+    print('-' * len(header))
+    for kind in ('alerts', 'dashboard'):
+        per_socket = [n for c in clients for n in c[kind]['received']]
+        expected_each = delivered if kind == 'dashboard' or args.type == 'CRITICAL' else 0
+        latency = percentiles([value for c in clients for value in c[kind]['latency']])
+        print(f"{kind:<11}{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}"
+              f"{sum(per_socket):>10}{sum(max(0, expected_each - n) for n in per_socket):>9}")
+    ping = percentiles(rtts)
+    print(f"camera ping round trip: p50 {ping['p50']:.1f} ms, p95 {ping['p95']:.1f} ms ({len(rtts)} pings)")
+
+    if sampler and sampler.cpu:
+        print(f"\nserver (pid {sampler.pid}): CPU avg {statistics.mean(sampler.cpu):.0f}%, "
+              f"peak {max(sampler.cpu):.0f}%; RSS {sampler.rss[0]:.0f} MB at start, peak {max(sampler.rss):.0f} MB")
+    else:
+        print("\nserver CPU/memory not sampled (pass --server-pid for a server started elsewhere)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test WebSocket fan-out against a local server")
+    parser.add_argument('--url', help="Server to test, e.g. http://127.0.0.1:8000 (default: start one)")
+    parser.add_argument('--server-pid', type=int, help="Server process to sample CPU/memory of (with --url)")
+    parser.add_argument('--alerts', type=int, default=1000, help="ws/alerts/ connections")
+    parser.add_argument('--dashboards', type=int, default=200, help="ws/dashboard/ connections")
+    parser.add_argument('--cameras', type=int, default=100, help="ws/camera/<id>/ connections")
+    parser.add_argument('--camera-count', type=int, default=8, help="Cameras to create and spread load over")
+    parser.add_argument('--rate', type=float, default=10.0, help="Incidents posted per second")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds to post incidents for")
+    parser.add_argument('--type', default='CRITICAL', help="Incident type (CRITICAL ones raise alerts)")
+    parser.add_argument('--drain', type=float, default=5.0, help="Seconds to wait for deliveries afterwards")
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Client processes the sockets are spread over")
+    parser.add_argument('--ping-interval', type=float, default=5.0, help="Seconds between camera socket pings")
+    parser.add_argument('--post-concurrency', type=int, default=32, help="Incident POSTs in flight")
+    args = parser.parse_args()
+
+    limit = raise_open_files_limit()
+    sockets = args.alerts + args.dashboards + args.cameras
+    if sockets + 100 > limit * args.processes:
+        print(f"⚠️  {sockets} sockets over {args.processes} processes may exceed the open files limit ({limit})")
+
+    tmpdir = tempfile.TemporaryDirectory()
+    server = None
+    try:
+        if args.url:
+            base_url, pid = args.url.rstrip('/'), args.server_pid
+        else:
+            server, base_url = start_server(tmpdir.name)
+            pid = server.pid
+            print(f"🚀 daphne (pid {pid}) on {base_url}, database in {tmpdir.name}")
+        sampler = ProcessSampler(pid) if pid and os.path.exists(f'/proc/{pid}') else None
+        camera_ids = create_cameras(base_url, args.camera_count)
+
+        paths = socket_paths(args, camera_ids)
+        ready, results, stop = multiprocessing.Queue(), multiprocessing.Queue(), multiprocessing.Event()
+        ws_url = 'ws' + base_url[len('http'):]
+        workers = [
+            multiprocessing.Process(target=client_process, daemon=True,
+                                    args=(i, ws_url, paths[i::args.processes], args.ping_interval, ready, stop, results))
+            for i in range(args.processes)
+        ]
+        print(f"🔌 Opening {sockets} sockets from {args.processes} processes...")
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        opened = [ready.get()[1] for _ in workers]
+        print(f"   connected in {time.monotonic() - started:.1f}s")
+        if sampler:
+            sampler.sample()
+
+        incidents = asyncio.run(run_load(args, base_url, camera_ids, sampler))
+        stop.set()
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        report(args, opened, [c for _, c, _ in collected], [r for _, _, rs in collected for r in rs],
+               incidents, sampler)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -81,7 +82,22 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints in WAL mode
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+            # Wait for the write lock (seconds) instead of failing with "database is locked"
+            'timeout': 20,
+            # Take the write lock at BEGIN: a deferred transaction that later writes can't be
+            # upgraded while another writer holds the lock, and fails without waiting
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -152,6 +168,22 @@ CHANNEL_LAYERS = {
         # },
     },
 }
+# Several server processes on one machine without Redis: run `python manage.py
+# channel_broker` and start each process with CHANNEL_BROKER_SOCKET set
+# (core/channel_layers.py). Keep OUTBOX_PUBLISH on in only one of them. The
+# broker only shares channels and groups; see OUTBOX_PUBLISH below for the
+# state that stays per process.
+CHANNEL_BROKER_SOCKET = os.environ.get('CHANNEL_BROKER_SOCKET')
+if CHANNEL_BROKER_SOCKET:
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'core.channel_layers.UnixSocketChannelLayer',
+        'CONFIG': {
+            'path': CHANNEL_BROKER_SOCKET,
+            'capacity': 100,  # Messages queued per channel before sends to it fail
+            'expiry': 60,  # Seconds an unreceived message is kept
+            'group_expiry': 86400,
+        },
+    }
 
 # REST Framework settings
 REST_FRAMEWORK = {
@@ -162,3 +194,53 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
+
+# Keyset pagination for incidents, alerts, reports and AI logs (core/pagination.py)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# In-memory dashboard stats are re-read from the database at most this often (core/stats.py)
+DASHBOARD_STATS_RECONCILE_SECONDS = 60
+# Dashboard WebSocket updates are coalesced to at most one per interval (core/dashboard.py)
+DASHBOARD_PUSH_INTERVAL = 1.0
+# Reports over longer periods are generated on a background thread (core/reports.py)
+REPORT_SYNC_MAX_DAYS = 7
+# Rows fetched per database round trip by the streaming exports (core/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Days to keep each incident type / AI decision before archiving it, None = forever (core/retention.py)
+RETENTION_POLICIES = {
+    'incidents': {'WORTH_CHECKING': 30, 'DANGEROUS': 180, 'CRITICAL': None},
+    'ai_logs': {'SAFE': 14, 'SUSPICIOUS': 90, 'CONFIRMED': 365},
+}
+RETENTION_BATCH_SIZE = 500
+# Expired rows are archived here as gzipped NDJSON day files; None deletes without archiving
+RETENTION_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Incident ingest writes go through one writer thread, grouped per transaction (core/ingest.py)
+INGEST_SINGLE_WRITER = True
+INGEST_MAX_BATCH = 100
+
+# WebSocket broadcasts are stored with the write and published off-request (core/outbox.py)
+#
+# Run ONE server process unless you accept the following. Besides the outbox
+# publisher, this state is kept per process and is not shared by the channel broker:
+# - dashboard stats (core/stats.py) only see other processes' writes at the next
+#   reconcile, up to DASHBOARD_STATS_RECONCILE_SECONDS late
+# - dashboard updates (core/dashboard.py) are coalesced per process: one message
+#   per interval from each process
+# - latency histograms (core/tracing.py) cover the incidents the answering process
+#   took in, and fanout/total only those it also published
+# - each process has its own ingest writer (core/ingest.py), so their SQLite write
+#   transactions contend for the database lock again
+OUTBOX_PUBLISH = os.environ.get('OUTBOX_PUBLISH', '1') == '1'  # False on all but one server process per database
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETENTION_SECONDS = 3600  # Also how far back a reconnecting client can catch up
+OUTBOX_REPLAY_LIMIT = 500  # Missed events replayed on reconnect; beyond that the client refetches
+
+# Shared YOLO inference server (backend/inference_server.py)
+INFERENCE_SOCKET = os.environ.get('INFERENCE_SOCKET', '/tmp/ai_security_inference.sock')
+# Variants loaded and warmed up when the server starts: the models of yolo_detector.py and yolo_detector_v2.py
+INFERENCE_MODELS = ['yolov8n.pt', 'yolov8m.pt']
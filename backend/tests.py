@@ -0,0 +1,340 @@
+"""
+Unit tests for the detector-side modules.
+
+The detectors run as scripts from backend/ and import each other as top-level
+modules (``from tracker import ...``), so the tests do the same. Run with
+``python manage.py test backend.tests``.
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import inference  # noqa: E402
+import inference_backends  # noqa: E402
+import inference_server  # noqa: E402
+from dedup import DEFAULT_COOLDOWNS, IncidentDeduplicator  # noqa: E402
+from tracker import IoUTracker, RISK_LEVELS, risk_rank  # noqa: E402
+
+
+def detection(x, y, cls=0, conf=0.9, size=40):
+    return [x, y, x + size, y + size, conf, cls]
+
+
+class IoUTrackerTests(SimpleTestCase):
+    """Tracks keep their ids while they move, start after min_hits and end after max_age"""
+
+    def step(self, tracker, *detections, risks=None):
+        return tracker.update(np.array(detections, dtype=np.float32).reshape(-1, 6), risks)
+
+    def test_matching_keeps_ids(self):
+        tracker = IoUTracker(min_hits=1)
+        started = self.step(tracker, detection(0, 0), detection(200, 200))
+        self.assertEqual([e.track_id for e in started], [1, 2])
+        for dx in range(4, 20, 4):
+            # Moving a few pixels per frame, listed in the other order
+            self.assertEqual(self.step(tracker, detection(200 + dx, 200), detection(dx, 0)), [])
+        ids, boxes = tracker.boxes()
+        self.assertEqual(sorted(ids), [1, 2])
+        first = boxes[list(ids).index(1)]
+        self.assertLess(abs(first[0] - 16), 5)  # follows the detections
+
+        # A detection far from every track opens a new one
+        [event] = self.step(tracker, detection(20, 0), detection(220, 200), detection(400, 0))
+        self.assertEqual(event.track_id, 3)
+
+    def test_min_hits(self):
+        tracker = IoUTracker(min_hits=3, max_age=1)
+        self.assertEqual(self.step(tracker, detection(0, 0)), [])
+        self.assertEqual(self.step(tracker, detection(2, 0)), [])
+        [event] = self.step(tracker, detection(4, 0, conf=0.95), detection(300, 300))
+        self.assertEqual((event.kind, event.track_id, event.hits), ('started', 1, 3))
+        self.assertAlmostEqual(event.confidence, 0.95)
+        self.assertEqual(self.step(tracker, detection(6, 0)), [])  # started once
+
+        # The single-frame detection at (300, 300) never started, and is gone after max_age misses
+        self.step(tracker, detection(8, 0))
+        self.assertEqual(list(tracker.boxes()[0]), [1])
+
+    def test_max_age(self):
+        tracker = IoUTracker(min_hits=1, max_age=2)
+        self.step(tracker, detection(0, 0))
+        self.step(tracker)
+        self.step(tracker)
+        self.assertEqual(len(tracker), 1)
+        self.assertEqual(self.step(tracker, detection(0, 0)), [])  # matched again, same track
+
+        for _ in range(3):
+            self.step(tracker)
+        self.assertEqual(len(tracker), 0)
+        [event] = self.step(tracker, detection(0, 0))
+        self.assertEqual(event.track_id, 2)
+
+    def test_risk_escalation(self):
+        medium, critical = risk_rank('medium'), risk_rank('critical')
+        tracker = IoUTracker(min_hits=1, emit_updates=True)
+        [event] = self.step(tracker, detection(0, 0), risks=[medium])
+        self.assertEqual(RISK_LEVELS[event.risk], 'medium')
+        self.assertEqual(self.step(tracker, detection(0, 0), risks=[medium]), [])
+
+        [event] = self.step(tracker, detection(0, 0), risks=[critical])
+        self.assertEqual((event.kind, event.track_id, RISK_LEVELS[event.risk]), ('updated', 1, 'critical'))
+        self.assertEqual(self.step(tracker, detection(0, 0), risks=[critical]), [])
+
+        # Without emit_updates only the start is reported
+        tracker = IoUTracker(min_hits=1)
+        self.step(tracker, detection(0, 0), risks=[medium])
+        self.assertEqual(self.step(tracker, detection(0, 0), risks=[critical]), [])
+
+    def test_class_change_needs_min_hits(self):
+        tracker = IoUTracker(min_hits=2, emit_updates=True)
+        self.step(tracker, detection(0, 0, cls=0))
+        self.step(tracker, detection(0, 0, cls=0))
+        self.assertEqual(self.step(tracker, detection(0, 0, cls=43)), [])  # one flicker
+        [event] = self.step(tracker, detection(0, 0, cls=43))
+        self.assertEqual((event.kind, event.class_id), ('updated', 43))
+
+
+class IncidentDeduplicatorTests(SimpleTestCase):
+    """Repeats inside a key's cooldown are counted, not reported; the store stays bounded"""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.dedup = IncidentDeduplicator(clock=lambda: self.now)
+
+    def test_cooldown_window(self):
+        self.assertTrue(self.dedup.check(1, 'knife', 'high').emit)
+        for count in range(1, 4):
+            self.now += 4
+            decision = self.dedup.check(1, 'knife', 'high')
+            self.assertEqual((decision.emit, decision.count), (False, count))
+
+        # The next report counts the suppressed repeats and itself
+        self.now = 1000.0 + DEFAULT_COOLDOWNS['high']
+        decision = self.dedup.check(1, 'knife', 'high')
+        self.assertEqual((decision.emit, decision.count, decision.window), (True, 4, 15.0))
+        self.assertEqual(decision.summary('knife'), 'knife ×4 in last 15s')
+
+        # The window restarts at the report
+        self.now += 1
+        self.assertFalse(self.dedup.check(1, 'knife', 'high').emit)
+
+    def test_keys(self):
+        self.assertTrue(self.dedup.check(1, 'knife', 'high', bbox=(0, 0, 10, 10), frame_shape=(480, 640)).emit)
+        self.assertTrue(self.dedup.check(2, 'knife', 'high', bbox=(0, 0, 10, 10), frame_shape=(480, 640)).emit)
+        self.assertTrue(self.dedup.check(1, 'person', 'high', bbox=(0, 0, 10, 10), frame_shape=(480, 640)).emit)
+        self.assertTrue(self.dedup.check(1, 'knife', 'high', bbox=(600, 400, 630, 470), frame_shape=(480, 640)).emit)
+        self.assertFalse(self.dedup.check(1, 'knife', 'high', bbox=(20, 20, 40, 40), frame_shape=(480, 640)).emit)
+
+    def test_cooldown_per_risk(self):
+        for risk, cooldown in DEFAULT_COOLDOWNS.items():
+            with self.subTest(risk=risk):
+                self.dedup.check(1, risk, risk)
+                self.now += cooldown - 1
+                self.assertFalse(self.dedup.check(1, risk, risk).emit)
+                self.now += 1
+                self.assertTrue(self.dedup.check(1, risk, risk).emit)
+
+        # Overrides replace single levels; unknown risks use the 'low' cooldown
+        dedup = IncidentDeduplicator(cooldowns={'critical': 1}, clock=lambda: self.now)
+        self.assertEqual((dedup.cooldowns['critical'], dedup.cooldowns['high']), (1, DEFAULT_COOLDOWNS['high']))
+        dedup.check(1, 'bag', 'unknown')
+        self.now += DEFAULT_COOLDOWNS['low'] - 1
+        self.assertFalse(dedup.check(1, 'bag', 'unknown').emit)
+
+    def test_lru_eviction(self):
+        dedup = IncidentDeduplicator(max_keys=2, clock=lambda: self.now)
+        dedup.check(1, 'knife', 'high')
+        dedup.check(1, 'person', 'medium')
+        dedup.check(1, 'knife', 'high')  # used again: 'person' is now the oldest
+        dedup.check(1, 'car', 'low')
+        self.assertEqual(len(dedup), 2)
+        self.assertFalse(dedup.check(1, 'knife', 'high').emit)
+        self.assertTrue(dedup.check(1, 'person', 'medium').emit)  # evicted, so reported again
+
+
+class InferenceBackendTests(SimpleTestCase):
+    """Backends are picked by name, and fall back to torch when their runtime is missing"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model = Path(directory.name) / 'yolov8n.pt'
+        for suffix in ('.pt', '.onnx'):
+            self.model.with_suffix(suffix).touch()  # exported already: nothing to export
+        # ultralytics isn't needed to pick a backend; record what YOLO is asked to load
+        self.yolo = mock.MagicMock()
+        self.enterContext(mock.patch.dict(sys.modules, {'ultralytics': mock.Mock(YOLO=self.yolo)}))
+        self.installed = {'torch', 'onnxruntime', 'openvino'}
+        self.enterContext(mock.patch.object(inference_backends, 'find_spec',
+                                            lambda module: object() if module in self.installed else None))
+
+    def loaded(self):
+        return self.yolo.call_args[0][0]
+
+    def test_selection(self):
+        runtime = inference_backends.load_backend('onnx', str(self.model))
+        self.assertIsInstance(runtime, inference_backends.OnnxBackend)
+        self.assertEqual(self.loaded(), str(self.model.with_suffix('.onnx')))
+        runtime = inference_backends.load_backend(inference_backends.DEFAULT_BACKEND, str(self.model))
+        self.assertIsInstance(runtime, inference_backends.TorchBackend)
+        self.assertEqual(self.loaded(), str(self.model))
+        with self.assertRaises(ValueError):
+            inference_backends.load_backend('tensorrt', str(self.model))
+
+    def test_fallback_when_runtime_is_missing(self):
+        self.installed -= {'onnxruntime', 'openvino'}
+        for name in ('onnx', 'onnx-int8', 'openvino', 'openvino-int8'):
+            with self.subTest(backend=name):
+                runtime = inference_backends.load_backend(name, str(self.model))
+                self.assertIsInstance(runtime, inference_backends.TorchBackend)
+                self.assertEqual(self.loaded(), str(self.model))
+                with self.assertRaises(ImportError):
+                    inference_backends.load_backend(name, str(self.model), fallback=None)
+
+        self.installed.clear()
+        with self.assertRaises(ImportError):
+            inference_backends.load_backend('onnx', str(self.model))
+
+    def test_export_is_abstract(self):
+        with self.assertRaises(TypeError):
+            inference_backends.Backend(str(self.model))
+
+
+class ModelPoolTests(SimpleTestCase):
+    """Each variant loads once, and a slow load only holds up requests for that variant"""
+
+    def test_load_does_not_block_other_variants(self):
+        pool = inference_server.ModelPool()
+        release = threading.Event()
+        loads = []
+
+        def load(model_path, backend):
+            loads.append(model_path)
+            if model_path == 'slow.pt':
+                self.assertTrue(release.wait(5))
+            return mock.Mock(name=model_path)
+
+        with mock.patch.object(pool, '_load', load):
+            waiting = [threading.Thread(target=pool.get, args=('slow.pt',)) for _ in range(2)]
+            for thread in waiting:
+                thread.start()
+            detector, lock = pool.get('fast.pt')  # answered while slow.pt is still loading
+            self.assertFalse(release.is_set())
+            release.set()
+            for thread in waiting:
+                thread.join(5)
+            self.assertIs(pool.get('fast.pt')[0], detector)
+        self.assertEqual(sorted(loads), ['fast.pt', 'slow.pt'])
+
+    def test_failed_load_is_retried(self):
+        pool = inference_server.ModelPool()
+        with mock.patch.object(pool, '_load', side_effect=[RuntimeError('no such model'), 'detector']):
+            with self.assertRaises(RuntimeError):
+                pool.get('yolov8n.pt')
+            self.assertEqual(pool.get('yolov8n.pt')[0], 'detector')
+
+
+class InferenceServerTests(SimpleTestCase):
+    """A server never takes the socket of one that is running, only a stale one"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'inference.sock')
+
+    def start(self):
+        server = inference_server.InferenceServer(self.path, inference_server.ModelPool())
+        self.addCleanup(server.server_close)
+        return server
+
+    def test_refuses_to_replace_a_running_server(self):
+        self.start()
+        with self.assertRaises(RuntimeError):
+            self.start()
+        self.assertTrue(inference_server._listening(self.path))
+
+    def test_replaces_a_stale_socket(self):
+        self.start().server_close()  # died without removing its socket
+        self.assertTrue(os.path.exists(self.path))
+        self.start()
+        self.assertTrue(inference_server._listening(self.path))
+
+    def test_serves_configured_models_only(self):
+        server = inference_server.InferenceServer(self.path, inference_server.ModelPool(), models=['yolov8n.pt'])
+        self.addCleanup(server.server_close)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        self.assertTrue(server.serves('yolov8n.pt', 'onnx'))
+        self.assertFalse(server.serves('yolov8n.pt', 'tensorrt'))
+        self.assertFalse(server.serves('/tmp/payload.pt', 'torch'))
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        client.connect(self.path)
+        with mock.patch.object(server.pool, 'get') as get:
+            inference.send_message(client, {'op': 'hello', 'model': '/tmp/payload.pt'})
+            header, _ = inference.recv_message(client)
+        self.assertIn("isn't served here", header['error'])
+        get.assert_not_called()
+
+
+class DetectorSwitcherTests(SimpleTestCase):
+    """A backend switch loads in the background while frames keep using the current detector"""
+
+    def setUp(self):
+        self.enterContext(mock.patch('builtins.print'))
+        self.release = threading.Event()
+        self.old = mock.Mock(backend='torch')
+
+    def load(self, backend):
+        self.assertTrue(self.release.wait(5))
+        if backend == 'broken':
+            raise RuntimeError('export failed')
+        return mock.Mock(backend=backend)
+
+    def finish(self, switcher):
+        self.release.set()
+        for thread in threading.enumerate():  # wait for the background loads
+            if thread.name.startswith('load-'):
+                thread.join(5)
+
+    def test_swaps_once_loaded(self):
+        switcher = inference.DetectorSwitcher(self.old, self.load)
+        switcher.switch('onnx')
+        self.assertIs(switcher.current(), self.old)  # still loading
+        self.finish(switcher)
+        self.assertEqual(switcher.current().backend, 'onnx')
+        self.old.close.assert_called_once()
+
+    def test_failed_load_keeps_the_current_detector(self):
+        switcher = inference.DetectorSwitcher(self.old, self.load)
+        switcher.switch('broken')
+        self.finish(switcher)
+        self.assertIs(switcher.current(), self.old)
+        self.old.close.assert_not_called()
+
+    def test_latest_switch_wins(self):
+        switcher = inference.DetectorSwitcher(self.old, self.load)
+        switcher.switch('onnx')
+        superseded = switcher._pending[1]
+        switcher.switch('openvino')
+        self.finish(switcher)
+        self.assertEqual(switcher.current().backend, 'openvino')
+        superseded.result().close.assert_called_once()
+
+    def test_shared_detectors_are_not_closed(self):
+        switcher = inference.DetectorSwitcher(self.old, self.load, close_replaced=False)
+        switcher.switch('onnx')
+        self.finish(switcher)
+        self.assertEqual(switcher.current().backend, 'onnx')
+        self.old.close.assert_not_called()
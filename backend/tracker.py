@@ -0,0 +1,314 @@
+"""
+Lightweight IoU + Kalman multi-object tracker for the YOLO detectors.
+
+Sits between YOLO and incident reporting: every detection is associated with
+a stable track id, and an incident is emitted once when a track starts
+(optionally again when its class or risk changes) instead of once per
+cooldown window. Track state lives in flat numpy arrays so a frame with
+hundreds of live tracks costs a handful of vectorised operations.
+
+Detections are passed as an (N, 6) float array of
+``[x1, y1, x2, y2, confidence, class_id]``, which is exactly what
+``result.boxes.data`` holds for an ultralytics result.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# Ordered from least to most severe; the index is the numeric risk rank
+RISK_LEVELS = ('low', 'medium', 'high', 'critical')
+
+
+def risk_rank(risk):
+    """Numeric rank of a risk name (unknown risks rank as 'low')"""
+    try:
+        return RISK_LEVELS.index(risk)
+    except ValueError:
+        return 0
+
+
+def detections_from_result(result):
+    """Convert an ultralytics result into an (N, 6) detection array"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    return boxes.data[:, :6].cpu().numpy().astype(np.float32)
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0).astype(np.float32)
+
+
+def _xyxy_to_z(boxes):
+    """xyxy -> Kalman measurement [cx, cy, w, h]"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w, h], axis=1)
+
+
+def _x_to_xyxy(state):
+    """Kalman state [cx, cy, w, h, ...] -> xyxy"""
+    w = np.clip(state[:, 2], 1e-3, None)
+    h = np.clip(state[:, 3], 1e-3, None)
+    return np.stack([state[:, 0] - w / 2, state[:, 1] - h / 2,
+                     state[:, 0] + w / 2, state[:, 1] + h / 2], axis=1)
+
+
+@dataclass
+class TrackEvent:
+    """Something worth reporting about a track"""
+    kind: str            # 'started' or 'updated'
+    track_id: int
+    class_id: int
+    risk: int            # index into RISK_LEVELS
+    confidence: float    # peak confidence seen on the track
+    bbox: tuple          # last xyxy box
+    hits: int
+
+
+class IoUTracker:
+    """
+    Greedy IoU association with a constant-velocity Kalman filter per track.
+
+    - ``min_hits``: consecutive-ish matches before a track counts as started
+      (filters out single-frame false positives)
+    - ``max_age``: updates a track may go unmatched before it is dropped
+    - ``emit_updates``: also emit an 'updated' event when a started track
+      settles on a different class or risk level
+    """
+
+    # Constant-velocity model over [cx, cy, w, h, vcx, vcy, vw, vh]
+    _F = np.eye(8, dtype=np.float32)
+    _F[:4, 4:] = np.eye(4, dtype=np.float32)
+    _H = np.eye(4, 8, dtype=np.float32)
+    _Q = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.0001, 0.0001]).astype(np.float32)
+    _R = np.diag([1, 1, 10, 10]).astype(np.float32)
+    _P0 = np.diag([10, 10, 10, 10, 1e4, 1e4, 1e4, 1e4]).astype(np.float32)
+
+    def __init__(self, iou_threshold=0.3, max_age=30, min_hits=3,
+                 emit_updates=False, capacity=64):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.emit_updates = emit_updates
+        self._next_id = 1
+        self._n = 0
+        self._allocate(capacity)
+
+    # ---- storage -------------------------------------------------------
+
+    def _allocate(self, capacity):
+        """(Re)allocate the per-track arrays, keeping the live rows"""
+        n = self._n
+        old = getattr(self, '_x', None)
+        fields = {
+            '_x': ((capacity, 8), np.float32),
+            '_P': ((capacity, 8, 8), np.float32),
+            '_ids': ((capacity,), np.int64),
+            '_cls': ((capacity,), np.int32),
+            '_risk': ((capacity,), np.int8),
+            '_conf': ((capacity,), np.float32),
+            '_hits': ((capacity,), np.int32),
+            '_misses': ((capacity,), np.int32),
+            '_reported': ((capacity,), np.bool_),
+            # Class/risk a started track was last reported with
+            '_rep_cls': ((capacity,), np.int32),
+            '_rep_risk': ((capacity,), np.int8),
+            # Class the detections currently vote for, and for how long
+            '_cand_cls': ((capacity,), np.int32),
+            '_cand_n': ((capacity,), np.int32),
+        }
+        for name, (shape, dtype) in fields.items():
+            arr = np.zeros(shape, dtype=dtype)
+            if old is not None and n:
+                arr[:n] = getattr(self, name)[:n]
+            setattr(self, name, arr)
+
+    def _compact(self, keep):
+        """Drop rows where ``keep`` is False, preserving order"""
+        idx = np.flatnonzero(keep)
+        for name in ('_x', '_P', '_ids', '_cls', '_risk', '_conf', '_hits', '_misses',
+                     '_reported', '_rep_cls', '_rep_risk', '_cand_cls', '_cand_n'):
+            arr = getattr(self, name)
+            arr[:len(idx)] = arr[idx]
+        self._n = len(idx)
+
+    def __len__(self):
+        return self._n
+
+    def reset(self):
+        self._n = 0
+
+    # ---- public API ----------------------------------------------------
+
+    def boxes(self):
+        """(track_ids, xyxy boxes) of all live tracks"""
+        n = self._n
+        return self._ids[:n].copy(), _x_to_xyxy(self._x[:n])
+
+    def update(self, detections, risks=None):
+        """
+        Advance the tracker by one processed frame.
+
+        ``detections`` is an (N, 6) array of [x1, y1, x2, y2, conf, cls];
+        ``risks`` an optional (N,) array of risk ranks. Returns the list of
+        TrackEvents produced by this frame.
+        """
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        if risks is None:
+            risks = np.zeros(len(detections), dtype=np.int8)
+        risks = np.asarray(risks, dtype=np.int8)
+
+        self._predict()
+        n = self._n
+        iou = iou_matrix(_x_to_xyxy(self._x[:n]), detections[:, :4])
+        track_idx, det_idx = self._associate(iou)
+
+        # Matched tracks: Kalman correction and bookkeeping
+        if len(track_idx):
+            self._correct(track_idx, _xyxy_to_z(detections[det_idx, :4]))
+            self._hits[track_idx] += 1
+            self._misses[track_idx] = 0
+            self._conf[track_idx] = np.maximum(self._conf[track_idx], detections[det_idx, 4])
+            self._vote_class(track_idx, detections[det_idx, 5].astype(np.int32),
+                             risks[det_idx])
+
+        # Unmatched tracks age; stale ones are dropped
+        matched = np.zeros(n, dtype=np.bool_)
+        matched[track_idx] = True
+        self._misses[:n][~matched] += 1
+
+        events = self._collect_events()
+
+        keep = self._misses[:n] <= self.max_age
+        if not keep.all():
+            self._compact(keep)
+
+        # Unmatched detections open new tracks
+        new = np.ones(len(detections), dtype=np.bool_)
+        new[det_idx] = False
+        if new.any():
+            self._spawn(detections[new], risks[new])
+            events.extend(self._collect_events(only_new=int(new.sum())))
+        return events
+
+    # ---- internals -----------------------------------------------------
+
+    def _predict(self):
+        n = self._n
+        if not n:
+            return
+        x = self._x[:n]
+        # Keep predicted width/height positive
+        shrinking = (x[:, 2] + x[:, 6] <= 0) | (x[:, 3] + x[:, 7] <= 0)
+        x[shrinking, 6:8] = 0
+        self._x[:n] = x @ self._F.T
+        self._P[:n] = self._F @ self._P[:n] @ self._F.T + self._Q
+
+    def _correct(self, idx, z):
+        x = self._x[idx]
+        P = self._P[idx]
+        H = self._H
+        y = z - x @ H.T
+        S = H @ P @ H.T + self._R
+        K = P @ H.T @ np.linalg.inv(S)
+        self._x[idx] = x + np.einsum('nij,nj->ni', K, y)
+        self._P[idx] = (np.eye(8, dtype=np.float32) - K @ H) @ P
+
+    def _associate(self, iou):
+        """Greedy highest-IoU-first matching; returns (track_idx, det_idx)"""
+        if iou.size == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        rows, cols = np.nonzero(iou >= self.iou_threshold)
+        order = np.argsort(-iou[rows, cols], kind='stable')
+        used_r = np.zeros(iou.shape[0], dtype=np.bool_)
+        used_c = np.zeros(iou.shape[1], dtype=np.bool_)
+        track_idx, det_idx = [], []
+        for r, c in zip(rows[order], cols[order]):
+            if used_r[r] or used_c[c]:
+                continue
+            used_r[r] = used_c[c] = True
+            track_idx.append(r)
+            det_idx.append(c)
+        return np.asarray(track_idx, dtype=np.intp), np.asarray(det_idx, dtype=np.intp)
+
+    def _vote_class(self, idx, cls, risk):
+        """
+        A track switches class only after the new class has been seen on
+        ``min_hits`` consecutive matches, so one-frame flickers don't count.
+        """
+        same = self._cand_cls[idx] == cls
+        self._cand_n[idx] = np.where(same, self._cand_n[idx] + 1, 1)
+        self._cand_cls[idx] = cls
+        settled = self._cand_n[idx] >= max(self.min_hits, 1)
+        self._cls[idx[settled]] = cls[settled]
+        # Risk follows the detections of the track's current class
+        current = self._cls[idx] == cls
+        self._risk[idx[current]] = risk[current]
+
+    def _spawn(self, detections, risks):
+        count = len(detections)
+        if self._n + count > len(self._ids):
+            self._allocate(max(2 * len(self._ids), self._n + count))
+        sl = slice(self._n, self._n + count)
+        self._x[sl] = 0
+        self._x[sl, :4] = _xyxy_to_z(detections[:, :4])
+        self._P[sl] = self._P0
+        self._ids[sl] = np.arange(self._next_id, self._next_id + count)
+        self._cls[sl] = detections[:, 5].astype(np.int32)
+        self._cand_cls[sl] = self._cls[sl]
+        self._cand_n[sl] = 1
+        self._risk[sl] = risks
+        self._conf[sl] = detections[:, 4]
+        self._hits[sl] = 1
+        self._misses[sl] = 0
+        self._reported[sl] = False
+        self._next_id += count
+        self._n += count
+
+    def _collect_events(self, only_new=0):
+        """Emit 'started' / 'updated' events for the live (or just-spawned) rows"""
+        start = self._n - only_new if only_new else 0
+        sl = slice(start, self._n)
+        live = self._misses[sl] == 0
+        starting = live & ~self._reported[sl] & (self._hits[sl] >= self.min_hits)
+        changed = np.zeros_like(starting)
+        if self.emit_updates:
+            changed = live & self._reported[sl] & (
+                (self._cls[sl] != self._rep_cls[sl]) | (self._risk[sl] != self._rep_risk[sl]))
+
+        events = []
+        boxes = None
+        for kind, mask in (('started', starting), ('updated', changed)):
+            if not mask.any():
+                continue
+            if boxes is None:
+                boxes = _x_to_xyxy(self._x[sl])
+            for i in np.flatnonzero(mask):
+                j = start + i
+                events.append(TrackEvent(
+                    kind=kind,
+                    track_id=int(self._ids[j]),
+                    class_id=int(self._cls[j]),
+                    risk=int(self._risk[j]),
+                    confidence=float(self._conf[j]),
+                    bbox=tuple(float(v) for v in boxes[i]),
+                    hits=int(self._hits[j]),
+                ))
+            rows = np.flatnonzero(mask) + start
+            self._reported[rows] = True
+            self._rep_cls[rows] = self._cls[rows]
+            self._rep_risk[rows] = self._risk[rows]
+        return events
@@ -1,8 +1,12 @@
 import cv2
 import requests
-import time
 from flask import Flask, Response
-from ultralytics import YOLO
+
+from dedup import IncidentDeduplicator
+from frame_trace import FrameTrace
+from detection_profiles import DetectionProfile, ProfileWatcher, fetch_profile
+from inference import load_detector
+from tracker import IoUTracker, RISK_LEVELS, risk_rank
 
 # ==========================
 # CONFIG
@@ -10,8 +14,9 @@ from ultralytics import YOLO
 BACKEND_URL = "http://127.0.0.1:8000/api/incidents/"
 CAMERA_ID = 1
 SHOW_PREVIEW = True
+CONFIDENCE_THRESHOLD = 0.5
 
-# Security-relevant objects to detect
+# Security-relevant objects to detect (overridden by the camera's detection profile)
 SECURITY_OBJECTS = {
     'person': {'risk': 'medium', 'alert': 'Person detected'},
     'bicycle': {'risk': 'low', 'alert': 'Bicycle detected'},
@@ -29,13 +34,6 @@ SECURITY_OBJECTS = {
     'baseball bat': {'risk': 'high', 'alert': '⚾ Baseball bat'},
 }
 
-# ==========================
-# Initialize YOLO
-# ==========================
-print("🔄 Loading YOLOv8 model...")
-model = YOLO('yolov8n.pt')
-print("✅ Model loaded successfully!")
-
 # ==========================
 # Initialize Camera
 # ==========================
@@ -44,87 +42,110 @@ if not cap.isOpened():
     print("❌ Could not open webcam.")
     exit()
 
-last_post_time = 0
-cooldown = 15
 frame_count = 0
 
+# ==========================
+# Object Tracker
+# ==========================
+# Report each tracked object once instead of once per cooldown window
+tracker = IoUTracker(iou_threshold=0.3, max_age=30, min_hits=3)
+dedup = IncidentDeduplicator()
+RISK_COLORS = [(0, 255, 0), (0, 165, 255), (0, 0, 255), (255, 0, 255)]
+
+# ==========================
+# Detection Profile
+# ==========================
+# Fetched from the backend; pushed changes are applied between frames
+DEFAULT_PROFILE = DetectionProfile(SECURITY_OBJECTS, CONFIDENCE_THRESHOLD, dedup.cooldowns)
+profile = fetch_profile(BACKEND_URL, CAMERA_ID, DEFAULT_PROFILE)
+dedup.cooldowns.update(profile.cooldowns)
+watcher = ProfileWatcher(BACKEND_URL, CAMERA_ID, profile, DEFAULT_PROFILE).start()
+
+# ==========================
+# Initialize YOLO
+# ==========================
+# Served by the shared inference server when it is running, loaded locally otherwise,
+# on the runtime selected by the camera's profile
+MODEL_PATH = 'yolov8n.pt'
+model = load_detector(MODEL_PATH, backend=profile.inference_backend)
+
+
+def report_incident(event, decision, trace):
+    """Post one incident for a newly tracked object"""
+    class_name = model.names[event.class_id]
+    obj_info = profile.security_objects.get(class_name.lower(), {'alert': class_name})
+
+    description = f"Security objects detected: {class_name} ({event.confidence:.1%}) [track #{event.track_id}]"
+    if RISK_LEVELS[event.risk] in ['high', 'critical']:
+        description = f"⚠️ {obj_info['alert']} - {description}"
+    if decision.summary(class_name):
+        description = f"{description} - {decision.summary(class_name)}"
+
+    data = {
+        "camera_id": CAMERA_ID,
+        "description": description,
+        "confidence_score": float(event.confidence * 100),
+        "trace": trace.payload(),
+    }
+
+    try:
+        response = requests.post(BACKEND_URL, json=data, timeout=5)
+        if response.status_code == 201:
+            print(f"✅ Incident #{response.json().get('id', 'N/A')} reported!")
+    except:
+        pass
+
 # ==========================
 # FLASK APP
 # ==========================
 app = Flask(__name__)
 
 def generate_frames():
-    global frame_count, last_post_time
+    global frame_count, profile, model
     while True:
         success, frame = cap.read()
         if not success:
             break
+        trace = FrameTrace()
         
         frame_count += 1
+
+        # Apply a pushed profile change between frames
+        updated = watcher.poll()
+        if updated:
+            if updated.inference_backend != profile.inference_backend:
+                model.close()
+                model = load_detector(MODEL_PATH, backend=updated.inference_backend)
+            profile = updated
+            dedup.cooldowns.update(profile.cooldowns)
         
         # Run YOLO detection every 3rd frame
         if frame_count % 3 == 0:
-            results = model(frame, verbose=False)
-            
-            detected_objects = {}
-            highest_risk = 'low'
-            
-            for result in results:
-                boxes = result.boxes
-                
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    class_name = model.names[cls]
-                    confidence = float(box.conf[0])
-                    
-                    if confidence > 0.5 and class_name.lower() in SECURITY_OBJECTS:
-                        obj_info = SECURITY_OBJECTS[class_name.lower()]
-                        detected_objects[class_name] = {
-                            'confidence': confidence,
-                            'risk': obj_info['risk'],
-                            'alert': obj_info['alert']
-                        }
-                        
-                        if obj_info['risk'] == 'critical':
-                            highest_risk = 'critical'
-                        elif obj_info['risk'] == 'high' and highest_risk != 'critical':
-                            highest_risk = 'high'
-                        elif obj_info['risk'] == 'medium' and highest_risk not in ['critical', 'high']:
-                            highest_risk = 'medium'
-                        
-                        # Draw bounding box
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        color = (0, 255, 0) if highest_risk == 'low' else (0, 165, 255) if highest_risk == 'medium' else (0, 0, 255) if highest_risk == 'high' else (255, 0, 255)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        label = f"{class_name}: {confidence:.2f}"
-                        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            # Report incident if objects detected
-            if detected_objects:
-                now = time.time()
-                if now - last_post_time > cooldown:
-                    last_post_time = now
-                    
-                    obj_list = ", ".join([f"{name} ({info['confidence']:.1%})" for name, info in detected_objects.items()])
-                    description = f"Security objects detected: {obj_list}"
-                    
-                    if highest_risk in ['high', 'critical']:
-                        description = f"⚠️ {detected_objects[list(detected_objects.keys())[0]]['alert']} - {description}"
-                    
-                    avg_confidence = sum(info['confidence'] for info in detected_objects.values()) / len(detected_objects)
-                    
-                    data = {
-                        "camera_id": CAMERA_ID,
-                        "description": description,
-                        "confidence_score": float(avg_confidence * 100),
-                    }
-                    
-                    try:
-                        response = requests.post(BACKEND_URL, json=data, timeout=5)
-                        if response.status_code == 201:
-                            print(f"✅ Incident #{response.json().get('id', 'N/A')} reported!")
-                    except:
-                        pass
+            detections = model.detect(frame)
+            trace.mark('inferred')
+
+            names = [model.names[int(c)].lower() for c in detections[:, 5]]
+            keep = [conf > profile.confidence_threshold and name in profile.security_objects
+                    for conf, name in zip(detections[:, 4], names)]
+            detections = detections[keep]
+            risks = [risk_rank(profile.security_objects[name]['risk'])
+                     for name, k in zip(names, keep) if k]
+
+            # Draw bounding boxes
+            for (x1, y1, x2, y2, confidence, cls), risk in zip(detections, risks):
+                color = RISK_COLORS[risk]
+                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                label = f"{model.names[int(cls)]}: {confidence:.2f}"
+                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+            # Report each newly tracked object once
+            for event in tracker.update(detections, risks):
+                class_name = model.names[event.class_id].lower()
+                decision = dedup.check(CAMERA_ID, class_name, RISK_LEVELS[event.risk],
+                                       event.bbox, frame.shape)
+                if decision.emit:
+                    report_incident(event, decision, trace)
         
         # Add status overlay
         cv2.putText(frame, "YOLO Security Detection ACTIVE", (10, 30), 
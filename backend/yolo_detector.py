@@ -1,7 +1,11 @@
 import cv2
 import requests
-import time
-from ultralytics import YOLO
+
+from dedup import DEFAULT_COOLDOWNS, IncidentDeduplicator
+from frame_trace import FrameTrace
+from detection_profiles import DetectionProfile, ProfileWatcher, fetch_profile
+from inference import DetectorSwitcher, load_detector
+from tracker import IoUTracker, RISK_LEVELS, risk_rank
 
 # ==========================
 # CONFIG
@@ -9,8 +13,10 @@ from ultralytics import YOLO
 BACKEND_URL = "http://127.0.0.1:8000/api/incidents/"
 CAMERA_ID = 1  # Your camera ID in Django DB
 SHOW_PREVIEW = True  # Set to False if running headless
+CONFIDENCE_THRESHOLD = 0.5
 
-# Security-relevant objects to detect (YOLOv8 COCO classes)
+# Security-relevant objects to detect (YOLOv8 COCO classes).
+# Built-in defaults; the camera's detection profile in the backend overrides them.
 SECURITY_OBJECTS = {
     'person': {'risk': 'medium', 'alert': '👤 Person detected'},
     'bicycle': {'risk': 'low', 'alert': '🚲 Bicycle detected'},
@@ -94,13 +100,6 @@ SECURITY_OBJECTS = {
     'toothbrush': {'risk': 'low', 'alert': '🪥 Toothbrush'},
 }
 
-# ==========================
-# Initialize YOLO Model
-# ==========================
-print("🔄 Loading YOLOv8 model...")
-model = YOLO('yolov8n.pt')  # nano model for speed (yolov8s.pt or yolov8m.pt for better accuracy)
-print("✅ Model loaded successfully!")
-
 # ==========================
 # Initialize Camera
 # ==========================
@@ -110,8 +109,75 @@ if not cap.isOpened():
     exit()
 
 print("✅ AI Security System activated. Press 'q' to quit.")
-last_post_time = 0
-cooldown = 15  # seconds between incident reports to avoid spam
+
+# ==========================
+# Object Tracker
+# ==========================
+# One incident per tracked object instead of one per cooldown window:
+# a person lingering in view is reported once, and a second person
+# showing up meanwhile gets their own incident.
+REPORT_TRACK_UPDATES = False  # Also report when a tracked object's class/risk changes
+tracker = IoUTracker(iou_threshold=0.3, max_age=30, min_hits=3,
+                     emit_updates=REPORT_TRACK_UPDATES)
+# Tracks that flicker or re-enter are folded per (camera, class, location),
+# reported at most once per the risk level's cooldown (dedup.DEFAULT_COOLDOWNS)
+dedup = IncidentDeduplicator()
+RISK_COLORS = [(0, 255, 0), (0, 165, 255), (0, 0, 255), (255, 0, 255)]
+
+# ==========================
+# Detection Profile
+# ==========================
+# Classes, risk levels, threshold and cooldowns come from the camera's
+# profile in the backend; changes are pushed while running and applied
+# between frames, without reloading the model.
+DEFAULT_PROFILE = DetectionProfile(SECURITY_OBJECTS, CONFIDENCE_THRESHOLD, DEFAULT_COOLDOWNS)
+profile = fetch_profile(BACKEND_URL, CAMERA_ID, DEFAULT_PROFILE)
+dedup.cooldowns.update(profile.cooldowns)
+watcher = ProfileWatcher(BACKEND_URL, CAMERA_ID, profile, DEFAULT_PROFILE).start()
+
+# ==========================
+# Initialize YOLO Model
+# ==========================
+# Served by the shared inference server when it is running, loaded locally otherwise;
+# the runtime (torch, onnx, openvino, ...) is picked by the camera's profile
+MODEL_PATH = 'yolov8n.pt'  # nano model for speed (yolov8s.pt or yolov8m.pt for better accuracy)
+model = load_detector(MODEL_PATH, backend=profile.inference_backend)
+# A backend switch loads in the background; frames keep using the current model meanwhile
+switcher = DetectorSwitcher(model, lambda backend: load_detector(MODEL_PATH, backend=backend))
+
+
+def report_incident(event, decision, trace):
+    """Post one incident for a tracker event"""
+    class_name = model.names[event.class_id]
+    obj_info = profile.security_objects.get(class_name.lower(), {'alert': class_name})
+    risk = RISK_LEVELS[event.risk]
+
+    description = f"Security objects detected: {class_name} ({event.confidence:.1%}) [track #{event.track_id}]"
+    if event.kind == 'updated':
+        description = f"Tracked object changed: {class_name} ({event.confidence:.1%}) [track #{event.track_id}]"
+    if risk in ['high', 'critical']:
+        description = f"⚠️ {obj_info['alert']} - {description}"
+    summary = decision.summary(class_name)
+    if summary:
+        description = f"{description} - {summary}"
+
+    data = {
+        "camera_id": CAMERA_ID,
+        "description": description,
+        "confidence_score": float(event.confidence * 100),
+        "trace": trace.payload(),
+    }
+
+    try:
+        print(f"📤 Reporting incident: {description[:60]}...")
+        response = requests.post(BACKEND_URL, json=data, timeout=5)
+        if response.status_code == 201:
+            print(f"✅ Incident #{response.json().get('id', 'N/A')} reported successfully!")
+        else:
+            print(f"⚠️ Failed to report incident ({response.status_code}): {response.text}")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Error sending request: {e}")
+
 
 # ==========================
 # Main Detection Loop
@@ -122,84 +188,47 @@ while True:
     if not ret:
         print("⚠️ Frame not captured, skipping...")
         continue
+    trace = FrameTrace()
 
     frame_count += 1
+
+    # Apply a pushed profile change between frames
+    updated = watcher.poll()
+    if updated:
+        switcher.switch(updated.inference_backend)
+        profile = updated
+        dedup.cooldowns.update(profile.cooldowns)
+    model = switcher.current()
     
     # Run YOLO inference (process every 3rd frame for performance)
     if frame_count % 3 == 0:
-        results = model(frame, verbose=False)
-        
-        # Process detections
-        for result in results:
-            boxes = result.boxes
-            
-            detected_objects = {}
-            highest_risk = 'low'
-            
-            for box in boxes:
-                # Get class name
-                cls = int(box.cls[0])
-                class_name = model.names[cls]
-                confidence = float(box.conf[0])
-                
-                # Only process high-confidence detections and security-relevant objects
-                if confidence > 0.5 and class_name.lower() in SECURITY_OBJECTS:
-                    obj_info = SECURITY_OBJECTS[class_name.lower()]
-                    
-                    # Track detected object
-                    detected_objects[class_name] = {
-                        'confidence': confidence,
-                        'risk': obj_info['risk'],
-                        'alert': obj_info['alert']
-                    }
-                    
-                    # Update highest risk level
-                    if obj_info['risk'] == 'critical':
-                        highest_risk = 'critical'
-                    elif obj_info['risk'] == 'high' and highest_risk != 'critical':
-                        highest_risk = 'high'
-                    elif obj_info['risk'] == 'medium' and highest_risk not in ['critical', 'high']:
-                        highest_risk = 'medium'
-                    
-                    # Draw bounding box
-                    if SHOW_PREVIEW:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        color = (0, 255, 0) if highest_risk == 'low' else (0, 165, 255) if highest_risk == 'medium' else (0, 0, 255) if highest_risk == 'high' else (255, 0, 255)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        label = f"{class_name}: {confidence:.2f}"
-                        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            # Report incident if security-relevant objects detected
-            if detected_objects:  # Report any security object detected
-                now = time.time()
-                if now - last_post_time > cooldown:
-                    last_post_time = now
-                    
-                    # Create description with detected objects
-                    obj_list = ", ".join([f"{name} ({info['confidence']:.1%})" for name, info in detected_objects.items()])
-                    description = f"Security objects detected: {obj_list}"
-                    
-                    if highest_risk in ['high', 'critical']:
-                        description = f"⚠️ {detected_objects[list(detected_objects.keys())[0]]['alert']} - {description}"
-                    
-                    # Calculate average confidence
-                    avg_confidence = sum(info['confidence'] for info in detected_objects.values()) / len(detected_objects)
-                    
-                    data = {
-                        "camera_id": CAMERA_ID,
-                        "description": description,
-                        "confidence_score": float(avg_confidence * 100),
-                    }
-                    
-                    try:
-                        print(f"📤 Reporting incident: {description[:60]}...")
-                        response = requests.post(BACKEND_URL, json=data, timeout=5)
-                        if response.status_code == 201:
-                            print(f"✅ Incident #{response.json().get('id', 'N/A')} reported successfully!")
-                        else:
-                            print(f"⚠️ Failed to report incident ({response.status_code}): {response.text}")
-                    except requests.exceptions.RequestException as e:
-                        print(f"❌ Error sending request: {e}")
+        detections = model.detect(frame)
+        trace.mark('inferred')
+
+        # Only keep high-confidence detections of security-relevant objects
+        names = [model.names[int(c)].lower() for c in detections[:, 5]]
+        keep = [conf > profile.confidence_threshold and name in profile.security_objects
+                for conf, name in zip(detections[:, 4], names)]
+        detections = detections[keep]
+        risks = [risk_rank(profile.security_objects[name]['risk'])
+                 for name, k in zip(names, keep) if k]
+
+        # Draw bounding boxes
+        if SHOW_PREVIEW:
+            for (x1, y1, x2, y2, confidence, cls), risk in zip(detections, risks):
+                color = RISK_COLORS[risk]
+                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                label = f"{model.names[int(cls)]}: {confidence:.2f}"
+                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        # Report each newly tracked object once
+        for event in tracker.update(detections, risks):
+            class_name = model.names[event.class_id].lower()
+            decision = dedup.check(CAMERA_ID, class_name, RISK_LEVELS[event.risk],
+                                   event.bbox, frame.shape)
+            if decision.emit:
+                report_incident(event, decision, trace)
     
     # Display video feed
     if SHOW_PREVIEW:
@@ -11,33 +11,46 @@ AI Security System - Multi-source YOLO + AI confirmation
 
 import os
 import cv2
+import argparse
+import dataclasses
 import time
 import asyncio
+import threading
 import aiohttp
-import numpy as np
 from datetime import datetime
-from ultralytics import YOLO
+
+from dedup import DEFAULT_COOLDOWNS, IncidentDeduplicator
+from frame_trace import FrameTrace
+from detection_profiles import DetectionProfile, ProfileWatcher, fetch_profile
+from inference import DetectorSwitcher, load_detector
+from tracker import IoUTracker, RISK_LEVELS, risk_rank
 
 # -------------------------------
 # CONFIGURATION
 # -------------------------------
-# Define sources (webcams or video files)
+# Define sources (webcams or video files), keyed by display name.
+# camera_id must match the Camera row in the Django DB.
 SOURCES = {
-    "cam1": 0,  # Local webcam
-    # "cam2": "video1.mp4",  # Example video file
-    # "cam3": "video2.mp4",  # Another video
+    "cam1": {"camera_id": 1, "source": 0},  # Local webcam
+    # "cam2": {"camera_id": 2, "source": "video1.mp4"},  # Example video file
+    # "cam3": {"camera_id": 3, "source": "video2.mp4"},  # Another video
 }
 
 FPS = 10                 # For video simulation
 YOLO_INTERVAL = 10       # seconds
 AI_BLIND_INTERVAL = 120  # seconds (2 minutes)
 CONFIDENCE_THRESHOLD = 0.5
+TRACK_MAX_AGE = 2        # YOLO passes a track may be missed before it ends
+# Seconds between incidents for the same (camera, class, location), per risk level
+INCIDENT_COOLDOWNS = dict(DEFAULT_COOLDOWNS)
+# Command-line values that take precedence over the backend profile
+PROFILE_OVERRIDES = {}
 BACKEND_API = "http://127.0.0.1:8000/api/incidents/"
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_MODEL = "gpt-4o-mini"
 YOLO_MODEL_PATH = "yolov8m.pt"
 
-# Security objects to track
+# Security objects to track (overridden by each camera's detection profile)
 SECURITY_OBJECTS = {
     'person': {'risk': 'medium', 'label': '👤 Person'},
     'car': {'risk': 'low', 'label': '🚗 Vehicle'},
@@ -55,14 +68,16 @@ SECURITY_OBJECTS = {
 def current_timestamp():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def create_alert(camera_name, description, ai_summary=None):
+def create_alert(camera_name, camera_id, description, ai_summary=None, trace=None):
     """Send alert to backend or log in console"""
     data = {
-        "camera_id": camera_name,
+        "camera_id": camera_id,
         "description": description,
         "ai_summary": ai_summary if ai_summary else "",
         "timestamp": current_timestamp()
     }
+    if trace:
+        data["trace"] = trace.payload()
     try:
         import requests
         resp = requests.post(BACKEND_API, json=data, timeout=5)
@@ -113,10 +128,25 @@ async def analyze_with_openai(frame):
         print(f"⚠️ OpenAI call failed: {e}")
         return None
 
+class DetectorCache:
+    """One detector per inference backend, shared by all cameras using it"""
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self._detectors = {}
+        self._lock = threading.Lock()
+
+    def get(self, backend):
+        with self._lock:
+            if backend not in self._detectors:
+                # Shared inference server when it is running, local model otherwise
+                self._detectors[backend] = load_detector(self.model_path, backend=backend)
+            return self._detectors[backend]
+
 # -------------------------------
 # CAMERA PROCESSING
 # -------------------------------
-async def process_camera(camera_name, source, yolo_model):
+async def process_camera(camera_name, camera_id, source, detectors):
     # Open source
     if isinstance(source, int):
         cap = cv2.VideoCapture(source)  # webcam
@@ -130,6 +160,20 @@ async def process_camera(camera_name, source, yolo_model):
     print(f"📹 Camera {camera_name} started")
     last_yolo = 0
     last_ai_blind = 0
+    # YOLO only runs every YOLO_INTERVAL seconds here, so a track is confirmed
+    # on its first sighting and dropped after a couple of missed passes
+    tracker = IoUTracker(iou_threshold=0.3, max_age=TRACK_MAX_AGE, min_hits=1)
+    dedup = IncidentDeduplicator(cooldowns=INCIDENT_COOLDOWNS)
+
+    # Per-camera profile; pushed changes are applied between frames
+    default_profile = DetectionProfile(SECURITY_OBJECTS, CONFIDENCE_THRESHOLD, INCIDENT_COOLDOWNS)
+    profile = await asyncio.to_thread(fetch_profile, BACKEND_API, camera_id, default_profile)
+    profile = dataclasses.replace(profile, **PROFILE_OVERRIDES)
+    dedup.cooldowns.update(profile.cooldowns)
+    watcher = ProfileWatcher(BACKEND_API, camera_id, profile, default_profile).start()
+    yolo_model = await asyncio.to_thread(detectors.get, profile.inference_backend)
+    # Backend switches load in the background; detectors are shared, so never closed here
+    switcher = DetectorSwitcher(yolo_model, detectors.get, close_replaced=False)
 
     while True:
         start_time = time.time()
@@ -142,43 +186,64 @@ async def process_camera(camera_name, source, yolo_model):
             else:
                 await asyncio.sleep(1)
                 continue
+        trace = FrameTrace()
 
         now = time.time()
 
+        # Apply a pushed profile change between frames
+        updated = watcher.poll()
+        if updated:
+            profile = dataclasses.replace(updated, **PROFILE_OVERRIDES)
+            dedup.cooldowns.update(profile.cooldowns)
+            switcher.switch(profile.inference_backend)
+        yolo_model = switcher.current()
+
         # YOLO detection every YOLO_INTERVAL seconds
         if now - last_yolo >= YOLO_INTERVAL:
             last_yolo = now
-            results = yolo_model(frame)
-            detected_objects = []
-
-            for result in results:
-                for box in result.boxes:
-                    cls_idx = int(box.cls[0])
-                    class_name = yolo_model.names[cls_idx].lower()
-                    confidence = float(box.conf[0])
-                    if confidence < CONFIDENCE_THRESHOLD:
-                        continue
-                    if class_name in SECURITY_OBJECTS:
-                        detected_objects.append(class_name)
-                        # Draw box for visualization
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        color = (0, 0, 255) if SECURITY_OBJECTS[class_name]['risk']=='high' else (0, 165, 255)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        label = f"{class_name}: {confidence:.2f}"
-                        cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            # If YOLO detected something, call AI for confirmation
-            if detected_objects:
+            detections = yolo_model.detect(frame)
+            trace.mark('inferred')
+            new_objects = []
+
+            names = [yolo_model.names[int(c)].lower() for c in detections[:, 5]]
+            keep = [conf >= profile.confidence_threshold and name in profile.security_objects
+                    for conf, name in zip(detections[:, 4], names)]
+            detections = detections[keep]
+            risks = [risk_rank(profile.security_objects[name]['risk'])
+                     for name, k in zip(names, keep) if k]
+
+            for (x1, y1, x2, y2, confidence, cls) in detections:
+                class_name = yolo_model.names[int(cls)].lower()
+                # Draw box for visualization
+                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                color = (0, 0, 255) if profile.security_objects[class_name]['risk']=='high' else (0, 165, 255)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                label = f"{class_name}: {confidence:.2f}"
+                cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+            # Only objects that were not already being tracked are new, and
+            # repeats of the same class at the same spot are folded together
+            for event in tracker.update(detections, risks):
+                class_name = yolo_model.names[event.class_id].lower()
+                decision = dedup.check(camera_id, class_name, RISK_LEVELS[event.risk],
+                                       event.bbox, frame.shape)
+                if decision.emit:
+                    new_objects.append(decision.summary(class_name) or f"{class_name} #{event.track_id}")
+
+            # If YOLO saw a new object, call AI for confirmation
+            if new_objects:
                 ai_summary = await analyze_with_openai(frame)
+                trace.mark('verified')
                 if ai_summary and any(word in ai_summary.lower() for word in ['suspicious', 'weapon', 'danger', 'fire']):
-                    create_alert(camera_name, f"YOLO detected: {', '.join(detected_objects)}", ai_summary)
+                    create_alert(camera_name, camera_id, f"YOLO detected: {', '.join(new_objects)}", ai_summary, trace)
 
         # Blind AI check every 2 minutes
         if now - last_ai_blind >= AI_BLIND_INTERVAL:
             last_ai_blind = now
             ai_summary = await analyze_with_openai(frame)
+            trace.mark('verified')
             if ai_summary and any(word in ai_summary.lower() for word in ['suspicious', 'weapon', 'danger', 'fire']):
-                create_alert(camera_name, "Blind AI check", ai_summary)
+                create_alert(camera_name, camera_id, "Blind AI check", ai_summary, trace)
 
         # Display live stream
         display_frame = frame.copy()
@@ -199,14 +264,40 @@ async def process_camera(camera_name, source, yolo_model):
 # MAIN
 # -------------------------------
 async def main():
-    yolo_model = YOLO(YOLO_MODEL_PATH)
-    print(f"✅ YOLO model loaded: {YOLO_MODEL_PATH}")
+    detectors = DetectorCache(YOLO_MODEL_PATH)
 
     tasks = []
-    for cam_name, source in SOURCES.items():
-        tasks.append(asyncio.create_task(process_camera(cam_name, source, yolo_model)))
+    for cam_name, cam in SOURCES.items():
+        tasks.append(asyncio.create_task(
+            process_camera(cam_name, cam["camera_id"], cam["source"], detectors)))
 
     await asyncio.gather(*tasks)
 
+def parse_args():
+    """Command-line overrides (used by the video tester endpoint)"""
+    parser = argparse.ArgumentParser(description="Multi-source YOLO + AI security detector")
+    parser.add_argument("--source", help="Webcam index or video file to run on instead of SOURCES")
+    parser.add_argument("--camera-id", type=int, default=1, help="Camera ID in the Django DB for --source")
+    parser.add_argument("--confidence", type=float, help="YOLO confidence threshold")
+    parser.add_argument("--cooldown", type=float, help="Seconds between incidents for the same object, all risk levels")
+    parser.add_argument("--backend", help="Incident API endpoint")
+    parser.add_argument("--inference-backend", help="YOLO runtime: torch, onnx, onnx-int8, openvino, openvino-int8")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.source is not None:
+        source = int(args.source) if args.source.isdigit() else args.source
+        SOURCES = {os.path.basename(str(args.source)): {"camera_id": args.camera_id, "source": source}}
+    if args.confidence is not None:
+        CONFIDENCE_THRESHOLD = args.confidence
+        PROFILE_OVERRIDES['confidence_threshold'] = args.confidence
+    if args.cooldown is not None:
+        INCIDENT_COOLDOWNS = {risk: args.cooldown for risk in DEFAULT_COOLDOWNS}
+        PROFILE_OVERRIDES['cooldowns'] = INCIDENT_COOLDOWNS
+    if args.backend:
+        BACKEND_API = args.backend
+    if args.inference_backend:
+        PROFILE_OVERRIDES['inference_backend'] = args.inference_backend
     asyncio.run(main())
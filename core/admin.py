@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, Camera, Incident, Alert, Report, AIVerificationLog
+from .models import (User, Camera, DetectionProfile, Incident, IncidentRollup, Alert, Report, AIVerificationLog,
+                     OutboxEvent)
 
 
 # ==========================
@@ -22,6 +23,20 @@ class CameraAdmin(admin.ModelAdmin):
     ordering = ('name',)
 
 
+@admin.register(DetectionProfile)
+class DetectionProfileAdmin(admin.ModelAdmin):
+    list_display = ('camera', 'confidence_threshold', 'inference_backend', 'version', 'updated_at')
+    list_filter = ('inference_backend',)
+    search_fields = ('camera__name',)
+    readonly_fields = ('version', 'updated_at')
+    ordering = ('camera__name',)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.version += 1
+        super().save_model(request, obj, form, change)
+
+
 @admin.register(Incident)
 class IncidentAdmin(admin.ModelAdmin):
     list_display = ('id', 'camera', 'detected_by', 'timestamp', 'is_verified')
@@ -31,9 +46,17 @@ class IncidentAdmin(admin.ModelAdmin):
     ordering = ('-timestamp',)
 
 
+@admin.register(IncidentRollup)
+class IncidentRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket', 'resolution', 'camera', 'type', 'detected_by', 'count')
+    list_filter = ('resolution', 'type', 'detected_by')
+    date_hierarchy = 'bucket'
+    ordering = ('-bucket',)
+
+
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
-    list_display = ('id', 'message_preview', 'created_by', 'created_at', 'acknowledged')
+    list_display = ('id', 'message_preview', 'created_by', 'created_at', 'acknowledged', 'acknowledged_at')
     list_filter = ('acknowledged', 'created_at')
     search_fields = ('message', 'created_by__username')
     date_hierarchy = 'created_at'
@@ -46,8 +69,8 @@ class AlertAdmin(admin.ModelAdmin):
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
-    list_display = ('id', 'generated_by', 'created_at', 'period_start', 'period_end')
-    list_filter = ('created_at',)
+    list_display = ('id', 'generated_by', 'created_at', 'period_start', 'period_end', 'status')
+    list_filter = ('status', 'created_at')
     search_fields = ('generated_by__username', 'summary')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
@@ -60,3 +83,11 @@ class AIVerificationLogAdmin(admin.ModelAdmin):
     search_fields = ('incident__camera__name', 'decision')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'group', 'created_at', 'published_at', 'seq', 'attempts', 'last_error')
+    list_filter = ('group',)
+    date_hierarchy = 'created_at'
+    ordering = ('-id',)
@@ -0,0 +1,166 @@
+"""
+Alert creation and broadcasting.
+
+``create_for_incident()`` is the one place incidents raise alerts. The alert
+is keyed by ``Alert.idempotency_key``, so a retried request or a second code
+path finds the existing alert instead of writing another row.
+
+``broadcast()`` is the one place alerts reach the ``alerts`` WebSocket groups.
+The Alert signals call it for every save and delete; the message goes
+through the outbox (core/outbox.py), so it is sent once the transaction
+commits, never for a rolled back write, and never from the request thread.
+Views must not send their own. Updates are sent as deltas (see ``broadcast``),
+and only to subscribers of the alert's camera and severity (see ROUTING).
+``acknowledge()`` is the bulk path: one UPDATE and one event per camera and
+severity for many alerts.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import outbox, stats
+from .models import Alert, Incident
+
+GROUP = 'alerts'
+SITE_GROUP = 'alerts.site'  # alerts without an incident and bulk changes, for every subscriber
+ALL = 'all'
+EVENTS = ('created', 'updated', 'deleted')
+
+
+# ==========================
+#  ROUTING
+# ==========================
+# Each alert event goes to four groups: its camera and severity, its camera
+# (any severity), its severity (any camera), and everything (GROUP). A
+# subscriber joins the groups of one of those shapes only, so it receives
+# each matching event once and nothing else.
+
+def group_name(camera=ALL, severity=ALL):
+    if camera == ALL and severity == ALL:
+        return GROUP
+    return f'{GROUP}.c{camera}.s{severity}'
+
+
+def subscription_groups(cameras=None, severities=None):
+    """Groups to join for the given camera ids and severity levels (None: any)"""
+    return [SITE_GROUP] + [group_name(camera, severity)
+                           for camera in (cameras or [ALL]) for severity in (severities or [ALL])]
+
+
+def _groups_for(alert):
+    incident = alert.incident if Alert.incident.is_cached(alert) else None
+    if incident is None and alert.incident_id is not None:
+        incident = Incident.objects.filter(pk=alert.incident_id).only('camera_id', 'severity_level').first()
+    if incident is None:
+        # No incident, or it was deleted along with the alert
+        return [SITE_GROUP] if alert.incident_id is None else [GROUP]
+    return _route(incident.camera_id, incident.severity_level)
+
+
+def _route(camera, severity):
+    return [group_name(camera, severity), group_name(camera, ALL), group_name(ALL, severity), GROUP]
+
+
+def incident_key(incident):
+    return f'incident:{incident.pk}'
+
+
+def create_for_incident(incident, title=None, message=None, created_by=None):
+    """The incident's alert, created on first call; returns (alert, created)"""
+    defaults = {
+        'incident': incident,
+        'title': title or f"⚠️ Critical Alert - {incident.camera.name}",
+        'message': message or f"Critical incident detected: {incident.description or 'no description'}",
+        'created_by': created_by,
+    }
+    key = incident_key(incident)
+    try:
+        with transaction.atomic():
+            return Alert.objects.get_or_create(idempotency_key=key, defaults=defaults)
+    except IntegrityError:
+        # Created concurrently since the lookup
+        return Alert.objects.get(idempotency_key=key), False
+
+
+# Fields an update can carry in a partial frame; other changes send the whole alert
+PARTIAL_FIELDS = ('title', 'message', 'acknowledged', 'acknowledged_at')
+TRACKED_FIELDS = PARTIAL_FIELDS + ('incident_id', 'created_by_id')
+
+
+def snapshot(alert):
+    """Tracked field values as loaded (fields deferred by .only()/.defer() are missing)"""
+    return {field: alert.__dict__[field] for field in TRACKED_FIELDS if field in alert.__dict__}
+
+
+def changed_fields(alert, before):
+    """Tracked fields changed since ``before``, or None if that can't be told"""
+    if len(before) != len(TRACKED_FIELDS):
+        return None
+    return {field for field in TRACKED_FIELDS if getattr(alert, field) != before[field]}
+
+
+def broadcast(alert, action, changed=None):
+    """
+    Queue ``alert_message`` for a created/updated/deleted alert (sent after commit).
+
+    Created alerts carry the full nested alert. Updates whose ``changed`` fields
+    are all in PARTIAL_FIELDS carry just those and the id, flagged ``partial``:
+    clients merge them into the alert they already hold. Deletes carry the id.
+    """
+    from .serializers import AlertSerializer
+
+    data = {'action': action}
+    if action == 'deleted':
+        data['alert'] = {'id': alert.id}
+    elif action == 'updated' and changed is not None and changed <= set(PARTIAL_FIELDS):
+        if not changed:
+            return
+        fields = AlertSerializer().fields
+        data['alert'] = {'id': alert.id, **{
+            field: fields[field].to_representation(value) if value is not None else None
+            for field in sorted(changed) for value in [getattr(alert, field)]
+        }}
+        data['partial'] = True
+    else:
+        data['alert'] = AlertSerializer(alert).data
+    meta = {'action': action}
+    incident = data['alert'].get('incident')
+    if action == 'created' and incident and incident.get('trace'):
+        meta['traced'] = [incident['id']]  # see core/tracing.py
+    outbox.send(_groups_for(alert), 'alert_message', {
+        'type': 'alert',
+        'message': f'Alert {action}',
+        'data': data,
+    }, **meta)
+
+
+def acknowledge(queryset):
+    """
+    Acknowledge the queryset's unacknowledged alerts with one UPDATE; returns
+    their ids. Alert signals don't fire: an ``updated`` event per camera and
+    severity lists the ids and the fields they all got, for clients to merge
+    like a partial update, and goes to the groups those alerts route to.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # The write transaction (IMMEDIATE) keeps the two statements on the same rows
+        rows = list(queryset.filter(acknowledged=False).order_by('id')
+                    .values_list('id', 'incident_id', 'incident__camera_id', 'incident__severity_level'))
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        Alert.objects.filter(id__in=ids).update(acknowledged=True, acknowledged_at=now)
+        routes = {}
+        for alert_id, incident_id, camera, severity in rows:
+            groups = [SITE_GROUP] if incident_id is None else _route(camera, severity)
+            routes.setdefault(tuple(groups), []).append(alert_id)
+        for groups, route_ids in routes.items():
+            outbox.send(list(groups), 'alert_message', {
+                'type': 'alert',
+                'message': f'{len(route_ids)} alerts acknowledged',
+                'data': {'action': 'updated', 'ids': route_ids,
+                         'alert': {'acknowledged': True, 'acknowledged_at': now}, 'partial': True},
+            }, action='updated')
+        # Bypassing the signals, the in-memory stats reload on their next read
+        transaction.on_commit(stats.dashboard.mark_dirty)
+    return ids
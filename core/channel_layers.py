@@ -0,0 +1,434 @@
+"""
+Channel layer for several server processes on one machine, without Redis.
+
+channels' InMemoryChannelLayer keeps groups inside one process, so an alert
+published by one daphne worker never reaches sockets held by another. Here
+a broker process (``python manage.py channel_broker``) holds every channel
+queue and group, and each server process reaches it over a Unix socket:
+
+    CHANNEL_LAYERS = {'default': {
+        'BACKEND': 'core.channel_layers.UnixSocketChannelLayer',
+        'CONFIG': {'path': '/tmp/ai_security_channels.sock'},
+    }}
+
+(settings.py does this when ``CHANNEL_BROKER_SOCKET`` is set.) Semantics
+follow channels' own layers:
+
+- ``send`` raises ChannelFull once a channel holds ``capacity`` messages;
+  ``group_send`` skips full channels
+- an unreceived message expires after ``expiry`` seconds, and its channel
+  leaves every group (nobody is reading it)
+- group membership lasts ``group_expiry`` seconds unless renewed
+- when a server process disconnects, its process-specific channels leave
+  every group; when it reconnects, it rejoins them
+
+The wire format is the inference server's (backend/inference.py): a
+length-prefixed JSON header, then ``nbytes`` of payload. Messages travel as
+the payload, JSON-encoded once by the sender; the broker never decodes them.
+Messages must therefore be JSON-serializable, which all of ours are.
+
+Only channels and groups are shared. The dashboard stats, dashboard
+coalescing, latency histograms and ingest writer stay per process, so their
+figures are per process too (see OUTBOX_PUBLISH in settings.py).
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import struct
+import time
+import uuid
+from collections import deque
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+DEFAULT_SOCKET = os.environ.get('CHANNEL_BROKER_SOCKET', '/tmp/ai_security_channels.sock')
+MAX_CLIENT_BUFFER = 16 * 1024 * 1024  # Unsent bytes after which the broker drops a stalled client
+
+_LEN = struct.Struct('!I')
+
+
+# ==========================
+#  WIRE PROTOCOL
+# ==========================
+
+def _frame(header, payload=b''):
+    if payload:
+        header = dict(header, nbytes=len(payload))
+    data = json.dumps(header).encode()
+    return _LEN.pack(len(data)) + data + payload
+
+
+async def _read_frame(reader):
+    """Return (header, payload)"""
+    (size,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    header = json.loads(await reader.readexactly(size))
+    nbytes = header.get('nbytes', 0)
+    return header, (await reader.readexactly(nbytes) if nbytes else b'')
+
+
+# ==========================
+#  BROKER
+# ==========================
+
+class _Peer:
+    """A connected server process"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.channels = set()  # process-specific channels it receives on
+
+    @property
+    def alive(self):
+        return not self.writer.is_closing()
+
+    def reply(self, header, payload=b''):
+        if not self.alive:
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            print("Channel broker: dropping a client that stopped reading")
+            self.writer.close()
+            return
+        self.writer.write(_frame(header, payload))
+
+
+class Broker:
+    """Channel queues and groups shared by every connected process"""
+
+    def __init__(self):
+        self.channels = {}  # channel -> deque of (expires, payload)
+        self.waiters = {}  # channel -> deque of (peer, request id) blocked in receive
+        self.groups = {}  # group -> {channel: membership expires}
+
+    async def serve(self, path=DEFAULT_SOCKET, sweep_interval=1.0):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path)
+        os.chmod(path, 0o660)
+        try:
+            async with server:
+                while True:
+                    await asyncio.sleep(sweep_interval)
+                    self.sweep()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    async def handle(self, reader, writer):
+        peer = _Peer(writer)
+        try:
+            while True:
+                try:
+                    header, payload = await _read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                try:
+                    self.dispatch(peer, header, payload)
+                except Exception as e:
+                    peer.reply({'id': header.get('id'), 'error': str(e) or e.__class__.__name__})
+                await writer.drain()
+        finally:
+            self.disconnect(peer)
+            writer.close()
+
+    def dispatch(self, peer, header, payload):
+        op, request_id, now = header['op'], header['id'], time.time()
+        if op == 'receive':
+            channel = header['channel']
+            if '!' in channel:
+                peer.channels.add(channel)
+            message = self._pop(channel, now)
+            if message is None:
+                self.waiters.setdefault(channel, deque()).append((peer, request_id))
+            else:
+                peer.reply({'id': request_id}, message)
+            return
+        if op == 'send':
+            if not self._deliver(header['channel'], payload, now + header['expiry'], header['capacity']):
+                peer.reply({'id': request_id, 'error': f"{header['channel']} is full", 'full': True})
+                return
+        elif op == 'group_send':
+            for channel in list(self.groups.get(header['group'], ())):
+                self._deliver(channel, payload, now + header['expiry'], header['capacity'])
+        elif op == 'group_add':
+            self.groups.setdefault(header['group'], {})[header['channel']] = now + header['expiry']
+        elif op == 'group_discard':
+            members = self.groups.get(header['group'])
+            if members is not None:
+                members.pop(header['channel'], None)
+                if not members:
+                    del self.groups[header['group']]
+        elif op == 'cancel':
+            # The client gave up waiting: answer its blocked receive empty
+            waiters = self.waiters.get(header['channel'], ())
+            for waiter in [w for w in waiters if w[0] is peer]:
+                waiters.remove(waiter)
+                peer.reply({'id': waiter[1]})
+            if not waiters:
+                self.waiters.pop(header['channel'], None)
+        elif op == 'flush':
+            self.channels.clear()
+            self.groups.clear()
+        else:
+            raise ValueError(f"Unknown op {op!r}")
+        peer.reply({'id': request_id})
+
+    def _pop(self, channel, now):
+        queue = self.channels.get(channel)
+        message = None
+        while queue and message is None:
+            expires, payload = queue.popleft()
+            if expires >= now:
+                message = payload
+        if queue is not None and not queue:
+            del self.channels[channel]
+        return message
+
+    def _deliver(self, channel, payload, expires, capacity):
+        waiters = self.waiters.get(channel)
+        while waiters:
+            peer, request_id = waiters.popleft()
+            if not waiters:
+                del self.waiters[channel]
+            if peer.alive:
+                peer.reply({'id': request_id}, payload)
+                return True
+        queue = self.channels.setdefault(channel, deque())
+        if len(queue) >= capacity:
+            return False
+        queue.append((expires, payload))
+        return True
+
+    def sweep(self, now=None):
+        """Drop expired messages (and their channels' memberships) and expired memberships"""
+        now = now or time.time()
+        abandoned = set()
+        for channel, queue in list(self.channels.items()):
+            while queue and queue[0][0] < now:
+                queue.popleft()
+                abandoned.add(channel)
+            if not queue:
+                del self.channels[channel]
+        self._remove_from_groups(abandoned)
+        for group, members in list(self.groups.items()):
+            for channel in [c for c, expires in members.items() if expires < now]:
+                del members[channel]
+            if not members:
+                del self.groups[group]
+
+    def disconnect(self, peer):
+        for channel in peer.channels:
+            self.channels.pop(channel, None)
+            self.waiters.pop(channel, None)
+        self._remove_from_groups(peer.channels)
+
+    def _remove_from_groups(self, channels):
+        if not channels:
+            return
+        for group, members in list(self.groups.items()):
+            for channel in members.keys() & channels:
+                del members[channel]
+            if not members:
+                del self.groups[group]
+
+
+# ==========================
+#  CLIENT
+# ==========================
+
+class _Connection:
+    """One process's connection to the broker, for one event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.writer = None
+        self.closed = False
+        self.requests = {}  # request id -> future of the reply payload
+        self.ids = itertools.count(1)
+        self.receiving = {}  # channel -> future of its outstanding receive
+        self.received = {}  # channel -> deque of messages that arrived after receive() was cancelled
+
+    async def open(self, path):
+        try:
+            reader, self.writer = await asyncio.open_unix_connection(path)
+        except BaseException:
+            self.closed = True
+            raise
+        self.loop.create_task(self._read(reader))
+
+    def start(self, header, payload=b''):
+        """Send a request; returns the future of its reply"""
+        if self.closed:
+            raise ConnectionError("Channel broker connection lost")
+        request_id = next(self.ids)
+        future = self.requests[request_id] = self.loop.create_future()
+        self.writer.write(_frame(dict(header, id=request_id), payload))
+        return future
+
+    async def request(self, header, payload=b''):
+        future = self.start(header, payload)
+        await self.writer.drain()
+        return await future
+
+    def notify(self, header):
+        """Send a request nobody waits for"""
+        self.start(header).add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def _read(self, reader):
+        try:
+            while True:
+                header, payload = await _read_frame(reader)
+                future = self.requests.pop(header['id'], None)
+                if future is None or future.done():
+                    continue
+                if 'error' in header:
+                    future.set_exception((ChannelFull if header.get('full') else RuntimeError)(header['error']))
+                else:
+                    future.set_result(payload)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            self.closed = True
+            for future in self.requests.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Channel broker connection lost"))
+            self.requests.clear()
+            self.writer.close()
+
+    def _received(self, channel, future):
+        self.receiving.pop(channel, None)
+        if not future.cancelled() and future.exception() is None and future.result():
+            self.received.setdefault(channel, deque()).append(json.loads(future.result()))
+
+    def close(self):
+        if self.writer is not None and not self.loop.is_closed():
+            self.writer.close()
+
+
+class UnixSocketChannelLayer(BaseChannelLayer):
+    """Client for the channel broker; one connection per event loop"""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=DEFAULT_SOCKET, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 reconnect_delay=1.0, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = path
+        self.group_expiry = group_expiry
+        self.reconnect_delay = reconnect_delay
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self._connections = {}  # event loop -> _Connection
+        self._opening = {}  # event loop -> task opening its connection
+        self._memberships = set()  # (group, channel) of this process's channels, restored on reconnect
+
+    def _is_local(self, channel):
+        return self.non_local_name(channel).endswith(f'.{self.client_prefix}!')
+
+    async def _connection(self):
+        loop = asyncio.get_running_loop()
+        connection = self._connections.get(loop)
+        if connection is not None and not connection.closed:
+            return connection
+        opening = self._opening.get(loop)
+        if opening is None or opening.done() and (opening.exception() or opening.result().closed):
+            for stale in [other for other in self._connections if other.is_closed()]:
+                del self._connections[stale]
+                self._opening.pop(stale, None)
+            opening = self._opening[loop] = loop.create_task(self._open(loop))
+        return await asyncio.shield(opening)
+
+    async def _open(self, loop):
+        connection = _Connection(loop)
+        await connection.open(self.path)
+        # Rejoin after a reconnect; the broker dropped this process's channels from their groups
+        for group, channel in self._memberships:
+            connection.notify({'op': 'group_add', 'group': group, 'channel': channel, 'expiry': self.group_expiry})
+        self._connections[loop] = connection
+        return connection
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+        connection = await self._connection()
+        await connection.request({
+            'op': 'send', 'channel': channel, 'expiry': self.expiry, 'capacity': self.get_capacity(channel),
+        }, json.dumps(message, separators=(',', ':')).encode())
+
+    async def receive(self, channel):
+        """
+        The next message on ``channel``. Waits out broker outages (reconnecting
+        every ``reconnect_delay`` seconds) instead of failing the consumer.
+        """
+        assert self.valid_channel_name(channel)
+        while True:
+            try:
+                connection = await self._connection()
+            except OSError as e:
+                print(f"Channel broker unavailable at {self.path} ({e}), retrying in {self.reconnect_delay}s")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            pending = connection.received.get(channel)
+            if pending:
+                message = pending.popleft()
+                if not pending:
+                    del connection.received[channel]
+                return message
+            waiting = connection.receiving.get(channel)
+            if waiting is None:
+                waiting = connection.receiving[channel] = connection.start({'op': 'receive', 'channel': channel})
+                waiting.add_done_callback(lambda future: connection._received(channel, future))
+            try:
+                # Shielded: a message already on its way when we're cancelled is kept for the next receive()
+                await asyncio.shield(waiting)
+            except ConnectionError:
+                continue
+            except asyncio.CancelledError:
+                if not waiting.done() and not connection.closed:
+                    connection.notify({'op': 'cancel', 'channel': channel})
+                raise
+
+    async def new_channel(self, prefix='specific'):
+        return f'{prefix}.{self.client_prefix}!{uuid.uuid4().hex[:12]}'
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        connection = await self._connection()
+        await connection.request({'op': 'group_add', 'group': group, 'channel': channel, 'expiry': self.group_expiry})
+        if self._is_local(channel):
+            self._memberships.add((group, channel))
+
+    async def group_discard(self, group, channel):
+        assert self.valid_channel_name(channel), "Invalid channel name"
+        assert self.valid_group_name(group), "Invalid group name"
+        self._memberships.discard((group, channel))
+        connection = await self._connection()
+        await connection.request({'op': 'group_discard', 'group': group, 'channel': channel})
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Invalid group name"
+        connection = await self._connection()
+        await connection.request({
+            'op': 'group_send', 'group': group, 'expiry': self.expiry, 'capacity': self.capacity,
+        }, json.dumps(message, separators=(',', ':')).encode())
+
+    # Flush extension
+
+    async def flush(self):
+        self._memberships.clear()
+        connection = await self._connection()
+        await connection.request({'op': 'flush'})
+
+    async def close(self):
+        connection = self._connections.pop(asyncio.get_running_loop(), None)
+        if connection is not None:
+            connection.close()
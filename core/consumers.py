@@ -1,32 +1,79 @@
+import asyncio
 import json
+import time
+from urllib.parse import parse_qs
+from channels.generic.http import AsyncHttpConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Alert, Incident, Camera
+from channels.exceptions import StopConsumer
+from django.conf import settings
+from django.db import OperationalError
+from rest_framework.utils.encoders import JSONEncoder
+from .models import Camera
+from . import alerts, ingest, stats
+from .dashboard import publisher as dashboard_publisher
+from .outbox import OutboxBatchMixin
 
 
-class AlertConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for real-time alerts"""
+class AlertConsumer(OutboxBatchMixin, AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for real-time alerts.
+
+    Clients receive every alert unless they subscribe, in the query string
+    (``/ws/alerts/?cameras=1,2&severities=3&events=created``) or later with
+    ``{"type": "subscribe", "cameras": [1, 2], "severities": [3], "events": ["created"]}``.
+    Omitted filters match everything.
+
+    Events carry a ``seq``; reconnecting with ``?last_seq=<seq>`` replays the
+    ones missed in between (see OutboxBatchMixin.catch_up).
+    """
     
     async def connect(self):
-        self.room_group_name = 'alerts'
-        
-        # Join room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        self.alert_groups = []
+        self.events = None
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            subscription = self.parse_subscription({
+                key: query[key][0].split(',') for key in ('cameras', 'severities', 'events') if query.get(key)
+            })
+            last_seq = int(query['last_seq'][0]) if query.get('last_seq') else None
+        except ValueError:
+            await self.close(code=4400)
+            return
+
+        # Join room groups
+        await self.subscribe(**subscription)
         
         await self.accept()
         print(f"WebSocket connected: {self.channel_name}")
+        await self.catch_up(self.alert_groups, last_seq)
 
     async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        # Leave room groups
+        for group in self.alert_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
         print(f"WebSocket disconnected: {self.channel_name}")
 
+    @staticmethod
+    def parse_subscription(data):
+        """{'cameras': [...], 'severities': [...], 'events': [...]} -> subscribe() kwargs"""
+        cameras = [int(c) for c in data.get('cameras') or []]
+        severities = [int(s) for s in data.get('severities') or []]
+        events = list(data.get('events') or [])
+        if any(s not in (1, 2, 3) for s in severities) or any(e not in alerts.EVENTS for e in events):
+            raise ValueError("severities are 1-3, events are " + ", ".join(alerts.EVENTS))
+        return {'cameras': cameras, 'severities': severities, 'events': events}
+
+    async def subscribe(self, cameras=(), severities=(), events=()):
+        groups = alerts.subscription_groups(cameras, severities)
+        for group in set(self.alert_groups) - set(groups):
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in set(groups) - set(self.alert_groups):
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.alert_groups = groups
+        self.events = set(events) or None
+        self.subscription = {'cameras': list(cameras), 'severities': list(severities), 'events': list(events)}
+
     # Receive message from WebSocket
     async def receive(self, text_data):
         try:
@@ -38,23 +85,23 @@ class AlertConsumer(AsyncWebsocketConsumer):
                     'type': 'pong',
                     'message': 'Connection alive'
                 }))
+            elif message_type == 'subscribe':
+                try:
+                    await self.subscribe(**self.parse_subscription(data))
+                except (TypeError, ValueError) as e:
+                    await self.send(text_data=json.dumps({'type': 'error', 'message': f'Invalid subscription: {e}'}))
+                    return
+                await self.send(text_data=json.dumps({'type': 'subscribed', **self.subscription}))
         except json.JSONDecodeError:
             pass
 
-    # Receive message from room group
+    # Receive message from room group (encoded once by core.alerts.broadcast)
     async def alert_message(self, event):
-        message = event['message']
-        alert_data = event.get('alert_data', {})
-        
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'alert',
-            'message': message,
-            'data': alert_data
-        }))
+        if self.events is None or event.get('action') in self.events:
+            await self.send_encoded(event)
 
 
-class CameraConsumer(AsyncWebsocketConsumer):
+class CameraConsumer(OutboxBatchMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for camera feeds"""
     
     async def connect(self):
@@ -93,6 +140,8 @@ class CameraConsumer(AsyncWebsocketConsumer):
 
     async def camera_frame(self, event):
         """Send camera frame data to WebSocket"""
+        if 'text' in event:
+            return await self.send_encoded(event)
         frame_data = event.get('frame_data', {})
         
         await self.send(text_data=json.dumps({
@@ -103,6 +152,8 @@ class CameraConsumer(AsyncWebsocketConsumer):
 
     async def camera_detection(self, event):
         """Send detection data to WebSocket"""
+        if 'text' in event:
+            return await self.send_encoded(event)
         detection_data = event.get('detection_data', {})
         
         await self.send(text_data=json.dumps({
@@ -111,12 +162,22 @@ class CameraConsumer(AsyncWebsocketConsumer):
             'data': detection_data
         }))
 
+    async def detection_profile(self, event):
+        """Send an updated detection profile to the camera's detectors"""
+        await self.send_encoded(event)
 
-class DashboardConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for dashboard updates"""
+
+class DashboardConsumer(OutboxBatchMixin, AsyncWebsocketConsumer):
+    """WebSocket consumer for dashboard updates (``?last_seq=`` replays missed ones)"""
     
     async def connect(self):
         self.room_group_name = 'dashboard'
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            last_seq = int(query['last_seq'][0]) if query.get('last_seq') else None
+        except ValueError:
+            await self.close(code=4400)
+            return
         
         # Join room group
         await self.channel_layer.group_add(
@@ -126,6 +187,15 @@ class DashboardConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         print(f"Dashboard WebSocket connected: {self.channel_name}")
+        await self.catch_up([self.room_group_name], last_seq)
+
+        # Updates are pushed from here on; start from the current stats
+        dashboard_publisher.bind_loop(asyncio.get_running_loop())
+        snapshot = await database_sync_to_async(stats.dashboard.snapshot)()
+        await self.send(text_data=json.dumps({
+            'type': 'dashboard_update',
+            'data': {'incidents': [], 'stats': snapshot},
+        }, cls=JSONEncoder))
 
     async def disconnect(self, close_code):
         # Leave room group
@@ -149,11 +219,86 @@ class DashboardConsumer(AsyncWebsocketConsumer):
             pass
 
     async def dashboard_update(self, event):
-        """Send dashboard update to WebSocket"""
-        update_data = event.get('data', {})
-        
-        await self.send(text_data=json.dumps({
-            'type': 'dashboard_update',
-            'data': update_data
-        }))
+        """Send dashboard update to WebSocket (encoded once by core.dashboard)"""
+        await self.send_encoded(event)
+
+
+
+class IngestConsumer(AsyncHttpConsumer):
+    """
+    ``POST /api/incidents/ingest/``: incident ingest for detectors, on the event loop.
+
+    Takes the JSON payload of ``POST /api/incidents/`` and answers 201 with
+    the new incident's id and timestamp rather than the serialized incident.
+    Routed ahead of Django (backend/asgi.py), so no middleware runs and the
+    request never holds a thread: the payload is checked by
+    ``ingest.parse_incident``, the camera is fetched with the async ORM, and
+    the write is awaited from the ingest writer's next batch. Its broadcasts
+    are published from the outbox as usual. A body over
+    ``DATA_UPLOAD_MAX_MEMORY_SIZE`` is refused (413) before it is buffered, and
+    a failed write answers a JSON 503 (retry) or 500.
+    """
+
+    async def http_request(self, message):
+        # Refuse an oversized body before buffering it: by its Content-Length up
+        # front, and by what has arrived for chunked uploads that don't send one
+        size = sum(map(len, self.body)) + len(message.get('body', b''))
+        if size > settings.DATA_UPLOAD_MAX_MEMORY_SIZE or self.declared_length() > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            try:
+                await self.respond(413, {'error': 'Request body too large'})
+            finally:
+                await self.disconnect()
+                raise StopConsumer()
+        await super().http_request(message)
+
+    def declared_length(self):
+        for name, value in self.scope['headers']:
+            if name.lower() == b'content-length':
+                try:
+                    return int(value)
+                except ValueError:
+                    return 0
+        return 0
+
+    async def handle(self, body):
+        received = time.time()
+        if self.scope['method'] != 'POST':
+            await self.respond(405, {'error': 'Method not allowed'}, [(b'Allow', b'POST')])
+            return
+        try:
+            camera_id, fields = ingest.parse_incident(json.loads(body))
+        except ValueError as e:  # including malformed JSON
+            await self.respond(400, {'error': str(e)})
+            return
+        try:
+            camera = await Camera.objects.aget(id=camera_id)
+        except Camera.DoesNotExist:
+            await self.respond(404, {'error': 'Invalid camera ID'})
+            return
+        if fields['trace']:
+            fields['trace']['received'] = received
+
+        # Coalesce the dashboard updates this raises on this loop, even with no dashboard open here
+        dashboard_publisher.bind_loop(asyncio.get_running_loop())
+        try:
+            incident = await ingest.writer.arun(lambda: ingest.create_incident(camera, **fields))
+        except (TimeoutError, OperationalError) as e:
+            # Writer backed up or the database locked: the detector should retry
+            await self.respond(503, {'error': f'Ingest unavailable: {e}'}, [(b'Retry-After', b'1')])
+            return
+        except Exception as e:
+            print(f"Ingest error: {e}")
+            await self.respond(500, {'error': f'Ingest failed: {e}'})
+            return
+        await self.respond(201, {
+            'id': incident.id,
+            'camera_id': camera.id,
+            'type': incident.type,
+            'detected_by': incident.detected_by,
+            'timestamp': incident.timestamp,
+            'trace_id': incident.trace_id,
+        })
 
+    async def respond(self, status, data, headers=()):
+        await self.send_response(status, json.dumps(data, cls=JSONEncoder).encode(),
+                                 headers=[(b'Content-Type', b'application/json'), *headers])
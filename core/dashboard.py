@@ -0,0 +1,123 @@
+"""
+Coalescing publisher for the ``dashboard`` WebSocket group.
+
+Signals report changed incidents and dashboard stats here once their
+transaction commits. Instead of one message per write, changes are collected
+and sent as a single ``dashboard_update`` at most once every
+``DASHBOARD_PUSH_INTERVAL`` seconds:
+
+    {"incidents": [<changed incidents, newest first>], "stats": {...}}
+
+``stats`` is only present when the stats changed. A quiet system sends
+nothing, and a burst of detections costs one message per interval however
+many dashboards are open, and incidents and stats are rendered once per
+message, not per write. Updates go out through the outbox (core/outbox.py),
+so they are sequenced and replayed to dashboards that reconnect like alerts.
+Flushes run on the server's loop, or on a timer thread in processes without
+one (management commands).
+"""
+
+import contextvars
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import outbox, stats
+
+GROUP = 'dashboard'
+
+
+class DashboardPublisher:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._incidents = {}  # id -> changed incident, latest wins; serialized when sent
+        self._stats = False  # stats changed since the last message
+        self._scheduled = False
+        self._due = 0.0  # monotonic time the scheduled flush should run by
+        self._last_sent = 0.0
+        self._loop = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'DASHBOARD_PUSH_INTERVAL', 1.0)
+
+    def bind_loop(self, loop):
+        """Flush on the server's event loop (set by DashboardConsumer and IngestConsumer)"""
+        self._loop = loop
+
+    def incident_changed(self, incident):
+        transaction.on_commit(lambda: self._queue(incident=incident))
+
+    def stats_changed(self):
+        self._queue(stats=True)
+
+    def _queue(self, incident=None, stats=False):
+        with self._lock:
+            if incident is not None:
+                self._incidents[incident.pk] = incident
+            self._stats |= stats
+            now = time.monotonic()
+            # A flush well overdue was lost (its loop stopped before running it): schedule another
+            if self._scheduled and now < self._due + self.interval:
+                return
+            self._scheduled = True
+            delay = max(0.0, self._last_sent + self.interval - now)
+            self._due = now + delay
+        self._schedule(delay)
+
+    def _schedule(self, delay):
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            try:
+                # Fresh context: don't carry the calling thread's asgiref state into the loop
+                loop.call_soon_threadsafe(lambda: loop.call_later(delay, lambda: loop.create_task(self.flush())),
+                                          context=contextvars.Context())
+                return
+            except RuntimeError:
+                pass  # the loop closed meanwhile
+        # No server loop in this process (e.g. a management command): coalesce on a
+        # timer thread, for dashboards served by other processes. Not a daemon, so
+        # the last changes still go out when the command exits.
+        timer = threading.Timer(delay, self._send_from_thread)
+        timer.start()
+
+    def _send_from_thread(self):
+        try:
+            self._send()
+        finally:
+            connection.close()
+
+    async def flush(self):
+        await database_sync_to_async(self._send)()
+
+    def _send(self):
+        from .serializers import IncidentSerializer
+
+        with self._lock:
+            incidents, self._incidents = self._incidents, {}
+            stats_changed, self._stats = self._stats, False
+            self._scheduled = False
+            self._last_sent = time.monotonic()
+        if not incidents and not stats_changed:
+            return
+
+        # Once per flush rather than per write; the camera comes with the incident
+        incidents = sorted(incidents.values(), key=lambda i: (i.timestamp, i.pk), reverse=True)
+        data = {'incidents': IncidentSerializer(incidents, many=True).data}
+        if stats_changed:
+            data['stats'] = stats.dashboard.snapshot()
+        # Announces traced incidents (core/tracing.py)
+        traced = [incident['id'] for incident in data['incidents'] if incident.get('trace')]
+        try:
+            outbox.send(GROUP, 'dashboard_update', {'type': 'dashboard_update', 'data': data},
+                        **({'traced': traced} if traced else {}))
+        except Exception as e:
+            print(f"Error sending dashboard update: {e}")
+
+
+publisher = DashboardPublisher()
+stats.dashboard.subscribe(publisher.stats_changed)
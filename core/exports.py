@@ -0,0 +1,186 @@
+"""
+Streaming exports of incidents and alerts for audits.
+
+    GET /api/export/incidents/?start=&end=&camera=1,2&type=DANGEROUS&format=csv|ndjson&gzip=1
+    GET /api/export/alerts/?...  (camera and type apply to the alert's incident)
+
+``?archived=1`` also streams the rows retention has moved to the archive
+(core/retention.py), ahead of the live rows.
+
+Rows are read with ``QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE)`` as
+plain tuples and written out in chunks of roughly ``BUFFER_SIZE`` bytes, so
+memory stays flat however many rows match. These are plain Django views:
+DRF would render the response itself and reserves ``?format=``.
+"""
+
+import csv
+import itertools
+import json
+import zlib
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from . import retention
+from .models import Incident, Alert
+from .views import _parse_time
+
+BUFFER_SIZE = 64 * 1024
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+INCIDENT_COLUMNS = [
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('camera_id', 'camera_id'),
+    ('camera', 'camera__name'),
+    ('type', 'type'),
+    ('severity_level', 'severity_level'),
+    ('confidence_score', 'confidence_score'),
+    ('is_verified', 'is_verified'),
+    ('detected_by', 'detected_by'),
+    ('description', 'description'),
+]
+
+ALERT_COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('incident_id', 'incident_id'),
+    ('camera_id', 'incident__camera_id'),
+    ('incident_type', 'incident__type'),
+    ('title', 'title'),
+    ('message', 'message'),
+    ('acknowledged', 'acknowledged'),
+    ('acknowledged_at', 'acknowledged_at'),
+    ('created_by', 'created_by__username'),
+]
+
+
+class _Buffer:
+    """File-like sink for csv.writer"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+        return len(value)
+
+    def take(self):
+        data, self.parts = ''.join(self.parts), []
+        return data
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_chunks(names, rows):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    size = writer.writerow(names)
+    for row in rows:
+        size += writer.writerow([_plain(value) for value in row])
+        if size >= BUFFER_SIZE:
+            yield buffer.take().encode()
+            size = 0
+    yield buffer.take().encode()
+
+
+def ndjson_chunks(names, rows):
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(names, map(_plain, row))))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= BUFFER_SIZE:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines, size = [], 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def _async_chunks(chunks):
+    # Under ASGI Django would collect a sync iterator into a list before sending;
+    # pull one chunk at a time on the sync thread instead (same thread as the DB cursor)
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(lambda: next(chunks, None))
+    while (chunk := await next_chunk()) is not None:
+        yield chunk
+
+
+def _archived_rows(kind, columns, start, end, filters):
+    names = [name for name, _ in columns]
+    by_lookup = {lookup: name for name, lookup in columns}
+    filters = [(by_lookup[lookup], values) for lookup, values in filters.items() if values]
+    for record in retention.read_archive(kind, start, end):
+        if all(record[name] in values for name, values in filters):
+            yield tuple(record.get(name) for name in names)
+
+
+def _export(request, queryset, columns, time_field, name, camera_field, type_field):
+    params = request.GET
+    fmt = params.get('format', 'csv')
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(FORMATS)}"}, status=400)
+    try:
+        start = _parse_time(params.get('start'))
+        end = _parse_time(params.get('end'))
+        cameras = [int(c) for c in params.get('camera', '').split(',') if c]
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if start:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+    if cameras:
+        queryset = queryset.filter(**{f'{camera_field}__in': cameras})
+    types = [t for t in params.get('type', '').split(',') if t]
+    if types:
+        queryset = queryset.filter(**{f'{type_field}__in': types})
+
+    names = [column for column, _ in columns]
+    rows = (queryset.order_by(time_field, 'id').values_list(*[field for _, field in columns])
+            .iterator(chunk_size=getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)))
+    if params.get('archived') in ('1', 'true'):
+        archived = _archived_rows(name, columns, start, end, {camera_field: cameras, type_field: types})
+        rows = itertools.chain(archived, rows)
+    chunks = csv_chunks(names, rows) if fmt == 'csv' else ndjson_chunks(names, rows)
+    filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    content_type = FORMATS[fmt]
+    if params.get('gzip') in ('1', 'true'):
+        chunks = gzipped(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    if isinstance(request, ASGIRequest):
+        chunks = _async_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_GET
+def export_incidents(request):
+    return _export(request, Incident.objects.all(), INCIDENT_COLUMNS, 'timestamp', 'incidents',
+                   camera_field='camera_id', type_field='type')
+
+
+@require_GET
+def export_alerts(request):
+    return _export(request, Alert.objects.all(), ALERT_COLUMNS, 'created_at', 'alerts',
+                   camera_field='incident__camera_id', type_field='incident__type')
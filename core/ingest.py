@@ -0,0 +1,191 @@
+"""
+Single-writer queue for incident ingest.
+
+SQLite allows one writer at a time. With daphne running views on a thread
+pool, concurrent detector POSTs each open their own write transaction and
+queue up on the database lock, or fail with "database is locked". Instead,
+``writer.run(write)`` hands the write to one writer thread, which takes
+everything queued (up to ``INGEST_MAX_BATCH``) and runs it in a single
+transaction: one lock and one fsync for the whole group. Each write runs in
+its own savepoint, so a failing write only fails its own caller. The batch's
+rollup bumps are summed and written once at the end (``rollups.deferred()``).
+
+A caller already inside a transaction (``ATOMIC_REQUESTS``, tests) writes
+inline, so its write stays part of that transaction. So does every caller
+when ``INGEST_SINGLE_WRITER`` is off.
+
+``await writer.arun(write)`` is the same for async views: the event loop
+waits on the write's future, so no thread is held while it is queued.
+
+``parse_incident()`` and ``create_incident()`` are the detector payload
+schema and the write behind both ingest endpoints.
+"""
+
+import asyncio
+import math
+import queue
+import threading
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import rollups, tracing
+from .models import AIVerificationLog, Incident
+
+
+class IngestQueue:
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'INGEST_SINGLE_WRITER', True)
+
+    def run(self, write, timeout=30):
+        """Run ``write()`` in the writer thread's next transaction and return its result"""
+        if not self.enabled or connection.in_atomic_block:
+            with transaction.atomic():
+                return write()
+        return self.submit(write).result(timeout)
+
+    async def arun(self, write, timeout=30):
+        """``run()`` for async callers, which are never inside a transaction"""
+        if not self.enabled:
+            return await sync_to_async(self.run)(write, timeout)
+        # Shielded: a timed out or disconnected caller leaves the write to finish
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.submit(write))), timeout)
+
+    def submit(self, write):
+        """Queue ``write()`` for the writer thread; returns its Future"""
+        self._start()
+        future = Future()
+        self._queue.put((write, future))
+        return future
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='ingest-writer', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        max_batch = getattr(settings, 'INGEST_MAX_BATCH', 100)
+        while True:
+            # Whatever queued up while the last batch was being written goes in the next one
+            batch = [self._queue.get()]
+            while len(batch) < max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                batch_deltas = {}
+                for write, future in batch:
+                    try:
+                        with rollups.deferred() as deltas, transaction.atomic():
+                            result = write()
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                        continue
+                    outcomes.append((future, result, None))
+                    for key, delta in deltas.items():
+                        batch_deltas[key] = batch_deltas.get(key, 0) + delta
+                rollups.apply(batch_deltas)
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was written
+            connection.close()
+            outcomes = [(future, None, e) for _, future in batch]
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+writer = IngestQueue()
+
+
+# ==========================
+#  INCIDENT PAYLOAD
+# ==========================
+
+INCIDENT_TYPES = {value for value, _ in Incident.INCIDENT_TYPES}
+
+
+def parse_incident(data):
+    """
+    ``(camera_id, fields)`` from a detector's JSON payload, ``fields`` being the
+    keyword arguments of ``create_incident()``; raises ValueError with the reason.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    camera_id = data.get("camera_id")
+    if camera_id is None or camera_id == "":
+        raise ValueError("camera_id is required")
+    if isinstance(camera_id, str) and camera_id.isdigit():
+        camera_id = int(camera_id)
+    if not isinstance(camera_id, int) or isinstance(camera_id, bool):
+        raise ValueError("camera_id must be an integer")
+
+    description = data.get("description", "Incident reported")
+    if not isinstance(description, str):
+        raise ValueError("description must be a string")
+    incident_type = data.get("type", "WORTH_CHECKING")
+    if incident_type not in INCIDENT_TYPES:
+        raise ValueError(f"type must be one of {', '.join(sorted(INCIDENT_TYPES))}")
+    confidence_score = data.get("confidence_score")
+    if confidence_score is not None and (isinstance(confidence_score, bool) or not isinstance(
+            confidence_score, (int, float)) or not math.isfinite(confidence_score)):
+        raise ValueError("confidence_score must be a number")
+    ai_summary = data.get("ai_summary")
+    if ai_summary is not None and not isinstance(ai_summary, str):
+        raise ValueError("ai_summary must be a string")
+
+    return camera_id, {
+        "description": description,
+        "type": incident_type,
+        "confidence_score": confidence_score,
+        "ai_summary": ai_summary,
+        "trace": tracing.parse(data.get("trace")),
+    }
+
+
+def create_incident(camera, description, type, confidence_score=None, ai_summary=None, trace=None):
+    """
+    Write a reported incident (call inside a transaction, e.g. through ``writer``).
+    Incidents with a confidence score come from AI detection and get a
+    CONFIRMED verification log; Incident.save() raises the CRITICAL alert.
+    """
+    incident = None
+    if trace:
+        # Stamped once committed, so a write rolled back with its savepoint isn't
+        # counted; registered first, to run before the commit wakes the outbox publisher
+        transaction.on_commit(lambda: tracing.latency.stored(incident))
+    incident = Incident.objects.create(
+        camera=camera,
+        description=description,
+        detected_by="AI" if confidence_score is not None else "MANUAL",
+        type=type,
+        is_verified=False,
+        confidence_score=confidence_score if confidence_score is not None else 0.0,
+        ai_summary=ai_summary,
+        trace_id=trace["id"] if trace else None,
+        trace=trace,
+    )
+    if confidence_score is not None:
+        AIVerificationLog.objects.create(
+            incident=incident,
+            decision="CONFIRMED",
+            confidence_score=confidence_score
+        )
+    return incident
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import retention
+
+
+class Command(BaseCommand):
+    help = "Archive and delete incidents and AI logs past their RETENTION_POLICIES age"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only count the expired rows")
+        parser.add_argument('--batch-size', type=int, help="Rows per transaction (default: RETENTION_BATCH_SIZE)")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument('--vacuum', action='store_true',
+                            help="VACUUM afterwards to shrink the database file (locks it while running)")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for kind in ('incidents', 'ai_logs'):
+                for key, queryset in retention.expired(kind).items():
+                    self.stdout.write(f"{kind} {key}: {queryset.count()} expired")
+            return
+
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        removed = retention.apply(batch_size=options['batch_size'], pause=options['pause'], log=log)
+        for kind, counts in removed.items():
+            for key, count in counts.items():
+                self.stdout.write(f"{kind} {key}: {count} removed")
+        where = retention.archive_dir() or "nowhere (archiving disabled)"
+        self.stdout.write(self.style.SUCCESS(f"Retention applied, archived to {where}"))
+
+        if options['vacuum']:
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
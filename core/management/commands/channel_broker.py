@@ -0,0 +1,25 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.channel_layers import DEFAULT_SOCKET, Broker
+
+
+class Command(BaseCommand):
+    help = "Run the channel layer broker shared by several server processes (core/channel_layers.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', help="Unix socket path (default: the channel layer's CONFIG path)")
+        parser.add_argument('--sweep-interval', type=float, default=1.0,
+                            help="Seconds between expiry sweeps of messages and group memberships")
+
+    def handle(self, *args, **options):
+        config = settings.CHANNEL_LAYERS['default'].get('CONFIG', {})
+        path = options['socket'] or config.get('path') or DEFAULT_SOCKET
+        self.stdout.write(f"📡 Channel broker listening on {path}")
+        try:
+            asyncio.run(Broker().serve(path, sweep_interval=options['sweep_interval']))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("🛑 Channel broker stopped")
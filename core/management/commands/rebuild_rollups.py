@@ -0,0 +1,27 @@
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute incident rollups from the raw incidents still in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="ISO 8601 start (default: oldest raw incident)")
+        parser.add_argument('--until', help="ISO 8601 end, exclusive (default: no limit)")
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                bounds[name] = parse_datetime(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f"Invalid --{name} '{options[name]}'")
+                if timezone.is_naive(bounds[name]):
+                    bounds[name] = timezone.make_aware(bounds[name], dt_timezone.utc)
+        written = rollups.rebuild(**bounds)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows"))
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 00:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_incident_confidence_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('security_objects', models.JSONField(blank=True, default=dict)),
+                ('confidence_threshold', models.FloatField(default=0.5)),
+                ('cooldowns', models.JSONField(blank=True, default=dict)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('camera', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='detection_profile', to='core.camera')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_detectionprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionprofile',
+            name='inference_backend',
+            field=models.CharField(choices=[('torch', 'PyTorch (.pt)'), ('onnx', 'ONNX Runtime'), ('onnx-int8', 'ONNX Runtime INT8'), ('openvino', 'OpenVINO'), ('openvino-int8', 'OpenVINO INT8')], default='torch', max_length=20),
+        ),
+    ]
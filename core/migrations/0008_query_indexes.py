@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-19 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_detectionprofile_inference_backend'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aiverificationlog',
+            index=models.Index(fields=['-created_at', '-id'], name='aiverification_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at', '-id'], name='alert_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['acknowledged', '-created_at'], name='alert_ack_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['-timestamp', '-id'], name='incident_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['camera', '-timestamp'], name='incident_camera_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['is_verified', '-timestamp'], name='incident_verified_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['detected_by', '-timestamp'], name='incident_source_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['-created_at', '-id'], name='report_created_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-19 01:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('type', models.CharField(choices=[('WORTH_CHECKING', 'Worth Checking'), ('DANGEROUS', 'Dangerous'), ('CRITICAL', 'Critical')], max_length=20)),
+                ('detected_by', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('camera', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_rollups', to='core.camera')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'camera', 'bucket'], name='rollup_camera_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'bucket', 'camera', 'type', 'detected_by'), name='unique_incident_rollup')],
+            },
+        ),
+    ]
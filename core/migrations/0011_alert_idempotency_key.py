@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_report_data_alert_acknowledged_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
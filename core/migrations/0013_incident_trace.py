@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='trace',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='trace_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
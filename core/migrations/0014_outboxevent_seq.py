@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 02:01
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_published(apps, schema_editor):
+    # Events published so far were sequenced by id; keep the seqs clients already hold
+    OutboxEvent = apps.get_model('core', 'OutboxEvent')
+    OutboxEvent.objects.filter(published_at__isnull=False).update(seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_incident_trace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(number_published, migrations.RunPython.noop),
+    ]
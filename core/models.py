@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 # ==========================
@@ -49,6 +50,37 @@ class Camera(models.Model):
         return f"{self.name} - {self.location}"
 
 
+class DetectionProfile(models.Model):
+    """
+    Per-camera detector tuning, fetched by detectors at startup and pushed to
+    running detectors on change (see core.signals) so it never needs a restart.
+    """
+    RISK_LEVELS = ['low', 'medium', 'high', 'critical']
+    INFERENCE_BACKENDS = [
+        ('torch', 'PyTorch (.pt)'),
+        ('onnx', 'ONNX Runtime'),
+        ('onnx-int8', 'ONNX Runtime INT8'),
+        ('openvino', 'OpenVINO'),
+        ('openvino-int8', 'OpenVINO INT8'),
+    ]
+
+    camera = models.OneToOneField(Camera, on_delete=models.CASCADE, related_name='detection_profile')
+    # {"knife": {"risk": "high", "label": "WEAPON DETECTED"}, ...};
+    # empty means the detector keeps its built-in table
+    security_objects = models.JSONField(default=dict, blank=True)
+    confidence_threshold = models.FloatField(default=0.5)
+    # Seconds between incidents for the same object, per risk level: {"high": 15, ...}
+    cooldowns = models.JSONField(default=dict, blank=True)
+    # Runtime the detector uses for YOLO (see backend/inference_backends.py)
+    inference_backend = models.CharField(max_length=20, choices=INFERENCE_BACKENDS, default='torch')
+    # Bumped on every change so detectors can ignore stale pushes
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Detection profile v{self.version} ({self.camera.name})"
+
+
 # ==========================
 #  INCIDENT SYSTEM
 # ==========================
@@ -79,6 +111,9 @@ class Incident(models.Model):
     is_verified = models.BooleanField(default=False)
     # Optional AI-generated summary/enrichment for the incident
     ai_summary = models.TextField(null=True, blank=True)
+    # Latency trace from the detector's frame capture on (core/tracing.py)
+    trace_id = models.CharField(max_length=64, null=True, blank=True)
+    trace = models.JSONField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         # Automatically assign severity numeric value
@@ -92,19 +127,57 @@ class Incident(models.Model):
         creating = self.pk is None
         super().save(*args, **kwargs)
 
-        # AUTO-CREATE ALERT IF CRITICAL
+        # AUTO-CREATE ALERT IF CRITICAL (once per incident, see core/alerts.py)
         if creating and self.type == 'CRITICAL':
-            Alert.objects.create(
-                incident=self,
-                title="Critical Incident Detected",
-                message=f"A critical incident occurred on camera: {self.camera.name}.",
-                acknowledged=False
-            )
+            from .alerts import create_for_incident
+            create_for_incident(self)
+
+    class Meta:
+        # Match the API/admin access paths: newest first, per camera,
+        # unverified first, by detection source; id breaks timestamp ties
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='incident_timestamp_idx'),
+            models.Index(fields=['camera', '-timestamp'], name='incident_camera_ts_idx'),
+            models.Index(fields=['is_verified', '-timestamp'], name='incident_verified_ts_idx'),
+            models.Index(fields=['detected_by', '-timestamp'], name='incident_source_ts_idx'),
+        ]
 
     def __str__(self):
         return f"Incident #{self.id} - {self.type} ({self.camera.name})"
 
 
+class IncidentRollup(models.Model):
+    """
+    Incident counts per time bucket, camera, type and detection source.
+    Kept current on ingest and rebuildable from raw incidents (core/rollups.py);
+    buckets are truncated in UTC.
+    """
+    RESOLUTIONS = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    resolution = models.CharField(max_length=6, choices=RESOLUTIONS)
+    bucket = models.DateTimeField()
+    camera = models.ForeignKey(Camera, on_delete=models.CASCADE, related_name='incident_rollups')
+    type = models.CharField(max_length=20, choices=Incident.INCIDENT_TYPES)
+    detected_by = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'bucket', 'camera', 'type', 'detected_by'],
+                                    name='unique_incident_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'camera', 'bucket'], name='rollup_camera_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} × {self.type} on {self.camera_id} ({self.resolution} {self.bucket:%Y-%m-%d %H:%M})"
+
+
 # ==========================
 #  ALERT SYSTEM
 # ==========================
@@ -121,6 +194,27 @@ class Alert(models.Model):
     message = models.TextField()
 
     acknowledged = models.BooleanField(default=False)
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+
+    # Set for alerts raised by the system ('incident:<id>'), so each is created once
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        # Track when the alert was acknowledged (time-to-acknowledge in reports)
+        if self.acknowledged and self.acknowledged_at is None:
+            self.acknowledged_at = timezone.now()
+        elif not self.acknowledged:
+            self.acknowledged_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'acknowledged' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'acknowledged_at'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='alert_created_idx'),
+            models.Index(fields=['acknowledged', '-created_at'], name='alert_ack_created_idx'),
+        ]
 
     def __str__(self):
         return f"Alert #{self.id} - {self.title}"
@@ -131,12 +225,28 @@ class Alert(models.Model):
 # ==========================
 
 class Report(models.Model):
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
     generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    summary = models.TextField()
+    summary = models.TextField(blank=True)
     period_start = models.DateTimeField()
     period_end = models.DateTimeField()
 
+    # Structured aggregates computed by core.reports (empty for hand-written reports)
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='DONE')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='report_created_idx'),
+        ]
+
     def __str__(self):
         return f"Report by {self.generated_by} on {self.created_at.strftime('%Y-%m-%d')}"
 
@@ -160,5 +270,42 @@ class AIVerificationLog(models.Model):
     raw_response = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='aiverification_created_idx'),
+        ]
+
     def __str__(self):
         return f"AI Verification - {self.decision} ({self.confidence_score or 'N/A'})"
+
+
+# ==========================
+#  WEBSOCKET OUTBOX
+# ==========================
+
+class OutboxEvent(models.Model):
+    """
+    A channel-layer message recorded in the same transaction as the change it
+    announces, and published to its group by core.outbox once committed.
+    """
+    group = models.CharField(max_length=100)
+    message = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    published_at = models.DateTimeField(null=True, blank=True)
+    # Given when the event goes out, so a retried event comes after what was published meanwhile
+    seq = models.PositiveBigIntegerField(null=True, blank=True, unique=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Only the unpublished tail is scanned by the publisher
+            models.Index(fields=['next_attempt_at', 'id'], name='outbox_pending_idx',
+                         condition=models.Q(published_at__isnull=True)),
+            models.Index(fields=['published_at'], name='outbox_published_idx'),
+        ]
+
+    def __str__(self):
+        return f"Outbox #{self.id} → {self.group} ({self.message.get('type')})"
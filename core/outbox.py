@@ -0,0 +1,268 @@
+"""
+Transactional outbox for WebSocket broadcasts.
+
+``send(groups, handler, frame)`` stores a channel-layer message as an
+OutboxEvent per group in the caller's transaction, so it exists exactly when the change
+it announces does, and costs the request one INSERT instead of a round trip
+to the channel layer. The client frame is JSON-encoded once, there, and
+carried as ``text``; consumers send it unchanged to every socket, so the
+cost of an event doesn't grow with the number of subscribers.
+
+``publisher`` runs as a task on the ASGI server's event loop (started by
+``publisher.asgi()`` in backend/asgi.py). It wakes when a transaction with
+events commits, and otherwise polls every ``OUTBOX_POLL_INTERVAL`` seconds to
+pick up events written by other processes (management commands, scripts).
+Pending events go out in id order, one ``group_send`` per group per round:
+
+    {'type': 'outbox_batch', 'messages': [<message>, ...]}
+
+which consumers unpack with ``OutboxBatchMixin``. A failed send is retried
+with exponential backoff, up to ``OUTBOX_MAX_ATTEMPTS`` times; later events
+for that group wait for it, so each group keeps its order.
+
+Every published message carries a ``seq``, in the message and in the client
+frame. Seqs are given as events go out, so they follow publication order: an
+event that is retried gets a seq after whatever other groups published
+meanwhile, and a client that synced since doesn't miss it. Published events are kept for ``OUTBOX_RETENTION_SECONDS``
+and double as the replay buffer: a client reconnecting with the last seq it
+saw gets what it missed (``replay()``), or a ``resync`` frame telling it to
+refetch when some of that was pruned already.
+
+Run a single publishing server per database: every server with the wrapper
+publishes, so set ``OUTBOX_PUBLISH = False`` on the others.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import tracing
+from .models import OutboxEvent
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def encode(frame):
+    """The WebSocket text for ``frame``, encoded once for every subscriber"""
+    return json.dumps(frame, cls=JSONEncoder, separators=(',', ':'), ensure_ascii=False)
+
+
+def sequenced(event):
+    """The event's message as published, with its ``seq`` in the message and the frame"""
+    message = dict(event.message, seq=event.seq)
+    message['text'] = f'{{"seq":{event.seq},' + message['text'][1:]
+    return message
+
+
+def latest_seq():
+    """The newest published seq (0 before the first event)"""
+    return (OutboxEvent.objects.filter(published_at__isnull=False)
+            .order_by('-seq').values_list('seq', flat=True).first() or 0)
+
+
+def replay(groups, last_seq):
+    """
+    The published messages for ``groups`` after ``last_seq``, oldest first, or
+    None when they can't all be replayed: some were pruned already (no
+    published event at or before ``last_seq`` is left), or there are more
+    than ``OUTBOX_REPLAY_LIMIT`` of them.
+    """
+    published = OutboxEvent.objects.filter(published_at__isnull=False)
+    if last_seq > latest_seq() or not published.filter(seq__lte=last_seq).exists():
+        return None
+    limit = _setting('OUTBOX_REPLAY_LIMIT', 500)
+    events = list(
+        OutboxEvent.objects.filter(group__in=groups, seq__gt=last_seq, published_at__isnull=False)
+        .order_by('seq').only('seq', 'message')[:limit + 1]
+    )
+    return [sequenced(event) for event in events] if len(events) <= limit else None
+
+
+def send(groups, handler, frame, **meta):
+    """
+    Queue ``frame`` for the consumers in ``groups`` (a name or a list), handled by
+    their ``handler`` method, which also gets ``meta`` (e.g. for filtering).
+    The frame is encoded now, once for all groups, and sent verbatim to each
+    socket; it is published after the current transaction commits.
+    """
+    message = {'type': handler, 'text': encode(frame), **meta}
+    groups = [groups] if isinstance(groups, str) else groups
+    OutboxEvent.objects.bulk_create([OutboxEvent(group=group, message=message) for group in groups])
+    transaction.on_commit(publisher.wake)
+
+
+class OutboxPublisher:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._last_prune = None
+
+    # ==========================
+    #  LIFECYCLE
+    # ==========================
+
+    def asgi(self, application):
+        """Wrap the ASGI application so the publisher starts on the server's loop"""
+        async def app(scope, receive, send):
+            self.start()
+            return await application(scope, receive, send)
+        return app
+
+    def start(self):
+        """Start publishing on the running loop (once per loop)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is loop or not _setting('OUTBOX_PUBLISH', True):
+                return
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+        loop.create_task(self.run())
+
+    def wake(self):
+        """Publish now rather than at the next poll (safe from any thread)"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def run(self):
+        interval = _setting('OUTBOX_POLL_INTERVAL', 1.0)
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.publish_pending():
+                    pass  # a full batch: there may be more
+                await self.prune()
+            except Exception as e:
+                print(f"Outbox publisher error: {e}")
+
+    # ==========================
+    #  PUBLISHING
+    # ==========================
+
+    async def publish_pending(self):
+        """Publish one batch of due events; returns True if the batch was full"""
+        limit = _setting('OUTBOX_BATCH_SIZE', 200)
+        events = await database_sync_to_async(self._due)(limit)
+        if not events:
+            return False
+
+        by_group = {}
+        for event in events:
+            by_group.setdefault(event.group, []).append(event)
+        channel_layer = get_channel_layer()
+        published, failed = [], {}
+        for group, group_events in by_group.items():
+            try:
+                await channel_layer.group_send(group, {
+                    'type': 'outbox_batch',
+                    'messages': [sequenced(event) for event in group_events],
+                })
+                published.extend(event.id for event in group_events)
+                tracing.latency.published(
+                    [incident for event in group_events for incident in event.message.get('traced', ())])
+            except Exception as e:
+                failed[group] = (group_events[0].id, str(e) or e.__class__.__name__)
+        await database_sync_to_async(self._record)(published, failed)
+        return len(events) == limit
+
+    @transaction.atomic
+    def _due(self, limit):
+        events = sorted(
+            OutboxEvent.objects.filter(published_at__isnull=True, next_attempt_at__lte=timezone.now(),
+                                       attempts__lt=_setting('OUTBOX_MAX_ATTEMPTS', 10))
+            .order_by('next_attempt_at', 'id')
+            .only('id', 'group', 'message')[:limit],
+            key=lambda event: event.id,
+        )
+        # Seqs continue from the newest given out, in id order so each group keeps its order
+        last = OutboxEvent.objects.aggregate(last=Max('seq'))['last'] or 0
+        for seq, event in enumerate(events, start=last + 1):
+            event.seq = seq
+        OutboxEvent.objects.bulk_update(events, ['seq'])
+        return events
+
+    def _record(self, published, failed):
+        now = timezone.now()
+        if published:
+            OutboxEvent.objects.filter(id__in=published).update(published_at=now)
+        for group, (first_id, error) in failed.items():
+            # Hold back the group's whole tail so it stays in order
+            pending = OutboxEvent.objects.filter(group=group, published_at__isnull=True, id__gte=first_id)
+            attempts = pending.filter(id=first_id).values_list('attempts', flat=True).first() or 0
+            delay = min(2 ** attempts, _setting('OUTBOX_MAX_BACKOFF', 60))
+            pending.filter(id=first_id).update(attempts=F('attempts') + 1, last_error=error)
+            # Unpublished, the events give their seqs up and get new ones when retried
+            pending.update(seq=None, next_attempt_at=now + timedelta(seconds=delay))
+            print(f"Outbox: publishing to '{group}' failed ({error}), retrying in {delay}s")
+
+    async def prune(self):
+        """Drop published events past their retention, at most once a minute"""
+        now = timezone.now()
+        if self._last_prune and now - self._last_prune < timedelta(minutes=1):
+            return
+        self._last_prune = now
+        keep = timedelta(seconds=_setting('OUTBOX_RETENTION_SECONDS', 3600))
+        await database_sync_to_async(self._prune)(now - keep)
+
+    def _prune(self, before):
+        # The newest published event stays: replay() needs it to tell a quiet period from a gap
+        newest = latest_seq()
+        OutboxEvent.objects.filter(published_at__lt=before).exclude(seq=newest).delete()
+        # Events that ran out of attempts are never published; drop them after the same retention
+        OutboxEvent.objects.filter(published_at__isnull=True, attempts__gte=_setting('OUTBOX_MAX_ATTEMPTS', 10),
+                                   created_at__lt=before).delete()
+
+
+publisher = OutboxPublisher()
+
+
+class OutboxBatchMixin:
+    """Consumer mixin: handle each message of an outbox batch with its own handler"""
+
+    replayed = frozenset()  # seqs already sent by catch_up()
+
+    async def outbox_batch(self, event):
+        for message in event['messages']:
+            if message.get('seq') not in self.replayed:
+                await self.dispatch(message)
+
+    async def catch_up(self, groups, last_seq=None):
+        """
+        Send the client what ``groups`` published since ``last_seq`` (through the
+        usual handlers), or a ``resync`` frame if that can't be replayed, then a
+        ``sync`` frame with the current seq. Call after joining the groups, so
+        nothing published meanwhile is missed; it may be replayed and also arrive
+        live, and is sent once.
+        """
+        def fetch():
+            return replay(groups, last_seq) if last_seq is not None else [], latest_seq()
+
+        messages, seq = await database_sync_to_async(fetch)()
+        if messages is None:
+            await self.send(text_data=encode({'type': 'resync', 'seq': seq}))
+            return
+        for message in messages:
+            await self.dispatch(message)
+        self.replayed = frozenset(message['seq'] for message in messages)
+        await self.send(text_data=encode({'type': 'sync', 'seq': seq}))
+
+    async def send_encoded(self, event):
+        """Send a pre-encoded frame as-is"""
+        await self.send(text_data=event['text'])
@@ -0,0 +1,141 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on the queryset's own ordering field plus id.
+
+    The view's queryset keeps its ordering (e.g. ``-timestamp``); ``id`` is
+    added as a tiebreaker. A cursor holds the (value, id) of the last row on
+    the page, and the next page is fetched with
+    ``WHERE (value, id) < (cursor)`` on the same index order, so response time
+    does not depend on how deep the page is or how big the table is.
+
+    Responses look like ``{"next": url, "previous": url, "results": [...]}``.
+    ``?page_size=`` overrides ``API_PAGE_SIZE`` up to ``API_MAX_PAGE_SIZE``.
+    A cursor that can't be decoded is a 400.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        """(field name, descending) from the queryset's first ordering term"""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ['-pk']
+        term = ordering[0]
+        field = term.lstrip('-')
+        return ('pk' if field == 'id' else field), term.startswith('-')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = bool(cursor and cursor['reverse'])
+
+        # Walking backwards flips the comparison and the sort, then the page is flipped back
+        forward_desc = self.descending != reverse
+        sign = '-' if forward_desc else ''
+        queryset = queryset.order_by(f'{sign}{self.field}', f'{sign}pk')
+        if cursor:
+            # (value, id) < cursor, written as a range on value so it stays an index range scan
+            bound, past = ('lte', 'gte') if forward_desc else ('gte', 'lte')
+            value = cursor['value']
+            queryset = queryset.filter(**{f'{self.field}__{bound}': value}).exclude(
+                **{self.field: value, f'pk__{past}': cursor['id']}
+            )
+
+        rows = list(queryset[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # ==========================
+    #  CURSORS
+    # ==========================
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.field)
+        # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds
+        position = {'v': value.isoformat() if hasattr(value, 'isoformat') else value, 'id': obj.pk}
+        if reverse:
+            position['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            field = model._meta.pk if self.field == 'pk' else model._meta.get_field(self.field)
+            value = field.to_python(position['v'])
+            # None can't be compared against, and the id must be a real row id
+            if value is None or type(position['id']) is not int:
+                raise ValueError(self.invalid_cursor_message)
+            return {
+                'value': value,
+                'id': position['id'],
+                'reverse': bool(position.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, ValidationError):
+            # The client's request is wrong, not the page: 400 rather than DRF's usual 404
+            raise ParseError(self.invalid_cursor_message)
@@ -0,0 +1,132 @@
+"""
+Report generation.
+
+``build_report()`` computes a period's numbers with a handful of aggregate
+queries (GROUP BY in the database, no per-row Python) and returns a
+JSON-serializable dict. ``generate_report()`` fills a Report row from it;
+short periods are built inside the request, longer ones on a background
+thread with ``Report.status`` tracking progress.
+"""
+
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+
+from .models import Incident, Alert, Report
+
+TOP_CAMERAS = 5
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def build_report(period_start, period_end, cameras=None):
+    """Aggregates for incidents and alerts in [period_start, period_end), optionally for some cameras"""
+    incidents = Incident.objects.filter(timestamp__gte=period_start, timestamp__lt=period_end)
+    alerts = Alert.objects.filter(created_at__gte=period_start, created_at__lt=period_end)
+    if cameras:
+        incidents = incidents.filter(camera_id__in=cameras)
+        alerts = alerts.filter(incident__camera_id__in=cameras)
+    incidents = incidents.order_by()
+    alerts = alerts.order_by()
+
+    totals = incidents.aggregate(
+        total=Count('id'),
+        verified=Count('id', filter=Q(is_verified=True)),
+        mean_confidence=Avg('confidence_score'),
+    )
+    by_type = list(incidents.values('type', 'severity_level').annotate(count=Count('id'))
+                   .order_by('type', 'severity_level'))
+    by_source = {row['detected_by']: row['count']
+                 for row in incidents.values('detected_by').annotate(count=Count('id'))}
+    top_cameras = [
+        {'camera_id': row['camera_id'], 'name': row['camera__name'], 'count': row['count'],
+         'verified_ratio': _ratio(row['verified'], row['count'])}
+        for row in incidents.values('camera_id', 'camera__name')
+        .annotate(count=Count('id'), verified=Count('id', filter=Q(is_verified=True)))
+        .order_by('-count', 'camera_id')[:TOP_CAMERAS]
+    ]
+    alert_totals = alerts.aggregate(
+        total=Count('id'),
+        acknowledged=Count('id', filter=Q(acknowledged=True)),
+        mean_time_to_ack=Avg(ExpressionWrapper(F('acknowledged_at') - F('created_at'),
+                                               output_field=DurationField())),
+    )
+    mean_ack = alert_totals['mean_time_to_ack']
+
+    return {
+        'period_start': period_start.isoformat(),
+        'period_end': period_end.isoformat(),
+        'cameras': list(cameras) if cameras else None,
+        'incidents': {
+            'total': totals['total'],
+            'verified': totals['verified'],
+            'verified_ratio': _ratio(totals['verified'], totals['total']),
+            'mean_confidence': round(totals['mean_confidence'], 2) if totals['mean_confidence'] is not None else None,
+            'by_type': by_type,
+            'by_source': by_source,
+        },
+        'top_cameras': top_cameras,
+        'alerts': {
+            'total': alert_totals['total'],
+            'acknowledged': alert_totals['acknowledged'],
+            'acknowledged_ratio': _ratio(alert_totals['acknowledged'], alert_totals['total']),
+            'mean_seconds_to_acknowledge': round(max(mean_ack.total_seconds(), 0.0), 1) if mean_ack is not None else None,
+        },
+    }
+
+
+def summarize(data):
+    """One-paragraph text for ``Report.summary``"""
+    incidents, alerts = data['incidents'], data['alerts']
+    if not incidents['total']:
+        text = "No incidents recorded in this period."
+    else:
+        by_type = {}
+        for row in incidents['by_type']:
+            by_type[row['type']] = by_type.get(row['type'], 0) + row['count']
+        text = (f"{incidents['total']} incidents "
+                f"({', '.join(f'{n} {t.lower()}' for t, n in sorted(by_type.items()))}), "
+                f"{incidents['verified']} verified.")
+        if data['top_cameras']:
+            busiest = data['top_cameras'][0]
+            text += f" Busiest camera: {busiest['name']} ({busiest['count']})."
+    if alerts['total']:
+        text += f" {alerts['acknowledged']}/{alerts['total']} alerts acknowledged"
+        if alerts['mean_seconds_to_acknowledge'] is not None:
+            text += f", {alerts['mean_seconds_to_acknowledge'] / 60:.1f} min on average"
+        text += "."
+    return text
+
+
+def generate_report(report):
+    """Compute and store the aggregates for an existing Report row"""
+    report.status = 'RUNNING'
+    report.save(update_fields=['status'])
+    try:
+        report.data = build_report(report.period_start, report.period_end, report.data.get('cameras'))
+        report.summary = summarize(report.data)
+        report.status = 'DONE'
+    except Exception as e:
+        print(f"Error generating report {report.id}: {e}")
+        report.status = 'FAILED'
+    report.save(update_fields=['data', 'summary', 'status'])
+    return report
+
+
+def runs_in_background(period_start, period_end):
+    """Periods longer than ``REPORT_SYNC_MAX_DAYS`` are built off the request thread"""
+    return period_end - period_start > timedelta(days=getattr(settings, 'REPORT_SYNC_MAX_DAYS', 7))
+
+
+def generate_in_background(report_id):
+    def run():
+        try:
+            generate_report(Report.objects.get(pk=report_id))
+        finally:
+            connection.close()
+    threading.Thread(target=run, name=f'report-{report_id}', daemon=True).start()
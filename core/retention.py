@@ -0,0 +1,197 @@
+"""
+Retention for incidents and AI verification logs.
+
+``RETENTION_POLICIES`` keeps each incident type / AI decision for a number
+of days (``None`` keeps it forever). Expired rows are written to the archive,
+then deleted in small transactions of ``RETENTION_BATCH_SIZE`` rows, so
+SQLite writers only ever wait for one short batch. An incident takes its
+alerts and AI logs with it, and they are archived alongside it.
+
+Cutoffs are whole UTC days, so a day's raw incidents are either all present
+or all archived, and ``rollups.rebuild()`` never recomputes a partially
+deleted day (see ``complete_since()``). Rollups themselves are not touched.
+
+Archives are gzipped NDJSON, one file per kind and UTC day of the row:
+
+    RETENTION_ARCHIVE_DIR/incidents/2026/2026-01-15.ndjson.gz
+    RETENTION_ARCHIVE_DIR/alerts/...   RETENTION_ARCHIVE_DIR/ai_logs/...
+
+Each batch appends a gzip member (``gzip`` reads them back as one stream),
+and is fsynced before the rows are deleted. A batch interrupted between the
+two is archived again on the next run; ``read_archive()`` skips the
+duplicates. With ``RETENTION_ARCHIVE_DIR = None`` rows are only deleted.
+"""
+
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import stats
+from .models import Incident, Alert, AIVerificationLog
+from .rollups import truncate
+
+# kind -> (model, time field, policy field, archived columns as (name, lookup))
+KINDS = {
+    'incidents': (Incident, 'timestamp', 'type', [
+        ('id', 'id'), ('timestamp', 'timestamp'), ('camera_id', 'camera_id'), ('camera', 'camera__name'),
+        ('type', 'type'), ('severity_level', 'severity_level'), ('confidence_score', 'confidence_score'),
+        ('is_verified', 'is_verified'), ('detected_by', 'detected_by'), ('description', 'description'),
+        ('ai_summary', 'ai_summary'),
+    ]),
+    'alerts': (Alert, 'created_at', None, [
+        ('id', 'id'), ('created_at', 'created_at'), ('incident_id', 'incident_id'),
+        ('camera_id', 'incident__camera_id'), ('incident_type', 'incident__type'), ('title', 'title'),
+        ('message', 'message'), ('acknowledged', 'acknowledged'), ('acknowledged_at', 'acknowledged_at'),
+        ('created_by', 'created_by__username'),
+    ]),
+    'ai_logs': (AIVerificationLog, 'created_at', 'decision', [
+        ('id', 'id'), ('created_at', 'created_at'), ('incident_id', 'incident_id'),
+        ('decision', 'decision'), ('confidence_score', 'confidence_score'), ('raw_response', 'raw_response'),
+    ]),
+}
+
+
+def policies():
+    return getattr(settings, 'RETENTION_POLICIES', {})
+
+
+def archive_dir():
+    path = getattr(settings, 'RETENTION_ARCHIVE_DIR', None)
+    return Path(path) if path else None
+
+
+def cutoff(days, now=None):
+    """Start of the UTC day ``days`` ago; rows older than this have expired"""
+    return truncate((now or timezone.now()) - timedelta(days=days), 'day')
+
+
+def complete_since(now=None):
+    """Earliest time from which every incident type still has all its raw rows (None: no limit)"""
+    days = [d for d in policies().get('incidents', {}).values() if d is not None]
+    return cutoff(min(days), now) if days else None
+
+
+# ==========================
+#  ARCHIVE
+# ==========================
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _archive_path(kind, day):
+    return archive_dir() / kind / f'{day:%Y}' / f'{day:%Y-%m-%d}.ndjson.gz'
+
+
+def archive(kind, queryset):
+    """Append the queryset's rows to the day files of ``kind``; returns the row count"""
+    model, time_field, _, columns = KINDS[kind]
+    names = [name for name, _ in columns]
+    by_day = {}
+    for row in queryset.order_by().values_list(*[lookup for _, lookup in columns]):
+        record = dict(zip(names, map(_jsonable, row)))
+        day = truncate(row[names.index(time_field)], 'day')
+        by_day.setdefault(day, []).append(json.dumps(record))
+    for day, lines in by_day.items():
+        path = _archive_path(kind, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as member:
+                member.write(('\n'.join(lines) + '\n').encode())
+            raw.flush()
+            os.fsync(raw.fileno())
+    return sum(len(lines) for lines in by_day.values())
+
+
+def read_archive(kind, start=None, end=None):
+    """Archived rows of ``kind`` as dicts, oldest day first, with time in [start, end)"""
+    root = archive_dir()
+    if root is None or not (root / kind).is_dir():
+        return
+    time_field = KINDS[kind][1]
+    first_day = truncate(start, 'day').date() if start else None
+    for path in sorted((root / kind).glob('*/*.ndjson.gz')):
+        day = datetime.strptime(path.name[:10], '%Y-%m-%d').date()
+        if (first_day and day < first_day) or (end and day > truncate(end, 'day').date()):
+            continue
+        seen = set()
+        with gzip.open(path, 'rt') as lines:
+            for line in lines:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                ts = datetime.fromisoformat(record[time_field])
+                if (start is None or ts >= start) and (end is None or ts < end):
+                    yield record
+
+
+# ==========================
+#  EXPIRY
+# ==========================
+
+def _delete(model, ids):
+    if ids:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def expired(kind, now=None):
+    """Querysets of expired rows per policy key, e.g. {'DANGEROUS': <QuerySet>}"""
+    model, time_field, policy_field, _ = KINDS[kind]
+    return {
+        key: model.objects.filter(**{policy_field: key, f'{time_field}__lt': cutoff(days, now)})
+        for key, days in policies().get(kind, {}).items() if days is not None
+    }
+
+
+def _expire_batch(kind, ids):
+    """Archive then delete one batch of ``kind`` rows (and an incident's alerts and AI logs)"""
+    archiving = archive_dir() is not None
+    if kind == 'incidents':
+        alerts = Alert.objects.filter(incident_id__in=ids)
+        logs = AIVerificationLog.objects.filter(incident_id__in=ids)
+        if archiving:
+            archive('alerts', alerts)
+            archive('ai_logs', logs)
+            archive('incidents', Incident.objects.filter(id__in=ids))
+        with transaction.atomic():
+            # Raw deletes: per-row signals would rebuild stats and dashboards 500 times a batch
+            _delete(Alert, list(alerts.values_list('id', flat=True)))
+            _delete(AIVerificationLog, list(logs.values_list('id', flat=True)))
+            _delete(Incident, ids)
+    else:
+        if archiving:
+            archive(kind, KINDS[kind][0].objects.filter(id__in=ids))
+        with transaction.atomic():
+            _delete(KINDS[kind][0], ids)
+
+
+def apply(batch_size=None, pause=0.0, now=None, log=None):
+    """Expire everything past its policy; returns {kind: {policy key: rows removed}}"""
+    batch_size = batch_size or getattr(settings, 'RETENTION_BATCH_SIZE', 500)
+    now = now or timezone.now()
+    removed = {}
+    # Incidents first: their AI logs go with them and needn't be expired twice
+    for kind in ('incidents', 'ai_logs'):
+        time_field = KINDS[kind][1]
+        for key, queryset in expired(kind, now).items():
+            count = 0
+            while ids := list(queryset.order_by(time_field, 'id').values_list('id', flat=True)[:batch_size]):
+                _expire_batch(kind, ids)
+                count += len(ids)
+                if log:
+                    log(f"{kind} {key}: {count} removed")
+                if pause:
+                    time.sleep(pause)
+            removed.setdefault(kind, {})[key] = count
+    if removed.get('incidents') and any(removed['incidents'].values()):
+        stats.dashboard.mark_dirty()
+    return removed
@@ -0,0 +1,137 @@
+"""
+Incident time-series rollups.
+
+Every ingested incident bumps one IncidentRollup row per resolution
+(minute, hour, day) for its camera, type and detection source, so charts
+read a few hundred pre-aggregated rows instead of scanning Incident.
+Deleting raw incidents (retention) leaves the rollups alone; ``rebuild()``
+recomputes them from the raw data in a time range where none has expired.
+
+Inside ``deferred()`` the bumps are only summed, to be written with one
+``apply()`` per transaction: the ingest writer does that for each batch.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+
+from .models import Incident, IncidentRollup
+
+RESOLUTIONS = [value for value, _ in IncidentRollup.RESOLUTIONS]
+GROUP_BY = ('camera', 'type', 'detected_by')
+
+_deferred = threading.local()
+
+
+def truncate(ts, resolution):
+    """Start of the UTC bucket containing ``ts``"""
+    ts = ts.astimezone(dt_timezone.utc)
+    if resolution == 'minute':
+        return ts.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record(incident, delta=1, key=None):
+    """Add ``delta`` to the incident's buckets; ``key`` overrides (camera_id, type, detected_by)"""
+    key = key or (incident.camera_id, incident.type, incident.detected_by)
+    deltas = {(resolution, truncate(incident.timestamp, resolution), *key): delta for resolution in RESOLUTIONS}
+    pending = getattr(_deferred, 'deltas', None)
+    if pending is None:
+        apply(deltas)
+        return
+    for bucket_key, delta in deltas.items():
+        pending[bucket_key] = pending.get(bucket_key, 0) + delta
+
+
+@contextmanager
+def deferred():
+    """
+    Sum this thread's ``record()`` calls instead of writing them. Yields the
+    ``{(resolution, bucket, camera_id, type, detected_by): delta}`` dict to ``apply()``.
+    """
+    outer = getattr(_deferred, 'deltas', None)
+    _deferred.deltas = {}
+    try:
+        yield _deferred.deltas
+    finally:
+        _deferred.deltas = outer
+
+
+def apply(deltas):
+    """Add each delta to its bucket: one UPDATE (or INSERT) per bucket"""
+    with transaction.atomic():
+        for (resolution, bucket, camera_id, type, detected_by), delta in deltas.items():
+            key = {'camera_id': camera_id, 'type': type, 'detected_by': detected_by}
+            rows = IncidentRollup.objects.filter(resolution=resolution, bucket=bucket, **key)
+            if not delta or rows.update(count=F('count') + delta) or delta < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    IncidentRollup.objects.create(resolution=resolution, bucket=bucket, count=delta, **key)
+            except IntegrityError:
+                # Created concurrently since the update; add to it instead
+                rows.update(count=F('count') + delta)
+
+
+def rebuild(since=None, until=None, batch_size=1000):
+    """
+    Recompute rollups from raw incidents in [since, until).
+
+    ``since`` defaults to the oldest raw incident, so buckets older than the
+    retained raw data keep their counts. It is never earlier than
+    ``retention.complete_since()``: before that, some incident types have
+    already been archived. Bounds are widened to whole days so every bucket
+    touched is rebuilt completely. Returns the rows written.
+    """
+    from .retention import complete_since
+
+    incidents = Incident.objects.all()
+    if since is None:
+        oldest = incidents.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            return 0
+        since = oldest
+    since = truncate(since, 'day')
+    floor = complete_since()
+    if floor is not None and since < floor:
+        since = floor
+    incidents = incidents.filter(timestamp__gte=since)
+    rollups = IncidentRollup.objects.filter(bucket__gte=since)
+    if until is not None:
+        until = truncate(until, 'day')
+        incidents = incidents.filter(timestamp__lt=until)
+        rollups = rollups.filter(bucket__lt=until)
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        for resolution in RESOLUTIONS:
+            rows = (
+                incidents.annotate(bucket=Trunc('timestamp', resolution, tzinfo=dt_timezone.utc))
+                .values('bucket', 'camera_id', 'type', 'detected_by')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            objs = [IncidentRollup(resolution=resolution, **row) for row in rows.iterator()]
+            IncidentRollup.objects.bulk_create(objs, batch_size=batch_size)
+            written += len(objs)
+    return written
+
+
+def timeline(resolution, start, end, cameras=None, group_by=()):
+    """
+    Incident counts per bucket in [start, end), summed over everything not in ``group_by``.
+    Returns ``[{'bucket': ..., 'count': ..., <group_by fields>}]`` ordered by bucket.
+    """
+    rows = IncidentRollup.objects.filter(resolution=resolution, bucket__gte=truncate(start, resolution),
+                                         bucket__lt=end)
+    if cameras:
+        rows = rows.filter(camera_id__in=cameras)
+    fields = ['bucket'] + [('camera_id' if field == 'camera' else field) for field in group_by]
+    return list(rows.values(*fields).annotate(count=Sum('count')).order_by(*fields))
@@ -7,3 +7,7 @@ websocket_urlpatterns = [
     re_path(r'^ws/dashboard/?$', consumers.DashboardConsumer.as_asgi()),
 ]
 
+# Served ahead of Django's URLconf (backend/asgi.py)
+http_urlpatterns = [
+    re_path(r'^api/incidents/ingest/?$', consumers.IngestConsumer.as_asgi()),
+]
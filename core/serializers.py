@@ -1,12 +1,64 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
-from .models import User, Camera, Incident, Alert, Report, AIVerificationLog
+from .models import User, Camera, DetectionProfile, Incident, Alert, Report, AIVerificationLog
+
+
+# ==========================
+#  SPARSE FIELDSETS
+# ==========================
+
+class DynamicFieldsMixin:
+    """
+    Lets GET requests shape the output with query parameters:
+
+    - ``?fields=id,title,incident`` keeps only those top-level fields
+    - ``?expand=incident,incident.camera`` nests only the listed relations and
+      renders every other nested object as its id; ``?expand=`` flattens all
+
+    Without either parameter the full nested representation is returned.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return fields
+
+        path = self._field_path()
+        only = request.query_params.get('fields')
+        if only and not path:
+            wanted = {name.strip() for name in only.split(',')}
+            fields = {name: field for name, field in fields.items() if name in wanted}
+
+        expand = request.query_params.get('expand')
+        if expand is None:
+            return fields
+        expanded = {name.strip() for name in expand.split(',')}
+        for name, field in list(fields.items()):
+            if not isinstance(field, serializers.BaseSerializer):
+                continue
+            if '.'.join(filter(None, [path, name])) not in expanded:
+                source = field.source if field.source not in (None, name) else None
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, source=source)
+        return fields
+
+    def _field_path(self):
+        """Dotted position of this serializer below the root ('' for the root)"""
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
 
 
 # ==========================
 #  USER
 # ==========================
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'role', 'is_active', 'is_staff']
@@ -16,17 +68,66 @@ class UserSerializer(serializers.ModelSerializer):
 #  CAMERA
 # ==========================
 
-class CameraSerializer(serializers.ModelSerializer):
+class CameraSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Camera
         fields = ['id', 'name', 'location', 'ip_address', 'is_active', 'last_checked']
 
 
+class DetectionProfileSerializer(serializers.ModelSerializer):
+    camera_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = DetectionProfile
+        fields = [
+            'camera_id',
+            'security_objects',
+            'confidence_threshold',
+            'cooldowns',
+            'inference_backend',
+            'version',
+            'updated_at',
+        ]
+        read_only_fields = ['version', 'updated_at']
+
+    def validate_security_objects(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Must be an object keyed by class name")
+        for name, info in value.items():
+            if not isinstance(info, dict) or info.get('risk') not in DetectionProfile.RISK_LEVELS:
+                raise serializers.ValidationError(
+                    f"'{name}' needs a risk of {', '.join(DetectionProfile.RISK_LEVELS)}"
+                )
+        return {name.lower(): info for name, info in value.items()}
+
+    def validate_confidence_threshold(self, value):
+        if not 0 <= value <= 1:
+            raise serializers.ValidationError("Must be between 0 and 1")
+        return value
+
+    def validate_cooldowns(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Must be an object keyed by risk level")
+        for risk, seconds in value.items():
+            if risk not in DetectionProfile.RISK_LEVELS:
+                raise serializers.ValidationError(f"Unknown risk level '{risk}'")
+            if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not seconds > 0:
+                raise serializers.ValidationError(f"Cooldown for '{risk}' must be a positive number")
+        return value
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            # Bumped in the database, so concurrent changes each get their own version
+            DetectionProfile.objects.filter(pk=instance.pk).update(version=F('version') + 1)
+            instance.refresh_from_db(fields=['version'])
+            return super().update(instance, validated_data)
+
+
 # ==========================
 #  INCIDENT
 # ==========================
 
-class IncidentSerializer(serializers.ModelSerializer):
+class IncidentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     camera = CameraSerializer(read_only=True)
 
     camera_id = serializers.PrimaryKeyRelatedField(
@@ -47,20 +148,25 @@ class IncidentSerializer(serializers.ModelSerializer):
             'detected_by',
             'timestamp',
             'is_verified',
-            'type'
+            'type',
+            'trace_id',
+            'trace'
         ]
+        read_only_fields = ['trace_id', 'trace']
 
 
 # ==========================
 #  ALERT
 # ==========================
 
-class AlertSerializer(serializers.ModelSerializer):
+class AlertSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
     created_by_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         source='created_by',
-        write_only=True
+        write_only=True,
+        required=False,
+        allow_null=True
     )
 
     incident = IncidentSerializer(read_only=True)
@@ -82,20 +188,23 @@ class AlertSerializer(serializers.ModelSerializer):
             'created_by',
             'created_by_id',
             'created_at',
-            'acknowledged'
+            'acknowledged',
+            'acknowledged_at'
         ]
+        read_only_fields = ['acknowledged_at']
 
 
 # ==========================
 #  REPORT
 # ==========================
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     generated_by = UserSerializer(read_only=True)
     generated_by_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         source='generated_by',
-        write_only=True
+        write_only=True,
+        required=False
     )
 
     class Meta:
@@ -107,15 +216,18 @@ class ReportSerializer(serializers.ModelSerializer):
             'period_end',
             'generated_by',
             'generated_by_id',
-            'created_at'
+            'created_at',
+            'status',
+            'data'
         ]
+        read_only_fields = ['status', 'data']
 
 
 # ==========================
 #  AI VERIFICATION LOGS
 # ==========================
 
-class AIVerificationLogSerializer(serializers.ModelSerializer):
+class AIVerificationLogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     incident = IncidentSerializer(read_only=True)
     incident_id = serializers.PrimaryKeyRelatedField(
         queryset=Incident.objects.all(),
@@ -1,53 +1,136 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Alert
-from .serializers import AlertSerializer
+from .models import Camera, Incident, Alert, Report, DetectionProfile
+from .serializers import DetectionProfileSerializer
+from .stats import dashboard
+from .dashboard import publisher as dashboard_publisher
+from . import alerts, outbox, rollups
+
+
+@receiver(post_init, sender=Alert)
+def alert_loaded(sender, instance, **kwargs):
+    instance._broadcast_snapshot = alerts.snapshot(instance)
 
 
 @receiver(post_save, sender=Alert)
 def alert_saved(sender, instance, created, **kwargs):
     """Send WebSocket notification when alert is created or updated"""
-    try:
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            alert_serializer = AlertSerializer(instance)
-            action = 'created' if created else 'updated'
-            
-            async_to_sync(channel_layer.group_send)(
-                'alerts',
-                {
-                    'type': 'alert_message',
-                    'message': f'Alert {action}',
-                    'alert_data': {
-                        'action': action,
-                        'alert': alert_serializer.data,
-                    }
-                }
-            )
-            print(f"WebSocket notification sent for alert {instance.id} ({action})")
-    except Exception as e:
-        print(f"Error sending WebSocket message for alert: {e}")
+    if created:
+        alerts.broadcast(instance, 'created')
+    else:
+        alerts.broadcast(instance, 'updated', alerts.changed_fields(instance, instance._broadcast_snapshot))
+    instance._broadcast_snapshot = alerts.snapshot(instance)
 
 
 @receiver(post_delete, sender=Alert)
 def alert_deleted(sender, instance, **kwargs):
     """Send WebSocket notification when alert is deleted"""
-    try:
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                'alerts',
-                {
-                    'type': 'alert_message',
-                    'message': 'Alert deleted',
-                    'alert_data': {
-                        'action': 'deleted',
-                        'alert': {'id': instance.id},
-                    }
-                }
-            )
-    except Exception as e:
-        print(f"Error sending WebSocket message for deleted alert: {e}")
+    alerts.broadcast(instance, 'deleted')
+
+
+@receiver(post_save, sender=DetectionProfile)
+def detection_profile_saved(sender, instance, **kwargs):
+    """Push the new profile to detectors listening on the camera's group"""
+    outbox.send(f'camera_{instance.camera_id}', 'detection_profile', {
+        'type': 'detection_profile',
+        'camera_id': str(instance.camera_id),
+        'data': DetectionProfileSerializer(instance).data,
+    })
+
+
+# ==========================
+#  DASHBOARD STATS
+# ==========================
+# Keep core.stats.dashboard current. post_init remembers the loaded flag so
+# a save can tell what changed; rows loaded without it (.only()/.defer())
+# make the stats reconcile instead.
+
+@receiver(post_init, sender=Camera)
+def camera_loaded(sender, instance, **kwargs):
+    instance._stats_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=Camera)
+def camera_saved_stats(sender, instance, created, **kwargs):
+    if created:
+        dashboard.count_cameras(total=1, active=int(instance.is_active))
+    elif instance._stats_active is None:
+        dashboard.mark_dirty()
+    else:
+        dashboard.count_cameras(active=int(instance.is_active) - int(instance._stats_active))
+    instance._stats_active = instance.is_active
+
+
+@receiver(post_delete, sender=Camera)
+def camera_deleted_stats(sender, instance, **kwargs):
+    dashboard.count_cameras(total=-1, active=-int(bool(instance._stats_active)))
+
+
+@receiver(post_init, sender=Incident)
+def incident_loaded(sender, instance, **kwargs):
+    instance._stats_verified = instance.__dict__.get('is_verified')
+
+
+@receiver(post_save, sender=Incident)
+def incident_saved_stats(sender, instance, created, **kwargs):
+    dashboard_publisher.incident_changed(instance)
+    if created:
+        dashboard.count_incidents(int(not instance.is_verified))
+    elif instance._stats_verified is None:
+        dashboard.mark_dirty()
+    else:
+        dashboard.count_incidents(int(instance._stats_verified) - int(instance.is_verified))
+    instance._stats_verified = instance.is_verified
+
+
+@receiver(post_delete, sender=Incident)
+def incident_deleted_stats(sender, instance, **kwargs):
+    dashboard.count_incidents(-int(instance._stats_verified is False))
+
+
+@receiver(post_save, sender=Alert)
+def alert_saved_stats(sender, instance, **kwargs):
+    dashboard.alert_saved(instance)
+
+
+@receiver(post_delete, sender=Alert)
+def alert_deleted_stats(sender, instance, **kwargs):
+    dashboard.alert_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Report)
+def report_saved_stats(sender, instance, **kwargs):
+    dashboard.report_saved(instance)
+
+
+@receiver(post_delete, sender=Report)
+def report_deleted_stats(sender, instance, **kwargs):
+    dashboard.report_deleted(instance.pk)
+
+
+# ==========================
+#  INCIDENT ROLLUPS
+# ==========================
+# Deletes are deliberately not subtracted: rollups outlive raw incidents
+# removed by retention.
+
+def _rollup_key(instance):
+    values = instance.__dict__
+    key = (values.get('camera_id'), values.get('type'), values.get('detected_by'))
+    return None if None in key else key
+
+
+@receiver(post_init, sender=Incident)
+def incident_loaded_rollups(sender, instance, **kwargs):
+    instance._rollup_key = _rollup_key(instance)
+
 
+@receiver(post_save, sender=Incident)
+def incident_saved_rollups(sender, instance, created, **kwargs):
+    key = _rollup_key(instance)
+    if created:
+        rollups.record(instance)
+    elif instance._rollup_key and key != instance._rollup_key:
+        rollups.record(instance, -1, key=instance._rollup_key)
+        rollups.record(instance)
+    instance._rollup_key = key
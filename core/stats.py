@@ -0,0 +1,134 @@
+"""
+Dashboard statistics kept in memory.
+
+``dashboard`` holds the numbers behind ``/api/dashboard/stats/``. Model
+signals (core.signals) apply deltas to it once their transaction commits, so
+the endpoint answers from memory instead of running five queries per call.
+Writes that bypass signals (``QuerySet.update()``, other processes, raw SQL)
+are caught by reconciling against the database at most every
+``DASHBOARD_STATS_RECONCILE_SECONDS``, or on the next read after
+``mark_dirty()``.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+
+class DashboardStats:
+    RECENT_ALERTS = 5
+    LAST_REPORTS = 3
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_at = None  # monotonic time of the last reconcile, None when dirty
+        self.total_cameras = 0
+        self.active_cameras = 0
+        self.active_incidents = 0
+        self._alerts = []   # [(created_at, id, row)] newest first
+        self._reports = []
+        self._listeners = []
+
+    @property
+    def reconcile_interval(self):
+        return getattr(settings, 'DASHBOARD_STATS_RECONCILE_SECONDS', 60)
+
+    def snapshot(self):
+        """Current stats, in the shape the endpoint has always returned"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reconcile_interval:
+                self.reconcile()
+            return {
+                'total_cameras': self.total_cameras,
+                'active_cameras': self.active_cameras,
+                'recent_alerts': [dict(row) for _, _, row in self._alerts],
+                'active_incidents': self.active_incidents,
+                'last_reports': [dict(row) for _, _, row in self._reports],
+            }
+
+    def reconcile(self):
+        """Reload everything from the database"""
+        from .models import Camera, Incident, Alert, Report
+
+        with self._lock:
+            self.total_cameras = Camera.objects.count()
+            self.active_cameras = Camera.objects.filter(is_active=True).count()
+            self.active_incidents = Incident.objects.filter(is_verified=False).count()
+            self._alerts = [
+                (row['created_at'], row.pop('id'), row)
+                for row in Alert.objects.order_by('-created_at', '-id')[:self.RECENT_ALERTS]
+                .values('id', 'title', 'message', 'created_at')
+            ]
+            self._reports = [
+                (row['created_at'], row.pop('id'), row)
+                for row in Report.objects.order_by('-created_at', '-id')[:self.LAST_REPORTS]
+                .values('id', 'summary', 'created_at')
+            ]
+            self._loaded_at = time.monotonic()
+
+    def mark_dirty(self):
+        """Reconcile on the next read"""
+        with self._lock:
+            self._loaded_at = None
+
+    def subscribe(self, callback):
+        """Call ``callback()`` after every committed delta"""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            callback()
+
+    # ==========================
+    #  DELTAS
+    # ==========================
+
+    def _on_commit(self, apply):
+        def run():
+            with self._lock:
+                # Nothing to adjust before the first load; the reconcile reads the truth
+                if self._loaded_at is not None:
+                    apply()
+            self._notify()
+        transaction.on_commit(run)
+
+    def count_cameras(self, total=0, active=0):
+        def apply():
+            self.total_cameras += total
+            self.active_cameras += active
+        self._on_commit(apply)
+
+    def count_incidents(self, active):
+        def apply():
+            self.active_incidents += active
+        self._on_commit(apply)
+
+    def alert_saved(self, alert):
+        row = {'title': alert.title, 'message': alert.message, 'created_at': alert.created_at}
+        self._on_commit(lambda: self._keep_latest(self._alerts, alert.pk, row, self.RECENT_ALERTS))
+
+    def alert_deleted(self, alert_id):
+        self._on_commit(lambda: self._drop(self._alerts, alert_id))
+
+    def report_saved(self, report):
+        row = {'summary': report.summary, 'created_at': report.created_at}
+        self._on_commit(lambda: self._keep_latest(self._reports, report.pk, row, self.LAST_REPORTS))
+
+    def report_deleted(self, report_id):
+        self._on_commit(lambda: self._drop(self._reports, report_id))
+
+    def _keep_latest(self, entries, pk, row, limit):
+        entries[:] = [entry for entry in entries if entry[1] != pk]
+        entries.append((row['created_at'], pk, row))
+        entries.sort(key=lambda entry: (entry[0], entry[1]), reverse=True)
+        del entries[limit:]
+
+    def _drop(self, entries, pk):
+        # The next-newest row isn't kept in memory, so refill from the database
+        if any(entry[1] == pk for entry in entries):
+            self._loaded_at = None
+
+
+dashboard = DashboardStats()
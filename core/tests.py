@@ -1,3 +1,1055 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import alerts, dashboard, ingest, outbox, retention, rollups, routing, stats, tracing, video_views
+from .channel_layers import Broker, UnixSocketChannelLayer
+from .consumers import AlertConsumer
+from .serializers import DetectionProfileSerializer
+from .models import (User, Camera, DetectionProfile, Incident, IncidentRollup, Alert, Report, AIVerificationLog,
+                     OutboxEvent)
+
+
+
+def setUpModule():
+    # No server loop here: send dashboard updates inline, not from a timer thread
+    # writing outside the test's transaction (DashboardPublisherTests covers the timer)
+    dashboard.publisher._schedule = lambda delay: dashboard.publisher._send()
+
+
+def tearDownModule():
+    del dashboard.publisher._schedule
+
+
+class NestedSerializationQueryTests(TestCase):
+    """List and detail endpoints must not issue a query per row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='operator', password='secret')
+        cameras = [
+            Camera.objects.create(name=f'Camera {i}', location='Lobby', ip_address=f'10.0.0.{i}')
+            for i in range(3)
+        ]
+        for i in range(30):
+            incident = Incident.objects.create(
+                camera=cameras[i % 3], description=f'Incident {i}', detected_by='YOLO'
+            )
+            Alert.objects.create(incident=incident, created_by=cls.user, message=f'Alert {i}')
+            AIVerificationLog.objects.create(incident=incident, decision='SAFE', confidence_score=50)
+        now = timezone.now()
+        for i in range(5):
+            Report.objects.create(generated_by=cls.user, summary=f'Report {i}',
+                                  period_start=now - timedelta(days=1), period_end=now)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertListQueries(self, url, num):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_list_endpoints_use_one_query(self):
+        for url in ['/api/incidents/', '/api/alerts/', '/api/reports/', '/api/ai-logs/']:
+            with self.subTest(url=url):
+                self.assertTrue(self.assertListQueries(url, 1))
+
+    def test_detail_endpoints_use_one_query(self):
+        alert = Alert.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/alerts/{alert.id}/')
+        self.assertEqual(response.json()['incident']['camera']['name'], alert.incident.camera.name)
+
+    def test_default_output_is_nested(self):
+        alert = self.assertListQueries('/api/alerts/', 1)[0]
+        self.assertEqual(alert['created_by']['username'], 'operator')
+        self.assertIn('name', alert['incident']['camera'])
+
+    def test_empty_expand_returns_ids(self):
+        alert = self.assertListQueries('/api/alerts/?expand=', 1)[0]
+        self.assertIsInstance(alert['incident'], int)
+        self.assertEqual(alert['created_by'], self.user.id)
+
+    def test_expand_nests_only_listed_relations(self):
+        alert = self.assertListQueries('/api/alerts/?expand=incident', 1)[0]
+        self.assertIsInstance(alert['incident'], dict)
+        self.assertIsInstance(alert['incident']['camera'], int)
+        self.assertIsInstance(alert['created_by'], int)
+
+        alert = self.assertListQueries('/api/alerts/?expand=incident,incident.camera', 1)[0]
+        self.assertIn('name', alert['incident']['camera'])
+
+    def test_fields_limits_top_level_fields(self):
+        incident = self.assertListQueries('/api/incidents/?fields=id,timestamp', 1)[0]
+        self.assertEqual(set(incident), {'id', 'timestamp'})
+
+    def test_create_incident(self):
+        camera = Camera.objects.first()
+        response = self.client.post('/api/incidents/', {
+            'camera_id': camera.id, 'description': 'Person at the door', 'confidence_score': 88.0,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['camera']['id'], camera.id)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors walk the ordering both ways without skipping or repeating rows, and reject tampering"""
+
+    @classmethod
+    def setUpTestData(cls):
+        camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.9.1')
+        incidents = [Incident.objects.create(camera=camera, description=f'Incident {i}') for i in range(7)]
+        # Rows 1-4 share a timestamp, so pages of 2 split them
+        now = timezone.now()
+        for i, incident in enumerate(incidents):
+            Incident.objects.filter(pk=incident.pk).update(timestamp=now if 1 <= i <= 4 else now + timedelta(seconds=i))
+        cls.expected = list(Incident.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_walks_forward_and_back(self):
+        pages, url = [], '/api/incidents/?page_size=2&fields=id'
+        while url:
+            page = self.get(url)
+            self.assertEqual(page['previous'] is None, not pages)
+            pages.append([row['id'] for row in page['results']])
+            url = page['next']
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual(len(pages), 4)
+
+        back, url = [], page['previous']
+        while url:
+            page = self.get(url)
+            back.insert(0, [row['id'] for row in page['results']])
+            url = page['previous']
+        self.assertEqual(back, pages[:-1])
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        def cursor(position):
+            return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+        for token in ['not-base64!', cursor([1, 2]), cursor({'v': 'yesterday', 'id': 1}),
+                      cursor({'v': timezone.now().isoformat()}), cursor({'v': None, 'id': 1}),
+                      cursor({'v': timezone.now().isoformat(), 'id': '1'}),
+                      cursor({'v': timezone.now().isoformat(), 'id': 1.5})]:
+            with self.subTest(token=token):
+                self.get(f'/api/incidents/?cursor={token}', status=400)
+
+    def test_page_size_is_capped(self):
+        with self.settings(API_MAX_PAGE_SIZE=3):
+            self.assertEqual(len(self.get('/api/incidents/?page_size=1000')['results']), 3)
+        self.assertEqual(len(self.get('/api/incidents/?page_size=0')['results']), 7)  # invalid: the default
+
+
+class DetectionProfileTests(TestCase):
+    """Profiles read as defaults until changed, validate cooldowns and count their versions"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.10.1')
+        self.url = f'/api/cameras/{self.camera.id}/profile/'
+
+    def test_get_does_not_create(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['confidence_threshold'], response.json()['version']), (0.5, 1))
+        self.assertFalse(DetectionProfile.objects.exists())
+
+        response = self.client.patch(self.url, {'cooldowns': {'high': 15}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DetectionProfile.objects.get().cooldowns, {'high': 15})
+
+    def test_version_counts_every_change(self):
+        self.client.patch(self.url, {'confidence_threshold': 0.6}, format='json')
+        stale = DetectionProfile.objects.get()
+        self.client.patch(self.url, {'confidence_threshold': 0.7}, format='json')
+        # A write from an instance loaded before the last one still gets a new version
+        serializer = DetectionProfileSerializer(stale, data={'confidence_threshold': 0.8}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(serializer.data['version'], 4)
+        self.assertEqual(DetectionProfile.objects.get().version, 4)
+
+    def test_cooldowns_must_be_positive(self):
+        for cooldowns in [{'high': True}, {'high': 0}, {'high': -5}, {'high': '15'}, {'extreme': 5}, [5]]:
+            with self.subTest(cooldowns=cooldowns):
+                serializer = DetectionProfileSerializer(data={'cooldowns': cooldowns}, partial=True)
+                self.assertFalse(serializer.is_valid())
+                self.assertIn('cooldowns', serializer.errors)
+        self.assertTrue(DetectionProfileSerializer(data={'cooldowns': {'low': 300, 'high': 2.5}}, partial=True).is_valid())
+        self.assertEqual(self.client.put(self.url, {'cooldowns': {'high': 0}}, format='json').status_code, 400)
+
+
+class DashboardStatsTests(TestCase):
+    """The stats endpoint answers from memory and follows writes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.0.1')
+        stats.dashboard.mark_dirty()
+
+    def get_stats(self, num_queries=0):
+        with self.assertNumQueries(num_queries):
+            response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_served_from_memory_after_first_load(self):
+        self.get_stats(num_queries=5)
+        self.get_stats()
+
+    def test_follows_writes(self):
+        self.get_stats(num_queries=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            incident = Incident.objects.create(camera=self.camera, detected_by='YOLO')
+            Alert.objects.create(incident=incident, title='Knife', message='Knife at the gate')
+            Camera.objects.create(name='Yard', location='South', ip_address='10.0.0.2', is_active=False)
+        data = self.get_stats()
+        self.assertEqual((data['total_cameras'], data['active_cameras']), (2, 1))
+        self.assertEqual(data['active_incidents'], 1)
+        self.assertEqual(data['recent_alerts'][0]['title'], 'Knife')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            incident.is_verified = True
+            incident.save()
+            self.client.post('/api/analysis/stop/', {'camera_ids': [self.camera.id]}, format='json')
+        data = self.get_stats()
+        self.assertEqual((data['active_cameras'], data['active_incidents']), (0, 0))
+
+    def test_matches_database_after_reconcile(self):
+        self.get_stats(num_queries=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Incident.objects.create(camera=self.camera, detected_by='AI', is_verified=bool(i % 2))
+            self.camera.delete()
+        cached = self.get_stats()
+        stats.dashboard.mark_dirty()
+        self.assertEqual(self.get_stats(num_queries=5), cached)
+
+
+class DashboardPublisherTests(SimpleTestCase):
+    """Changes are coalesced with or without a server loop, and a lost flush doesn't stall them"""
+
+    def setUp(self):
+        from unittest import mock
+        self.publisher = dashboard.DashboardPublisher()
+        self.publisher._last_sent = time.monotonic()  # just sent: the next flush waits an interval
+        self.timer = mock.patch('core.dashboard.threading.Timer').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_coalesced_without_loop(self):
+        for _ in range(3):
+            self.publisher._queue(stats=True)
+        [(delay, callback), _kwargs] = self.timer.call_args
+        self.assertEqual(self.timer.call_count, 1)
+        self.assertGreater(delay, 0)
+        self.assertEqual(callback, self.publisher._send_from_thread)
+
+    def test_lost_flush_is_rescheduled(self):
+        from unittest import mock
+        loop = mock.Mock(**{'is_running.return_value': True})
+        self.publisher.bind_loop(loop)
+        self.publisher._queue(stats=True)
+        self.publisher._queue(stats=True)
+        self.assertEqual(loop.call_soon_threadsafe.call_count, 1)
+
+        # The loop stopped before running the flush
+        self.publisher._due -= 2 * self.publisher.interval
+        self.publisher._queue(stats=True)
+        self.assertEqual(loop.call_soon_threadsafe.call_count, 2)
+
+        # The loop closed: the timer takes over
+        loop.call_soon_threadsafe.side_effect = RuntimeError('Event loop is closed')
+        self.publisher._due -= 2 * self.publisher.interval
+        self.publisher._queue(stats=True)
+        self.assertEqual(self.timer.call_count, 1)
+
+
+class IncidentRollupTests(TestCase):
+    """Rollups follow ingest, match a rebuild and back the timeline endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cameras = [
+            Camera.objects.create(name=f'Camera {i}', location='Dock', ip_address=f'10.0.1.{i}')
+            for i in range(2)
+        ]
+        for i in range(12):
+            Incident.objects.create(camera=self.cameras[i % 2], detected_by='YOLO' if i % 3 else 'AI',
+                                    type='DANGEROUS' if i % 4 == 0 else 'WORTH_CHECKING')
+
+    def rollup_rows(self):
+        return sorted(IncidentRollup.objects.values_list('resolution', 'bucket', 'camera_id', 'type',
+                                                         'detected_by', 'count'))
+
+    def test_ingest_matches_rebuild(self):
+        incremental = self.rollup_rows()
+        self.assertEqual(sum(row[-1] for row in incremental if row[0] == 'day'), 12)
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_type_change_moves_count(self):
+        incident = Incident.objects.filter(type='WORTH_CHECKING').first()
+        incident.type = 'CRITICAL'
+        incident.save()
+        day = IncidentRollup.objects.filter(resolution='day')
+        self.assertEqual(day.filter(type='CRITICAL').aggregate(n=Sum('count'))['n'], 1)
+        self.assertEqual(day.filter(type='WORTH_CHECKING').aggregate(n=Sum('count'))['n'], 8)
+
+    def test_deletes_keep_rollups(self):
+        Incident.objects.all().delete()
+        self.assertEqual(IncidentRollup.objects.filter(resolution='day').aggregate(n=Sum('count'))['n'], 12)
+
+    def test_timeline(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/incidents/timeline/?bucket=hour&group_by=type')
+        self.assertEqual(response.status_code, 200)
+        counts = {}
+        for row in response.json()['results']:
+            counts[row['type']] = counts.get(row['type'], 0) + row['count']
+        self.assertEqual(counts, {'DANGEROUS': 3, 'WORTH_CHECKING': 9})
+
+        camera = self.cameras[0].id
+        response = self.client.get(f'/api/incidents/timeline/?bucket=day&camera={camera}&start=2000-01-01')
+        self.assertEqual(sum(row['count'] for row in response.json()['results']), 6)
+
+        self.assertEqual(self.client.get('/api/incidents/timeline/?bucket=week').status_code, 400)
+
+    def test_deferred_bumps_are_summed(self):
+        before = self.rollup_rows()
+        with rollups.deferred() as deltas:
+            for i in range(10):
+                Incident.objects.create(camera=self.cameras[i % 2], detected_by='YOLO')
+        self.assertEqual(self.rollup_rows(), before)  # nothing written yet
+        self.assertEqual(sum(deltas.values()), 30)
+        self.assertLess(len(deltas), 30)  # per bucket: two cameras, three resolutions (more at a minute's turn)
+        with CaptureQueriesContext(connection) as queries:
+            rollups.apply(deltas)
+        self.assertEqual([q['sql'].split()[0] for q in queries].count('UPDATE'), len(deltas))
+        incremental = self.rollup_rows()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+
+class ReportGenerationTests(TestCase):
+    """Reports are computed with aggregate queries and stored with the summary"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cameras = [
+            Camera.objects.create(name=f'Camera {i}', location='Yard', ip_address=f'10.0.2.{i}')
+            for i in range(2)
+        ]
+        for i in range(6):
+            incident = Incident.objects.create(camera=self.cameras[0 if i < 4 else 1], detected_by='YOLO',
+                                               type='DANGEROUS' if i % 3 == 0 else 'WORTH_CHECKING',
+                                               is_verified=i % 2 == 0, confidence_score=60 + i * 4)
+            alert = Alert.objects.create(incident=incident, message=f'Alert {i}')
+            if i < 2:
+                alert.acknowledged = True
+                alert.acknowledged_at = alert.created_at + timedelta(minutes=3 * (i + 1))
+                alert.save()
+
+    def generate(self, **body):
+        now = timezone.now()
+        body.setdefault('period_start', (now - timedelta(hours=1)).isoformat())
+        body.setdefault('period_end', (now + timedelta(minutes=1)).isoformat())
+        return self.client.post('/api/reports/generate/', body, format='json')
+
+    def test_aggregates(self):
+        with self.assertNumQueries(8):  # report row, status, 5 aggregates, stored result
+            response = self.generate()
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report['status'], 'DONE')
+        data = report['data']
+        self.assertEqual((data['incidents']['total'], data['incidents']['verified']), (6, 3))
+        self.assertEqual(data['incidents']['mean_confidence'], 70.0)
+        self.assertEqual(data['incidents']['by_source'], {'YOLO': 6})
+        self.assertEqual(sum(row['count'] for row in data['incidents']['by_type'] if row['type'] == 'DANGEROUS'), 2)
+        self.assertEqual(data['top_cameras'][0], {'camera_id': self.cameras[0].id, 'name': 'Camera 0',
+                                                  'count': 4, 'verified_ratio': 0.5})
+        self.assertEqual((data['alerts']['total'], data['alerts']['acknowledged']), (6, 2))
+        self.assertEqual(data['alerts']['mean_seconds_to_acknowledge'], 270.0)
+        self.assertIn('6 incidents', report['summary'])
+
+    def test_camera_filter(self):
+        data = self.generate(camera_ids=[self.cameras[1].id]).json()['data']
+        self.assertEqual((data['incidents']['total'], data['alerts']['total']), (2, 2))
+
+    def test_long_period_runs_in_background(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.generate(period_start='2000-01-01')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertEqual(Report.objects.get().status, 'PENDING')
+        self.assertTrue(callbacks)  # the job starts once the row is committed
+        self.assertEqual(self.client.post('/api/reports/generate/', {}, format='json').status_code, 400)
+
+    def test_generate_daily(self):
+        response = self.client.post('/api/reports/generate_daily/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['incidents']['total'], 6)
+
+
+class ExportTests(TestCase):
+    """Exports stream filtered rows as CSV or NDJSON, optionally gzipped"""
+
+    def setUp(self):
+        cameras = [
+            Camera.objects.create(name=f'Camera {i}', location='Hall', ip_address=f'10.0.3.{i}')
+            for i in range(2)
+        ]
+        for i in range(9):
+            incident = Incident.objects.create(camera=cameras[i % 2], detected_by='YOLO',
+                                               type='DANGEROUS' if i % 3 == 0 else 'WORTH_CHECKING',
+                                               description=f'Line one, "quoted"\nline two #{i}')
+            Alert.objects.create(incident=incident, message=f'Alert {i}')
+        self.cameras = cameras
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        import csv
+        rows = list(csv.reader(StringIO(self.export('/api/export/incidents/').decode())))
+        self.assertEqual(rows[0][:3], ['id', 'timestamp', 'camera_id'])
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[1][-1], 'Line one, "quoted"\nline two #0')
+
+    def test_ndjson_filters(self):
+        body = self.export(f'/api/export/alerts/?format=ndjson&camera={self.cameras[0].id}&type=DANGEROUS')
+        alerts = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([a['message'] for a in alerts], ['Alert 0', 'Alert 6'])
+
+        body = self.export('/api/export/incidents/?format=ndjson&start=2000-01-01&end=2000-01-02')
+        self.assertEqual(body, b'')
+
+    def test_gzip(self):
+        import gzip
+        response = self.client.get('/api/export/incidents/?format=ndjson&gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 9)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/export/incidents/?format=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/alerts/?start=yesterday').status_code, 400)
+
+
+POLICIES = {'incidents': {'WORTH_CHECKING': 30, 'DANGEROUS': 180, 'CRITICAL': None}, 'ai_logs': {'SAFE': 7}}
+
+
+class RetentionTests(TestCase):
+    """Expired rows are archived in batches; rollups and the archive stay queryable"""
+
+    def setUp(self):
+        self.archive = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive.cleanup)
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.4.1')
+        now = timezone.now()
+        for i, (kind, age) in enumerate([('WORTH_CHECKING', 40)] * 5 + [('DANGEROUS', 40), ('CRITICAL', 400),
+                                                                        ('WORTH_CHECKING', 1)]):
+            incident = Incident.objects.create(camera=self.camera, type=kind, detected_by='YOLO')
+            Incident.objects.filter(pk=incident.pk).update(timestamp=now - timedelta(days=age))
+            Alert.objects.create(incident=incident, message=f'Alert {i}')
+            log = AIVerificationLog.objects.create(incident=incident, decision='CONFIRMED', raw_response={'i': i})
+        AIVerificationLog.objects.filter(pk=log.pk).update(created_at=now - timedelta(days=10))
+        old_log = AIVerificationLog.objects.create(decision='SAFE', raw_response={'boxes': [1, 2]})
+        AIVerificationLog.objects.filter(pk=old_log.pk).update(created_at=now - timedelta(days=10))
+        IncidentRollup.objects.all().delete()
+        rollups.rebuild()
+        self.rollups = sorted(IncidentRollup.objects.values_list('resolution', 'bucket', 'type', 'count'))
+
+    def apply(self):
+        with override_settings(RETENTION_POLICIES=POLICIES, RETENTION_ARCHIVE_DIR=self.archive.name):
+            call_command('apply_retention', batch_size=2, stdout=StringIO())
+
+    def test_expires_by_policy(self):
+        self.apply()
+        self.assertEqual(sorted(Incident.objects.values_list('type', flat=True)),
+                         ['CRITICAL', 'DANGEROUS', 'WORTH_CHECKING'])
+        self.assertEqual(Alert.objects.count(), 3 + 1)  # plus the CRITICAL incident's automatic alert
+        self.assertEqual(AIVerificationLog.objects.count(), 3)
+        self.assertFalse(AIVerificationLog.objects.filter(decision='SAFE').exists())
+
+    def test_archive_is_queryable(self):
+        self.apply()
+        with override_settings(RETENTION_ARCHIVE_DIR=self.archive.name):
+            incidents = list(retention.read_archive('incidents'))
+            self.assertEqual(len(incidents), 5)
+            self.assertEqual(len(list(retention.read_archive('alerts'))), 5)
+            logs = list(retention.read_archive('ai_logs'))
+            self.assertIn({'boxes': [1, 2]}, [log['raw_response'] for log in logs])
+
+            # A rerun after an interrupted batch archives rows twice; readers see them once
+            retention.archive('incidents', Incident.objects.all())
+            retention.archive('incidents', Incident.objects.all())
+            self.assertEqual(len(list(retention.read_archive('incidents'))), 8)
+
+            response = self.client.get('/api/export/incidents/?format=ndjson&archived=1&type=WORTH_CHECKING')
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+            self.assertEqual(len(rows), 6 + 1)  # five expired, the live one archived above, the live one
+
+    def test_rollups_intact(self):
+        self.apply()
+        self.assertEqual(sorted(IncidentRollup.objects.values_list('resolution', 'bucket', 'type', 'count')),
+                         self.rollups)
+        with override_settings(RETENTION_POLICIES=POLICIES):
+            call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(sorted(IncidentRollup.objects.values_list('resolution', 'bucket', 'type', 'count')),
+                         self.rollups)
+
+
+class AlertPipelineTests(TestCase):
+    """A CRITICAL incident raises one alert and one broadcast, after commit"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.5.1')
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        for group in ('alerts', 'alerts.site'):  # everything, and alerts without an incident
+            async_to_sync(self.layer.group_add)(group, self.channel)
+        self.addCleanup(async_to_sync(self.layer.flush))
+
+    def broadcasts(self, publish=True):
+        """Publish the outbox and return the messages the alerts group received"""
+        async def drain():
+            if publish:
+                await outbox.publisher.publish_pending()
+            messages = []
+            while True:
+                try:
+                    batch = await asyncio.wait_for(self.layer.receive(self.channel), 0.05)
+                except asyncio.TimeoutError:
+                    return messages
+                self.assertEqual(batch['type'], 'outbox_batch')
+                messages.extend(json.loads(message['text']) for message in batch['messages'])
+        return async_to_sync(drain)()
+
+    def test_critical_incident(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/incidents/', {
+                'camera_id': self.camera.id, 'type': 'CRITICAL', 'description': 'Knife', 'confidence_score': 91,
+            }, format='json')
+            self.assertEqual(self.broadcasts(publish=False), [])  # the request never sends itself
+        self.assertEqual(OutboxEvent.objects.filter(group='alerts').count(), 1)
+        self.assertEqual(response.status_code, 201)
+        alert = Alert.objects.get()
+        self.assertEqual(alert.idempotency_key, f"incident:{response.json()['id']}")
+        self.assertEqual(alert.message, 'Critical incident detected: Knife')
+        messages = self.broadcasts()
+        self.assertEqual([m['data']['action'] for m in messages], ['created'])
+        self.assertEqual(messages[0]['data']['alert']['incident']['camera']['name'], 'Gate')
+
+    def test_create_for_incident_is_idempotent(self):
+        incident = Incident.objects.create(camera=self.camera, type='CRITICAL')
+        alert, created = alerts.create_for_incident(incident)
+        self.assertFalse(created)
+        self.assertEqual(Alert.objects.filter(incident=incident).count(), 1)
+
+    def test_update_broadcasts_once(self):
+        alert = Alert.objects.create(message='Manual alert')
+        self.broadcasts()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/alerts/{alert.id}/', {'acknowledged': True}, format='json')
+        [update] = self.broadcasts()
+        self.assertEqual(update['data']['action'], 'updated')
+        self.assertTrue(update['data']['partial'])
+        self.assertEqual(set(update['data']['alert']), {'id', 'acknowledged', 'acknowledged_at'})
+
+        Alert.objects.get(pk=alert.pk).save()  # nothing changed, nothing sent
+        self.assertEqual(self.broadcasts(), [])
+
+        alert = Alert.objects.only('id', 'message').get(pk=alert.pk)
+        alert.message = 'Edited'
+        alert.save()  # deferred fields: changes unknown, the whole alert is sent
+        [update] = self.broadcasts()
+        self.assertNotIn('partial', update['data'])
+        self.assertEqual(update['data']['alert']['message'], 'Edited')
+
+    def test_bulk_acknowledge(self):
+        incidents = [Incident.objects.create(camera=self.camera, description=f'Motion {i}') for i in range(3)]
+        pending = [Alert.objects.create(incident=incident, message='Motion') for incident in incidents]
+        Alert.objects.filter(pk=pending[0].pk).update(acknowledged=True)
+        other = Alert.objects.create(message='Elsewhere')
+        yard = Camera.objects.create(name='Yard', location='South', ip_address='10.0.5.2')
+        severe = Alert.objects.create(incident=Incident.objects.create(camera=yard, type='DANGEROUS'), message='Knife')
+        self.broadcasts()
+        stats.dashboard.snapshot()
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/alerts/acknowledge/', {'camera': self.camera.id}, format='json')
+        self.assertEqual(response.json(), {'acknowledged': 2, 'ids': [pending[1].id, pending[2].id]})
+        self.assertEqual([q['sql'].split()[0] for q in queries].count('UPDATE'), 1)
+        self.assertEqual(Alert.objects.filter(acknowledged=True, acknowledged_at__isnull=False).count(), 2)
+        self.assertFalse(Alert.objects.get(pk=other.pk).acknowledged)
+
+        [event] = self.broadcasts()
+        self.assertEqual(event['data']['ids'], [pending[1].id, pending[2].id])
+        self.assertEqual(set(event['data']['alert']), {'acknowledged', 'acknowledged_at'})
+        self.assertIsNone(stats.dashboard._loaded_at)  # reloads on the next read
+
+        # One event per camera and severity, to the groups their alerts route to
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/alerts/acknowledge/', {'ids': [other.id, severe.id]}, format='json')
+        self.assertEqual(sorted(OutboxEvent.objects.filter(published_at__isnull=True).values_list('group', flat=True)),
+                         sorted(['alerts.site', *alerts._groups_for(severe)]))
+        self.assertEqual(sorted(e['data']['ids'] for e in self.broadcasts()), [[other.id], [severe.id]])
+
+        # Nothing left to acknowledge: no event; no filter at all: refused
+        self.client.post('/api/alerts/acknowledge/', {'ids': [pending[1].id]}, format='json')
+        self.assertEqual(self.broadcasts(), [])
+        self.assertEqual(self.client.post('/api/alerts/acknowledge/', {}, format='json').status_code, 400)
+
+    def test_latency_trace(self):
+        tracing.latency.reset()
+        self.addCleanup(tracing.latency.reset)
+        captured = time.time() - 0.5
+        trace = {'id': 'f00d', 'captured': captured, 'inferred': captured + 0.2, 'sent': captured + 0.4,
+                 'bogus': 1}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/incidents/', {
+                'camera_id': self.camera.id, 'type': 'CRITICAL', 'confidence_score': 91, 'trace': trace,
+            }, format='json')
+            self.client.post('/api/incidents/', {  # unusable traces are dropped, not the incident
+                'camera_id': self.camera.id, 'type': 'CRITICAL', 'trace': {'captured': captured},
+            }, format='json')
+        incident = Incident.objects.get(pk=response.json()['id'])
+        self.assertEqual(incident.trace_id, 'f00d')
+        self.assertEqual(set(incident.trace), {'id', 'captured', 'inferred', 'sent', 'received'})
+        self.assertEqual(Incident.objects.exclude(pk=incident.pk).get().trace, None)
+
+        [created, _] = self.broadcasts()
+        self.assertEqual(created['data']['alert']['incident']['trace'], incident.trace)
+
+        latency = self.client.get('/api/incidents/latency/').json()
+        [camera] = latency['cameras']
+        self.assertEqual(camera['camera'], 'Gate')
+        self.assertEqual(list(camera['stages']), ['inference', 'reporting', 'ingest', 'db_write', 'fanout', 'total'])
+        # Published once, though announced by the alert and the dashboard in several groups
+        self.assertEqual({stage['count'] for stage in camera['stages'].values()}, {1})
+        inference = camera['stages']['inference']
+        self.assertEqual(len(inference['buckets']), len(latency['buckets']) + 1)
+        self.assertEqual(inference['buckets'][latency['buckets'].index(0.25)], 1)
+        self.assertGreaterEqual(camera['stages']['total']['max_ms'], 500)
+        self.assertEqual(self.client.get(f'/api/incidents/latency/?camera={self.camera.id + 1}').json()['cameras'], [])
+
+    def test_latency_recorded_on_commit(self):
+        tracing.latency.reset()
+        self.addCleanup(tracing.latency.reset)
+        trace = {'id': 'f00d', 'captured': time.time() - 0.5}
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                ingest.create_incident(self.camera, 'Rolled back', 'WORTH_CHECKING', trace=trace)
+                raise RuntimeError  # e.g. a later statement of the same write failed
+            ingest.create_incident(self.camera, 'Kept', 'WORTH_CHECKING', trace=trace)
+            self.assertEqual(tracing.latency.snapshot(), {})
+        self.assertEqual(tracing.latency.snapshot()[self.camera.id]['db_write']['count'], 1)
+
+
+@override_settings(INGEST_SINGLE_WRITER=False)  # the writer thread can't see the test's transaction
+class AsyncIngestTests(TestCase):
+    """The async ingest endpoint validates the payload and writes like the incident create view"""
+
+    def setUp(self):
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.6.1')
+        self.app = URLRouter(routing.http_urlpatterns)
+
+    async def request(self, body, method='POST', headers=None):
+        body = body if isinstance(body, bytes) else json.dumps(body).encode()
+        response = await HttpCommunicator(self.app, method, '/api/incidents/ingest/', body, headers).get_response()
+        return response['status'], json.loads(response['body'])
+
+    async def test_ingest(self):
+        status, body = await self.request({
+            'camera_id': str(self.camera.id), 'type': 'CRITICAL', 'description': 'Knife', 'confidence_score': 91,
+            'trace': {'id': 'beef', 'captured': time.time()},
+        })
+        self.assertEqual(status, 201)
+        incident = await Incident.objects.aget(pk=body['id'])
+        self.assertEqual((body['camera_id'], body['detected_by'], body['trace_id']), (self.camera.id, 'AI', 'beef'))
+        self.assertEqual((incident.description, incident.severity_level), ('Knife', 3))
+        self.assertIn('received', incident.trace)
+        self.assertTrue(await Alert.objects.filter(incident=incident).aexists())
+        self.assertTrue(await AIVerificationLog.objects.filter(incident=incident, decision='CONFIRMED').aexists())
+
+    async def test_rejects_bad_payloads(self):
+        for body, code in [
+            ({'description': 'No camera'}, 400),
+            ({'camera_id': True}, 400),
+            ({'camera_id': self.camera.id, 'type': 'URGENT'}, 400),
+            ({'camera_id': self.camera.id, 'confidence_score': '91'}, 400),
+            ([self.camera.id], 400),
+            (b'{', 400),
+            ({'camera_id': self.camera.id + 1}, 404),
+        ]:
+            with self.subTest(body=body):
+                self.assertEqual((await self.request(body))[0], code)
+        self.assertEqual((await self.request(b'', method='GET'))[0], 405)
+        self.assertEqual(await Incident.objects.acount(), 0)
+
+    async def test_rejects_oversized_bodies_before_buffering(self):
+        from unittest import mock
+        payload = {'camera_id': self.camera.id}
+        with mock.patch.object(ingest, 'parse_incident') as parse:
+            # Refused on the declared length, whatever has arrived so far
+            status, _ = await self.request(payload, headers=[(b'content-length', b'%d' % (10 * 1024 * 1024))])
+            self.assertEqual(status, 413)
+            with self.settings(DATA_UPLOAD_MAX_MEMORY_SIZE=8):
+                self.assertEqual((await self.request(payload))[0], 413)
+        parse.assert_not_called()
+
+    async def test_write_failures_are_json_errors(self):
+        from unittest import mock
+        from django.db import OperationalError
+        payload = {'camera_id': self.camera.id, 'description': 'Knife'}
+        for error, code in [(TimeoutError(), 503), (OperationalError('database is locked'), 503),
+                            (ValueError('bad write'), 500)]:
+            with self.subTest(error=error), mock.patch.object(ingest.writer, 'arun', side_effect=error):
+                status, body = await self.request(payload)
+                self.assertEqual(status, code)
+                self.assertIn('error', body)
+
+
+class OutboxTests(TestCase):
+    """Events are batched per group, marked published, and retried in order on failure"""
+
+    def setUp(self):
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.6.1')
+        self.layer = get_channel_layer()
+        self.addCleanup(async_to_sync(self.layer.flush))
+        self.channels = {}
+        for group in ('alerts.site', f'camera_{self.camera.id}'):  # alerts without an incident
+            self.channels[group] = async_to_sync(self.layer.new_channel)()
+            async_to_sync(self.layer.group_add)(group, self.channels[group])
+
+    def receive(self, group):
+        return async_to_sync(self.layer.receive)(self.channels[group])
+
+    def test_batches_per_group(self):
+        for i in range(3):
+            Alert.objects.create(message=f'Alert {i}')
+        profile, _ = DetectionProfile.objects.get_or_create(camera=self.camera)
+        profile.save()
+        async_to_sync(outbox.publisher.publish_pending)()
+
+        batch = self.receive('alerts.site')
+        self.assertEqual([json.loads(m['text'])['data']['alert']['message'] for m in batch['messages']],
+                         ['Alert 0', 'Alert 1', 'Alert 2'])
+        self.assertEqual(self.receive(f'camera_{self.camera.id}')['messages'][-1]['type'], 'detection_profile')
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+
+    def test_failed_group_is_retried_in_order(self):
+        from unittest import mock
+        Alert.objects.create(message='First')
+        Alert.objects.create(message='Second')
+        with mock.patch.object(type(self.layer), 'group_send', side_effect=ConnectionError('layer down')):
+            async_to_sync(outbox.publisher.publish_pending)()
+        first, second = OutboxEvent.objects.order_by('id')
+        self.assertEqual((first.attempts, first.last_error, second.attempts), (1, 'layer down', 0))
+        self.assertIsNone(second.published_at)
+        self.assertGreater(second.next_attempt_at, timezone.now())
+
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        async_to_sync(outbox.publisher.publish_pending)()
+        self.assertEqual([json.loads(m['text'])['data']['alert']['message'] for m in self.receive('alerts.site')['messages']],
+                         ['First', 'Second'])
+
+
+class AlertSubscriptionTests(TestCase):
+    """Alert sockets only receive the cameras, severities and events they subscribed to"""
+
+    def setUp(self):
+        self.addCleanup(async_to_sync(get_channel_layer().flush))
+        self.gate, self.yard = [
+            Camera.objects.create(name=name, location='Site', ip_address=f'10.0.7.{i}')
+            for i, name in enumerate(['Gate', 'Yard'])
+        ]
+
+    def create_alerts(self):
+        Incident.objects.create(camera=self.gate, type='CRITICAL', description='Gate critical')  # alert auto-created
+        for camera, kind in [(self.gate, 'WORTH_CHECKING'), (self.yard, 'DANGEROUS')]:
+            incident = Incident.objects.create(camera=camera, type=kind, description=f'{camera.name} {kind}')
+            Alert.objects.create(incident=incident, message=f'{camera.name} {kind}')
+        Alert.objects.create(message='Site notice')
+        Alert.objects.filter(incident__camera=self.yard).get().save()  # 'updated', nothing changed: not sent
+        alert = Alert.objects.get(message='Yard DANGEROUS')
+        alert.acknowledged = True
+        alert.save()
+
+    async def received(self, socket):
+        frames = []
+        while not await socket.receive_nothing(timeout=0.05):
+            frames.append(json.loads(await socket.receive_from()))
+        return frames
+
+    def test_filters(self):
+        async def scenario():
+            paths = {
+                'all': '/ws/alerts/',
+                'gate': f'/ws/alerts/?cameras={self.gate.id}',
+                'severe_new': '/ws/alerts/?severities=2,3&events=created',
+                'later': '/ws/alerts/',
+            }
+            sockets = {name: WebsocketCommunicator(AlertConsumer.as_asgi(), path) for name, path in paths.items()}
+            for socket in sockets.values():
+                self.assertTrue((await socket.connect())[0])
+                self.assertEqual((await socket.receive_json_from())['type'], 'sync')
+            await sockets['later'].send_json_to({'type': 'subscribe', 'cameras': [self.yard.id], 'events': ['updated']})
+            self.assertEqual((await sockets['later'].receive_json_from())['type'], 'subscribed')
+
+            await database_sync_to_async(self.create_alerts)()
+            await outbox.publisher.publish_pending()
+            received = {}
+            for name, socket in sockets.items():
+                received[name] = [(f['data']['action'], f['data']['alert'].get('message')) for f in
+                                  await self.received(socket)]
+                await socket.disconnect()
+            return received
+
+        received = async_to_sync(scenario)()
+        self.assertEqual(len(received['all']), 5)
+        self.assertEqual(received['gate'], [('created', 'Critical incident detected: Gate critical'),
+                                            ('created', 'Gate WORTH_CHECKING'), ('created', 'Site notice')])
+        self.assertEqual(received['severe_new'], [('created', 'Critical incident detected: Gate critical'),
+                                                  ('created', 'Yard DANGEROUS'), ('created', 'Site notice')])
+        self.assertEqual(received['later'], [('updated', None)])
+
+    def test_invalid_subscription(self):
+        async def scenario():
+            socket = WebsocketCommunicator(AlertConsumer.as_asgi(), '/ws/alerts/?severities=7')
+            connected, code = await socket.connect()
+            return connected, code
+        self.assertEqual(async_to_sync(scenario)(), (False, 4400))
+
+
+class ReplayTests(TestCase):
+    """A client reconnecting with its last seq gets exactly what it missed, or is told to resync"""
+
+    def setUp(self):
+        self.camera = Camera.objects.create(name='Gate', location='North', ip_address='10.0.8.1')
+        self.addCleanup(async_to_sync(get_channel_layer().flush))
+
+    def alert(self, message):
+        Alert.objects.create(message=message)
+        async_to_sync(outbox.publisher.publish_pending)()
+
+    def connect(self, path):
+        """Frames received on connecting to ``path``"""
+        async def scenario():
+            socket = WebsocketCommunicator(AlertConsumer.as_asgi(), path)
+            self.assertTrue((await socket.connect())[0])
+            frames = []
+            while not frames or frames[-1]['type'] not in ('sync', 'resync'):
+                frames.append(await socket.receive_json_from())
+            await socket.disconnect()
+            return frames
+        return async_to_sync(scenario)()
+
+    def test_replay_on_reconnect(self):
+        self.alert('Seen')
+        [sync] = self.connect('/ws/alerts/')
+        self.assertEqual(sync, {'type': 'sync', 'seq': OutboxEvent.objects.get().seq})
+
+        self.alert('Missed 1')
+        self.alert('Missed 2')
+        *missed, sync = self.connect(f"/ws/alerts/?last_seq={sync['seq']}")
+        self.assertEqual([f['data']['alert']['message'] for f in missed], ['Missed 1', 'Missed 2'])
+        self.assertEqual([f['seq'] for f in missed], sorted(f['seq'] for f in missed))
+        self.assertEqual(sync['seq'], missed[-1]['seq'])
+
+        # Replay follows the subscription
+        *missed, sync = self.connect(f"/ws/alerts/?last_seq={missed[0]['seq']}&events=deleted")
+        self.assertEqual(missed, [])
+
+    def test_resync_when_gap_was_pruned(self):
+        self.alert('Seen')
+        [sync] = self.connect('/ws/alerts/')
+        self.alert('Missed')
+        self.alert('Latest')
+        OutboxEvent.objects.filter(seq__lte=sync['seq'] + 1).delete()
+        self.assertEqual(self.connect(f"/ws/alerts/?last_seq={sync['seq']}"),
+                         [{'type': 'resync', 'seq': OutboxEvent.objects.get().seq}])
+
+        # More missed than is worth replaying
+        latest = OutboxEvent.objects.get().seq
+        self.alert('Newer 1')
+        self.alert('Newer 2')
+        with self.settings(OUTBOX_REPLAY_LIMIT=1):
+            [resync] = self.connect(f'/ws/alerts/?last_seq={latest}')
+        self.assertEqual(resync['type'], 'resync')
+
+    def test_dead_event_does_not_hide_a_gap(self):
+        Alert.objects.create(message='Never published')
+        OutboxEvent.objects.update(attempts=10)  # out of attempts: the publisher skips it
+        self.alert('Seen')
+        [sync] = self.connect('/ws/alerts/')
+        self.alert('Missed')
+        self.alert('Latest')
+        OutboxEvent.objects.filter(seq__lte=sync['seq'] + 1).delete()
+        latest = outbox.latest_seq()
+        self.assertEqual(self.connect(f"/ws/alerts/?last_seq={sync['seq']}"), [{'type': 'resync', 'seq': latest}])
+
+        # Past retention the dead event is pruned like the published ones
+        outbox.publisher._prune(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(list(OutboxEvent.objects.values_list('seq', flat=True)), [latest])
+
+    def test_retried_event_is_replayed_after_later_seqs(self):
+        from unittest import mock
+        group_send = type(get_channel_layer()).group_send
+
+        async def site_down(layer, group, message):
+            if group == 'alerts.site':
+                raise ConnectionError('layer down')
+            await group_send(layer, group, message)
+
+        Alert.objects.create(message='Delayed')  # alerts without an incident go to the site group only
+        incident = Incident.objects.create(camera=self.camera, type='DANGEROUS', description='At the gate')
+        Alert.objects.create(incident=incident, message='Published')
+        with mock.patch.object(type(get_channel_layer()), 'group_send', site_down):
+            async_to_sync(outbox.publisher.publish_pending)()
+        *_, sync = self.connect('/ws/alerts/')
+        self.assertEqual(sync['seq'], outbox.latest_seq())
+
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        async_to_sync(outbox.publisher.publish_pending)()
+        *missed, _ = self.connect(f"/ws/alerts/?last_seq={sync['seq']}")
+        self.assertEqual([f['data']['alert']['message'] for f in missed], ['Delayed'])
+        self.assertGreater(missed[0]['seq'], sync['seq'])
+
+
+class ChannelBrokerTests(SimpleTestCase):
+    """Groups span processes; capacity, expiry and disconnects behave like channels' own layers"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, 'channels.sock')
+        self.broker = Broker()
+        self.loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(self.broker.serve(self.path), self.loop)
+        while not os.path.exists(self.path):
+            time.sleep(0.01)
+
+        async def shutdown():
+            tasks = asyncio.all_tasks() - {asyncio.current_task()}
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        def stop():
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=5)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            thread.join()
+            self.loop.close()
+        self.addCleanup(stop)
+
+    def layer(self, **config):
+        """A server process's channel layer"""
+        return UnixSocketChannelLayer(self.path, **config)
+
+    def test_group_send_reaches_every_process(self):
+        first, second = self.layer(), self.layer()
+
+        async def scenario():
+            a, b = await first.new_channel(), await second.new_channel()
+            await first.group_add('alerts', a)
+            await second.group_add('alerts', b)
+            await first.group_send('alerts', {'type': 'alert.message', 'text': 'hi'})
+            self.assertEqual(await first.receive(a), {'type': 'alert.message', 'text': 'hi'})
+            self.assertEqual(await second.receive(b), {'type': 'alert.message', 'text': 'hi'})
+
+            # A receive that timed out doesn't lose the message that arrives next
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(second.receive(b), 0.05)
+            await first.group_send('alerts', {'type': 'alert.message', 'text': 'again'})
+            self.assertEqual((await second.receive(b))['text'], 'again')
+            self.assertEqual((await first.receive(a))['text'], 'again')
+
+            # A process that goes away leaves its groups
+            await second.close()
+            await asyncio.sleep(0.05)
+            self.assertEqual(list(self.broker.groups['alerts']), [a])
+        async_to_sync(scenario)()
+
+    def test_capacity_and_expiry(self):
+        sender, receiver = self.layer(capacity=2, expiry=60), self.layer()
+
+        async def fill():
+            channel = await receiver.new_channel()
+            await receiver.group_add('dashboard', channel)
+            await sender.send(channel, {'n': 1})
+            await sender.send(channel, {'n': 2})
+            with self.assertRaises(ChannelFull):
+                await sender.send(channel, {'n': 3})
+            await sender.group_send('dashboard', {'n': 4})  # full: skipped, not an error
+            return channel
+        channel = async_to_sync(fill)()
+        self.assertEqual(len(self.broker.channels[channel]), 2)
+
+        # Nobody read them: the messages expire and the channel leaves its groups
+        self.loop.call_soon_threadsafe(self.broker.sweep, time.time() + 61)
+        async_to_sync(asyncio.sleep)(0.05)
+        self.assertEqual(self.broker.channels, {})
+        self.assertEqual(self.broker.groups, {})
+
+
+
+class InferenceServerTests(SimpleTestCase):
+    """A live server is detected by connecting; a dead server's socket file is cleared"""
+
+    def setUp(self):
+        import socket
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'inference.sock')
+        self.enterContext(override_settings(INFERENCE_SOCKET=self.path))
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(self.server.close)
+        self.server.bind(self.path)
+
+    def test_running(self):
+        self.server.listen()
+        self.assertTrue(video_views.inference_server_running())
+
+    def test_stale_socket_is_removed(self):
+        self.server.close()  # the file stays, nothing listens
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(video_views.inference_server_running())
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(video_views.inference_server_running())
@@ -0,0 +1,172 @@
+"""
+End-to-end incident latency, from the detector's frame capture to the
+WebSocket broadcast.
+
+Detectors stamp a trace as the frame moves through them
+(backend/frame_trace.py) and post it as the incident's ``trace``:
+
+    {"id": "<hex>", "captured": <epoch seconds>, "inferred": ..., "verified": ..., "sent": ...}
+
+The ingest view adds ``received`` and keeps the trace on the Incident
+(``trace_id``/``trace``), so it also reaches browsers with the broadcast
+incident. ``stored`` is stamped once the row's transaction commits (with its
+ingest batch; rolled back writes are never recorded), and ``published`` when the
+outbox publisher hands the first event announcing the incident to the
+channel layer. The step up to each stamp is a stage (STAGES); its duration
+goes into a per-camera histogram, read by ``/api/incidents/latency/``.
+
+Histograms are kept in memory since startup, per process. ``published`` is
+only seen by the process that took the incident in, so run the publisher
+there (the default single server) to get ``fanout`` and ``total``.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Stamps in pipeline order; the first four are set by the detector
+STAMPS = ('captured', 'inferred', 'verified', 'sent', 'received', 'stored', 'published')
+DETECTOR_STAMPS = STAMPS[:4]
+
+# The stage ending at each stamp (from the previous stamp present), and capture to publish
+STAGES = {
+    'inferred': 'inference',
+    'verified': 'verification',
+    'sent': 'reporting',
+    'received': 'ingest',
+    'stored': 'db_write',
+    'published': 'fanout',
+}
+TOTAL = 'total'
+
+# Histogram bucket upper bounds, in seconds; one more bucket counts anything slower
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def parse(value):
+    """The detector stamps of an incident's ``trace`` field, or None if there is no usable one"""
+    if not isinstance(value, dict):
+        return None
+    trace_id = value.get('id')
+    if not isinstance(trace_id, str) or not 0 < len(trace_id) <= 64:
+        return None
+    trace = {'id': trace_id}
+    for stamp in DETECTOR_STAMPS:
+        if isinstance(value.get(stamp), (int, float)) and math.isfinite(value[stamp]):
+            trace[stamp] = float(value[stamp])
+    return trace if 'captured' in trace else None
+
+
+class Histogram:
+    """Counts per BUCKETS bucket, with the total and the slowest value"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Estimated by interpolating inside the bucket the quantile falls in"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            'count': self.count,
+            'mean_ms': ms(self.sum / self.count) if self.count else None,
+            'p50_ms': ms(self.quantile(0.5)),
+            'p95_ms': ms(self.quantile(0.95)),
+            'p99_ms': ms(self.quantile(0.99)),
+            'max_ms': ms(self.max) if self.count else None,
+            'buckets': list(self.counts),
+        }
+
+
+class LatencyTracker:
+
+    def __init__(self, max_pending=10000):
+        self._lock = threading.Lock()
+        self._histograms = {}  # camera id -> {stage: Histogram}
+        self._pending = OrderedDict()  # incident id -> (camera id, trace) until published
+        self.max_pending = max_pending
+
+    def stored(self, incident):
+        """Stamp ``stored`` for a traced incident just committed; records the stages so far"""
+        if not incident.trace:
+            return
+        trace = dict(incident.trace, stored=time.time())
+        with self._lock:
+            self._record(incident.camera_id, trace)
+            self._pending[incident.pk] = (incident.camera_id, trace)
+            while len(self._pending) > self.max_pending:
+                # Never published here (rolled back, or published by another process)
+                self._pending.popitem(last=False)
+
+    def published(self, incident_ids):
+        """Stamp ``published`` for incidents whose first announcing event went out"""
+        now = time.time()
+        with self._lock:
+            for incident_id in incident_ids:
+                pending = self._pending.pop(incident_id, None)
+                if pending is None:
+                    continue  # published already (another event or group), or not traced here
+                camera_id, trace = pending
+                self._observe(camera_id, STAGES['published'], now - trace['stored'])
+                self._observe(camera_id, TOTAL, now - trace['captured'])
+
+    def _record(self, camera_id, trace):
+        previous = None
+        for stamp in STAMPS:
+            if stamp not in trace:
+                continue
+            if previous is not None:
+                self._observe(camera_id, STAGES[stamp], trace[stamp] - trace[previous])
+            previous = stamp
+
+    def _observe(self, camera_id, stage, seconds):
+        # Clocks of detector hosts can be slightly off: a negative stage took no measurable time
+        histograms = self._histograms.setdefault(camera_id, {})
+        histograms.setdefault(stage, Histogram()).observe(max(seconds, 0.0))
+
+    def snapshot(self, cameras=None):
+        """{camera id: {stage: summary}} for the given camera ids (None: all), stages in pipeline order"""
+        order = list(STAGES.values()) + [TOTAL]
+        with self._lock:
+            return {
+                camera_id: {stage: stages[stage].summary() for stage in order if stage in stages}
+                for camera_id, stages in sorted(self._histograms.items())
+                if cameras is None or camera_id in cameras
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._pending.clear()
+
+
+latency = LatencyTracker()
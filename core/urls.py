@@ -13,6 +13,7 @@ from .views import (
     dashboard_stats,
 )
 from .video_views import VideoDetectionViewSet
+from .exports import export_incidents, export_alerts
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -29,4 +30,6 @@ urlpatterns = [
     path('analysis/start/', start_analysis, name='start-analysis'),
     path('analysis/stop/', stop_analysis, name='stop-analysis'),
     path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
+    path('export/incidents/', export_incidents, name='export-incidents'),
+    path('export/alerts/', export_alerts, name='export-alerts'),
 ]
@@ -5,6 +5,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 import os
+import socket
 import subprocess
 import json
 from django.conf import settings
@@ -13,6 +14,44 @@ BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
 
 
+def inference_server_running():
+    """
+    Whether the shared inference server answers on its socket. A socket file
+    left behind by a server that died is removed.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(settings.INFERENCE_SOCKET)
+        return True
+    except FileNotFoundError:
+        return False
+    except ConnectionRefusedError:
+        os.unlink(settings.INFERENCE_SOCKET)
+        return False
+    finally:
+        sock.close()
+
+
+def ensure_inference_server():
+    """
+    Start the shared inference server if it isn't running, so detection jobs
+    reuse one warm model instead of each loading their own.
+    """
+    if inference_server_running():
+        return False
+    subprocess.Popen(
+        [
+            'python', 'backend/inference_server.py',
+            '--socket', settings.INFERENCE_SOCKET,
+            '--models', *settings.INFERENCE_MODELS,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return True
+
+
 class VideoDetectionViewSet(viewsets.ViewSet):
     """Endpoints for video detection testing."""
 
@@ -59,6 +98,9 @@ class VideoDetectionViewSet(viewsets.ViewSet):
 
         # Start the YOLO detector in the background
         try:
+            # Jobs started while the server is still warming up load their own model
+            ensure_inference_server()
+
             cmd = [
                 'python', 'backend/yolo_detector_v2.py',
                 '--source', video_path,
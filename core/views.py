@@ -3,14 +3,19 @@ from rest_framework.decorators import api_view, action, permission_classes, auth
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from datetime import datetime, timedelta, timezone as dt_timezone
+import time
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.contrib.auth import authenticate
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import User, Camera, Incident, Alert, Report, AIVerificationLog
+from django.db import transaction
+from . import alerts, ingest, reports, rollups, stats, tracing
+from .pagination import KeysetPagination
+from .models import User, Camera, DetectionProfile, Incident, Alert, Report, AIVerificationLog
 from .serializers import (
     UserSerializer,
     CameraSerializer,
+    DetectionProfileSerializer,
     IncidentSerializer,
     AlertSerializer,
     ReportSerializer,
@@ -48,9 +53,31 @@ class CameraViewSet(viewsets.ModelViewSet):
         except Camera.DoesNotExist:
             return Response({'error': 'Camera not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get', 'put', 'patch'])
+    def profile(self, request, pk=None):
+        """
+        Get or change the camera's detection profile.
+        Detectors fetch it at startup; changes are pushed to running detectors.
+        """
+        camera = self.get_object()
+        if request.method == 'GET':
+            # A camera without a profile reads the defaults; it is only stored once changed
+            profile = DetectionProfile.objects.filter(camera=camera).first() or DetectionProfile(camera=camera)
+            return Response(DetectionProfileSerializer(profile).data)
+
+        profile, _ = DetectionProfile.objects.get_or_create(camera=camera)
+
+        serializer = DetectionProfileSerializer(
+            profile, data=request.data, partial=request.method == 'PATCH'
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
 
 class IncidentViewSet(viewsets.ModelViewSet):
-    queryset = Incident.objects.all().order_by('-timestamp')
+    queryset = Incident.objects.select_related('camera').order_by('-timestamp')
+    pagination_class = KeysetPagination
     serializer_class = IncidentSerializer
     permission_classes = [AllowAny]  # Allow unauthenticated access for development
 
@@ -58,11 +85,12 @@ class IncidentViewSet(viewsets.ModelViewSet):
         """
         Handles manual, YOLO, and AI-created incidents.
         Auto-creates an Alert when type = CRITICAL.
+        A detector's ``trace`` is kept with the incident (see core/tracing.py).
         """
+        received = time.time()
         camera_id = request.data.get("camera_id")
         description = request.data.get("description", "Incident reported")
         incident_type = request.data.get("type", "WORTH_CHECKING")
-        severity = request.data.get("severity", 1)
 
         confidence_score = request.data.get("confidence_score", None)
 
@@ -74,126 +102,166 @@ class IncidentViewSet(viewsets.ModelViewSet):
         except Camera.DoesNotExist:
             return Response({"error": "Invalid camera ID"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Determine detection source
-        detected_by = "AI" if confidence_score is not None else "MANUAL"
-
-        # Create incident
-        incident = Incident.objects.create(
-            camera=camera,
-            description=description,
-            detected_by=detected_by,
-            type=incident_type,
-            severity=severity,
-            is_verified=False,
-            confidence_score=confidence_score if confidence_score is not None else 0.0,
-            ai_summary=request.data.get("ai_summary", None)
-        )
+        trace = tracing.parse(request.data.get("trace"))
+        if trace:
+            trace["received"] = received
 
-        # Log AI verification if confidence_score provided
-        if confidence_score is not None:
-            AIVerificationLog.objects.create(
-                incident=incident,
-                decision="CONFIRMED",
-                confidence_score=confidence_score
-            )
+        def write():
+            # Incident.save() raises the CRITICAL alert; it is broadcast once the batch commits
+            return ingest.create_incident(camera, description, incident_type, confidence_score,
+                                          request.data.get("ai_summary", None), trace)
 
-        # AUTO-CREATE ALERT IF INCIDENT IS CRITICAL
-        if incident_type == "CRITICAL":
-            alert = Alert.objects.create(
-                incident=incident,
-                title=f"⚠️ Critical Alert - {camera.name}",
-                message=f"Critical incident detected: {description}",
-                created_by=None  # system generated
-            )
-            # Send WebSocket notification
-            try:
-                channel_layer = get_channel_layer()
-                if channel_layer:
-                    alert_serializer = AlertSerializer(alert)
-                    async_to_sync(channel_layer.group_send)(
-                        'alerts',
-                        {
-                            'type': 'alert_message',
-                            'message': 'New critical alert',
-                            'alert_data': {
-                                'action': 'created',
-                                'alert': alert_serializer.data,
-                            }
-                        }
-                    )
-            except Exception as e:
-                print(f"Error sending WebSocket message: {e}")
+        # Grouped with concurrent detections into one transaction by the ingest writer
+        incident = ingest.writer.run(write)
 
         serializer = IncidentSerializer(incident)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    TIMELINE_SPANS = {'minute': timedelta(hours=1), 'hour': timedelta(days=2), 'day': timedelta(days=30)}
+    TIMELINE_MAX_BUCKETS = 10000
+
+    @action(detail=False, methods=['get'])
+    def timeline(self, request):
+        """
+        Incident counts over time, read from the rollup tables.
+        ?bucket=minute|hour|day (default hour), ?start= / ?end= ISO 8601 (default: a recent window),
+        ?camera=1,2 and ?group_by=type,detected_by,camera.
+        """
+        resolution = request.query_params.get('bucket', 'hour')
+        if resolution not in rollups.RESOLUTIONS:
+            return Response({"error": f"bucket must be one of {', '.join(rollups.RESOLUTIONS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        group_by = [g for g in request.query_params.get('group_by', '').split(',') if g]
+        if any(g not in rollups.GROUP_BY for g in group_by):
+            return Response({"error": f"group_by accepts {', '.join(rollups.GROUP_BY)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = _parse_time(request.query_params.get('end')) or timezone.now()
+            start = _parse_time(request.query_params.get('start')) or end - self.TIMELINE_SPANS[resolution]
+            cameras = [int(c) for c in request.query_params.get('camera', '').split(',') if c]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        bucket_size = {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+        if start >= end or (end - start) / bucket_size[resolution] > self.TIMELINE_MAX_BUCKETS:
+            return Response({"error": f"start must be before end, within {self.TIMELINE_MAX_BUCKETS} buckets"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'bucket': resolution,
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'results': rollups.timeline(resolution, start, end, cameras, group_by),
+        })
+
+    @action(detail=False, methods=['get'])
+    def latency(self, request):
+        """
+        Per-camera latency of traced incidents by pipeline stage, from frame
+        capture to WebSocket publish (see core/tracing.py). ?camera=1,2.
+        Bucket counts line up with ``buckets`` (upper bounds in seconds) plus one for slower.
+        """
+        try:
+            cameras = [int(c) for c in request.query_params.get('camera', '').split(',') if c]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        snapshot = tracing.latency.snapshot(cameras or None)
+        names = dict(Camera.objects.filter(id__in=snapshot).values_list('id', 'name'))
+        return Response({
+            'stages': list(tracing.STAGES.values()) + [tracing.TOTAL],
+            'buckets': tracing.BUCKETS,
+            'cameras': [
+                {'camera_id': camera_id, 'camera': names.get(camera_id), 'stages': stages}
+                for camera_id, stages in snapshot.items()
+            ],
+        })
+
 
 class AlertViewSet(viewsets.ModelViewSet):
-    queryset = Alert.objects.all().order_by('-created_at')
+    queryset = Alert.objects.select_related('incident__camera', 'created_by').order_by('-created_at')
+    pagination_class = KeysetPagination
     serializer_class = AlertSerializer
     permission_classes = [AllowAny]  # Allow unauthenticated access for development
 
-    def create(self, request, *args, **kwargs):
-        """Create alert and send WebSocket notification"""
-        response = super().create(request, *args, **kwargs)
-        
-        # Send WebSocket message
-        if response.status_code == status.HTTP_201_CREATED:
-            alert_data = response.data
-            self._send_websocket_alert('created', alert_data)
-        
-        return response
-
-    def update(self, request, *args, **kwargs):
-        """Update alert and send WebSocket notification"""
-        response = super().update(request, *args, **kwargs)
-        
-        # Send WebSocket message
-        if response.status_code == status.HTTP_200_OK:
-            alert_data = response.data
-            self._send_websocket_alert('updated', alert_data)
-        
-        return response
-
-    def partial_update(self, request, *args, **kwargs):
-        """Partial update alert and send WebSocket notification"""
-        response = super().partial_update(request, *args, **kwargs)
-        
-        # Send WebSocket message
-        if response.status_code == status.HTTP_200_OK:
-            alert_data = response.data
-            self._send_websocket_alert('updated', alert_data)
-        
-        return response
+    # Saves and deletes are broadcast to the alerts group by core.signals
 
-    def _send_websocket_alert(self, action: str, alert_data: dict):
-        """Send alert update via WebSocket"""
+    @action(detail=False, methods=['post'])
+    def acknowledge(self, request):
+        """
+        Acknowledge many alerts at once, with one UPDATE and one broadcast.
+        Body: ids, and/or camera (id) and before (ISO 8601 created_at bound).
+        Returns the ids that were acknowledged (already acknowledged ones are skipped).
+        """
+        ids, camera = request.data.get('ids'), request.data.get('camera')
+        queryset = Alert.objects.all()
         try:
-            channel_layer = get_channel_layer()
-            if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    'alerts',
-                    {
-                        'type': 'alert_message',
-                        'message': f'Alert {action}',
-                        'alert_data': {
-                            'action': action,
-                            'alert': alert_data,
-                        }
-                    }
-                )
-        except Exception as e:
-            print(f"Error sending WebSocket message: {e}")
+            before = _parse_time(request.data.get('before'))
+            if ids is not None:
+                if not isinstance(ids, list):
+                    raise TypeError("ids must be a list")
+                queryset = queryset.filter(id__in=[int(i) for i in ids])
+            if camera is not None:
+                queryset = queryset.filter(incident__camera_id=int(camera))
+            if before is not None:
+                queryset = queryset.filter(created_at__lt=before)
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is None and camera is None and before is None:
+            return Response({"error": "Give ids, camera or before"}, status=status.HTTP_400_BAD_REQUEST)
+
+        acknowledged = alerts.acknowledge(queryset)
+        return Response({"acknowledged": len(acknowledged), "ids": acknowledged})
 
 
 class ReportViewSet(viewsets.ModelViewSet):
-    queryset = Report.objects.all().order_by('-created_at')
+    queryset = Report.objects.select_related('generated_by').order_by('-created_at')
+    pagination_class = KeysetPagination
     serializer_class = ReportSerializer
     permission_classes = [AllowAny]  # Allow unauthenticated access for development
 
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """
+        Build a report from the incident and alert tables.
+        Body: period_start, period_end (ISO 8601) and optional camera_ids.
+        Long periods are generated in the background: 202 with status PENDING, poll the report.
+        """
+        try:
+            period_start = _parse_time(request.data.get('period_start'))
+            period_end = _parse_time(request.data.get('period_end')) or timezone.now()
+            cameras = [int(c) for c in request.data.get('camera_ids') or []]
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if period_start is None or period_start >= period_end:
+            return Response({"error": "period_start is required and must be before period_end"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return self._generate(request, period_start, period_end, cameras)
+
+    @action(detail=False, methods=['post'])
+    def generate_daily(self, request):
+        """Report on the last 24 hours"""
+        period_end = timezone.now()
+        return self._generate(request, period_end - timedelta(days=1), period_end)
+
+    def _generate(self, request, period_start, period_end, cameras=()):
+        report = Report.objects.create(
+            generated_by=request.user if request.user.is_authenticated else None,
+            period_start=period_start,
+            period_end=period_end,
+            status='PENDING',
+            data={'cameras': list(cameras)} if cameras else {},
+        )
+        if reports.runs_in_background(period_start, period_end):
+            transaction.on_commit(lambda: reports.generate_in_background(report.id))
+            return Response(self.get_serializer(report).data, status=status.HTTP_202_ACCEPTED)
+        reports.generate_report(report)
+        return Response(self.get_serializer(report).data, status=status.HTTP_201_CREATED)
+
 
 class AIVerificationLogViewSet(viewsets.ModelViewSet):
-    queryset = AIVerificationLog.objects.all().order_by('-created_at')
+    queryset = AIVerificationLog.objects.select_related('incident__camera').order_by('-created_at')
+    pagination_class = KeysetPagination
     serializer_class = AIVerificationLogSerializer
     permission_classes = [AllowAny]  # Allow unauthenticated access for development
 
@@ -203,6 +271,21 @@ class AIVerificationLogViewSet(viewsets.ModelViewSet):
 #  CUSTOM ENDPOINTS
 # ==========================
 
+def _parse_time(value):
+    """ISO 8601 datetime or date from a query parameter (UTC if no offset), None if absent"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date/time '{value}'")
+        parsed = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
 @api_view(['POST'])
 @authentication_classes([])  # No authentication required for login
 @permission_classes([AllowAny])
@@ -297,6 +380,8 @@ def start_analysis(request):
         return Response({"error": "No matching cameras found"}, status=status.HTTP_404_NOT_FOUND)
 
     Camera.objects.filter(id__in=camera_ids).update(is_active=True, last_checked=timezone.now())
+    # update() skips signals, so adjust the dashboard stats here
+    stats.dashboard.count_cameras(active=sum(not cam.is_active for cam in cameras))
 
     results = [
         {"camera": cam.name, "status": "Analyzing", "result": "Waiting for detections..."}
@@ -320,6 +405,8 @@ def stop_analysis(request):
         return Response({"error": "No matching cameras found"}, status=status.HTTP_404_NOT_FOUND)
 
     Camera.objects.filter(id__in=camera_ids).update(is_active=False, last_checked=timezone.now())
+    # update() skips signals, so adjust the dashboard stats here
+    stats.dashboard.count_cameras(active=-sum(cam.is_active for cam in cameras))
 
     results = [
         {"camera": cam.name, "status": "Stopped", "result": "Analysis halted"}
@@ -332,11 +419,6 @@ def stop_analysis(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Allow unauthenticated access for development
 def dashboard_stats(request):
-    data = {
-        "total_cameras": Camera.objects.count(),
-        "active_cameras": Camera.objects.filter(is_active=True).count(),
-        "recent_alerts": Alert.objects.order_by('-created_at')[:5].values('title', 'message', 'created_at'),
-        "active_incidents": Incident.objects.filter(is_verified=False).count(),
-        "last_reports": Report.objects.order_by('-created_at')[:3].values('summary', 'created_at'),
-    }
-    return Response(data)
+    # Served from memory; kept current by signals and reconciled periodically (core/stats.py)
+    return Response(stats.dashboard.snapshot())
+
@@ -72,6 +72,7 @@ export function useWebSocket(
     wsClient.on('frame', messageHandler);
     wsClient.on('detection', messageHandler);
     wsClient.on('dashboard_update', messageHandler);
+    wsClient.on('resync', messageHandler);
     wsClient.on('pong', messageHandler);
 
     // Small delay to prevent rapid connection attempts
@@ -91,6 +92,7 @@ export function useWebSocket(
       wsClient.off('frame', messageHandler);
       wsClient.off('detection', messageHandler);
       wsClient.off('dashboard_update', messageHandler);
+      wsClient.off('resync', messageHandler);
       wsClient.off('pong', messageHandler);
       
       // Don't disconnect here - let the WebSocket client handle its own lifecycle
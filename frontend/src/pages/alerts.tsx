@@ -5,7 +5,7 @@ import { Button } from "primereact/button";
 import { InputSwitch } from "primereact/inputswitch";
 import { Avatar } from "primereact/avatar";
 import { Message } from "primereact/message";
-import apiClient, { API_URL } from "../utils/api";
+import apiClient, { API_URL, type Paginated } from "../utils/api";
 import { createAlertWebSocket } from "../utils/websocket";
 import { useWebSocket } from "../hooks/useWebSocket";
 
@@ -41,6 +41,7 @@ interface Alert {
   } | null;
   created_at: string;
   acknowledged: boolean;
+  acknowledged_at?: string | null;
   incident?: Incident | null;
 }
 
@@ -68,8 +69,8 @@ export default function Alerts() {
   const fetchAlerts = async () => {
     try {
       setLoading(true);
-      const res = await apiClient.get<Alert[]>(`/alerts/`);
-      setAlerts(res.data);
+      const res = await apiClient.get<Paginated<Alert>>(`/alerts/`);
+      setAlerts(res.data.results);
     } catch (err) {
       console.error("Failed to fetch alerts:", err);
     } finally {
@@ -84,7 +85,10 @@ export default function Alerts() {
 
   // Handle WebSocket messages
   useEffect(() => {
-    if (lastMessage?.type === 'alert') {
+    if (lastMessage?.type === 'resync') {
+      // Missed more while disconnected than the server can replay
+      fetchAlerts();
+    } else if (lastMessage?.type === 'alert') {
       const alertData = lastMessage.data;
       
       if (alertData?.action === 'created') {
@@ -98,13 +102,18 @@ export default function Alerts() {
           return [newAlert, ...prev];
         });
       } else if (alertData?.action === 'updated') {
-        // Alert updated - update in the list
+        // Alert updated - merge into the list. Partial updates carry only the id
+        // and the changed fields; the rest comes from the alert we already hold.
+        // Bulk updates (e.g. acknowledge all) list the ids that all got the same fields.
         const updatedAlert = alertData.alert;
+        const ids = new Set<number>(alertData.ids ?? [updatedAlert.id]);
         setAlerts((prev) =>
           prev.map((alert) =>
-            alert.id === updatedAlert.id ? updatedAlert : alert
+            ids.has(alert.id) ? { ...alert, ...updatedAlert } : alert
           )
         );
+      } else if (alertData?.action === 'deleted') {
+        setAlerts((prev) => prev.filter((alert) => alert.id !== alertData.alert.id));
       }
     }
   }, [lastMessage]);
@@ -169,6 +178,16 @@ export default function Alerts() {
     }
   };
 
+  const acknowledgeAll = async (alertIds: number[]) => {
+    try {
+      // One request and one 'updated' broadcast for all of them
+      await apiClient.post(`/alerts/acknowledge/`, { ids: alertIds });
+    } catch (err) {
+      console.error("Failed to acknowledge alerts:", err);
+      alert("Failed to acknowledge alerts");
+    }
+  };
+
   const filteredAlerts = alerts.filter((alert) => {
     if (filter === "acknowledged") return alert.acknowledged;
     if (filter === "unacknowledged") return !alert.acknowledged;
@@ -239,6 +258,17 @@ export default function Alerts() {
                   severity="success"
                   size="large"
                 />
+                {filteredAlerts.some((a) => !a.acknowledged) && (
+                  <Button
+                    label="Acknowledge all"
+                    icon="pi pi-check-square"
+                    onClick={() =>
+                      acknowledgeAll(filteredAlerts.filter((a) => !a.acknowledged).map((a) => a.id))
+                    }
+                    severity="secondary"
+                    size="large"
+                  />
+                )}
               </div>
             </div>
             <div className="h-[calc(100vh-13rem)] overflow-y-auto px-4 py-4">
@@ -4,8 +4,8 @@ import { Button } from "primereact/button";
 import { Card } from "primereact/card";
 import { Dropdown } from "primereact/dropdown";
 import { Avatar } from "primereact/avatar";
-import apiClient, { API_URL } from "../utils/api";
-import { createAlertWebSocket } from "../utils/websocket";
+import apiClient, { API_URL, type Paginated } from "../utils/api";
+import { createAlertWebSocket, createDashboardWebSocket } from "../utils/websocket";
 import { useWebSocket } from "../hooks/useWebSocket";
 import CameraView from "../components/CameraView";
 
@@ -52,6 +52,9 @@ interface DashboardStats {
   last_reports: any[];
 }
 
+// Incidents kept in memory (one API page)
+const MAX_INCIDENTS = 50;
+
 export default function Dashboard() {
   const navigate = useNavigate();
 
@@ -145,6 +148,11 @@ export default function Dashboard() {
     },
   });
 
+  // WebSocket for incident and stats updates (pushed by the backend, coalesced).
+  // Updates missed while disconnected are replayed on reconnect; stats arrive on connect
+  const [dashboardWsClient] = useState(() => createDashboardWebSocket());
+  const { lastMessage: dashboardMessage } = useWebSocket(dashboardWsClient);
+
   const LIGHT_THEME =
     "https://unpkg.com/primereact/resources/themes/lara-light-indigo/theme.css";
   const DARK_THEME =
@@ -162,8 +170,8 @@ export default function Dashboard() {
 
   const fetchIncidents = async () => {
     try {
-      const res = await apiClient.get(`/incidents/`);
-      setIncidents(res.data);
+      const res = await apiClient.get<Paginated<Incident>>(`/incidents/`);
+      setIncidents(res.data.results);
     } catch (err) {
       console.error("Failed to fetch incidents:", err);
     }
@@ -171,8 +179,8 @@ export default function Dashboard() {
 
   const fetchAlerts = async () => {
     try {
-      const res = await apiClient.get<Alert[]>(`/alerts/`);
-      const newAlerts = res.data;
+      const res = await apiClient.get<Paginated<Alert>>(`/alerts/`);
+      const newAlerts = res.data.results;
 
       setAlerts(newAlerts);
 
@@ -198,18 +206,39 @@ export default function Dashboard() {
     fetchIncidents();
     fetchAlerts(); // Initial fetch for alerts
     fetchStats();
+    // Incidents and stats are kept current by dashboard_update messages below
+  }, []);
 
-    // Keep polling for incidents and stats (alerts now use WebSocket)
-    const interval = setInterval(() => {
+  // Handle WebSocket dashboard updates
+  useEffect(() => {
+    if (dashboardMessage?.type === 'resync') {
+      // Missed more while disconnected than the server can replay
       fetchIncidents();
-      fetchStats();
-    }, 5000);
+      return;
+    }
+    if (!dashboardMessage || dashboardMessage.type !== 'dashboard_update') {
+      return;
+    }
 
-    return () => clearInterval(interval);
-  }, []);
+    const update = dashboardMessage.data;
+    if (update?.stats) {
+      setStats(update.stats);
+    }
+    if (update?.incidents?.length) {
+      const changed: Incident[] = update.incidents;
+      setIncidents((prev) => {
+        const changedIds = new Set(changed.map((incident) => incident.id));
+        return [...changed, ...prev.filter((incident) => !changedIds.has(incident.id))].slice(0, MAX_INCIDENTS);
+      });
+    }
+  }, [dashboardMessage]);
 
   // Handle WebSocket alert messages
   useEffect(() => {
+    if (lastMessage?.type === 'resync') {
+      fetchAlerts();
+      return;
+    }
     if (!lastMessage || lastMessage.type !== 'alert') {
       return;
     }
@@ -247,17 +276,18 @@ export default function Dashboard() {
         console.log('Alert is acknowledged, not showing overlay');
       }
     } else if (alertData?.action === 'updated') {
-      // Alert updated
+      // Alert updated: merge the changed fields (partial and bulk updates carry only those)
       const updatedAlert = alertData.alert;
+      const ids = new Set<number>(alertData.ids ?? [updatedAlert.id]);
       setAlerts((prev) =>
         prev.map((alert) =>
-          alert.id === updatedAlert.id ? updatedAlert : alert
+          ids.has(alert.id) ? { ...alert, ...updatedAlert } : alert
         )
       );
       
       // If the current alert was acknowledged, close overlay
       setCurrentAlert((current) => {
-        if (updatedAlert.acknowledged && current?.id === updatedAlert.id) {
+        if (updatedAlert.acknowledged && current && ids.has(current.id)) {
           setShowAlertOverlay(false);
           return null;
         }
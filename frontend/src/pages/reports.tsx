@@ -2,6 +2,7 @@ import { useEffect, useState } from "react";
 import { Card } from "primereact/card";
 import { Button } from "primereact/button";
 import axios from "axios";
+import type { Paginated } from "../utils/api";
 
 interface Report {
   id: number;
@@ -9,6 +10,7 @@ interface Report {
   created_at: string;
   period_start: string;
   period_end: string;
+  status: "PENDING" | "RUNNING" | "DONE" | "FAILED";
 }
 
 const API_URL = "http://localhost:8000/api";
@@ -23,8 +25,8 @@ export default function Reports() {
 
   const fetchReports = async () => {
     try {
-      const response = await axios.get(`${API_URL}/reports/`);
-      setReports(response.data);
+      const response = await axios.get<Paginated<Report>>(`${API_URL}/reports/`);
+      setReports(response.data.results);
     } catch (error) {
       console.error("Error fetching reports:", error);
     } finally {
@@ -74,7 +76,13 @@ export default function Reports() {
           {reports.map((report) => (
             <Card key={report.id} title={`Report #${report.id}`}>
               <div className="mb-4">
-                <p className="text-gray-700 mb-4">{report.summary}</p>
+                <p className="text-gray-700 mb-4">
+                  {report.status === "DONE"
+                    ? report.summary
+                    : report.status === "FAILED"
+                      ? "Report generation failed."
+                      : "Generating report..."}
+                </p>
                 <div className="flex justify-between text-sm text-gray-500">
                   <span>
                     From: {new Date(report.period_start).toLocaleDateString()}
@@ -41,6 +41,14 @@ apiClient.interceptors.response.use(
   }
 );
 
+// Incidents, alerts, reports and AI logs are cursor-paginated:
+// follow `next` for older items, `previous` for newer ones.
+export interface Paginated<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 export default apiClient;
 export { API_URL };
 
@@ -11,6 +11,9 @@ export class WebSocketClient {
   private reconnectTimeout: number | null = null;
   private listeners: Map<string, ((data: any) => void)[]> = new Map();
   private isConnecting = false;
+  // Highest event seq seen; sent on reconnect so the server replays what was missed
+  // (or sends 'resync' when it can't, and listeners refetch)
+  private lastSeq: number | null = null;
 
   constructor(url: string) {
     this.url = url;
@@ -45,7 +48,7 @@ export class WebSocketClient {
       this.isConnecting = true;
 
       try {
-        this.ws = new WebSocket(this.url);
+        this.ws = new WebSocket(this.connectUrl());
 
         this.ws.onopen = () => {
           console.log('WebSocket connected:', this.url);
@@ -57,6 +60,9 @@ export class WebSocketClient {
         this.ws.onmessage = (event) => {
           try {
             const data = JSON.parse(event.data);
+            if (typeof data.seq === 'number') {
+              this.lastSeq = Math.max(this.lastSeq ?? 0, data.seq);
+            }
             this.handleMessage(data);
           } catch (error) {
             console.error('Error parsing WebSocket message:', error);
@@ -98,6 +104,14 @@ export class WebSocketClient {
     });
   }
 
+  private connectUrl(): string {
+    if (this.lastSeq === null) {
+      return this.url;
+    }
+    const separator = this.url.includes('?') ? '&' : '?';
+    return `${this.url}${separator}last_seq=${this.lastSeq}`;
+  }
+
   private attemptReconnect(): void {
     // Don't reconnect if already connecting or connected
     if (this.isConnecting || this.ws?.readyState === WebSocket.OPEN) {
@@ -183,12 +197,27 @@ export class WebSocketClient {
   }
 }
 
+// Alert filters; omitted lists mean "any". Can be changed later by sending
+// { type: 'subscribe', ...subscription } on the open socket.
+export interface AlertSubscription {
+  cameras?: number[];
+  severities?: number[];
+  events?: ('created' | 'updated' | 'deleted')[];
+}
+
 // Helper functions for specific WebSocket connections
-export const createAlertWebSocket = (): WebSocketClient => {
+export const createAlertWebSocket = (subscription: AlertSubscription = {}): WebSocketClient => {
   const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
   const host = window.location.hostname;
   const port = '8000'; // Django default port
-  return new WebSocketClient(`${protocol}//${host}:${port}/ws/alerts/`);
+  const params = new URLSearchParams();
+  Object.entries(subscription).forEach(([key, values]) => {
+    if (values && values.length) {
+      params.set(key, values.join(','));
+    }
+  });
+  const query = params.toString() ? `?${params.toString()}` : '';
+  return new WebSocketClient(`${protocol}//${host}:${port}/ws/alerts/${query}`);
 };
 
 export const createCameraWebSocket = (cameraId: string | number): WebSocketClient => {